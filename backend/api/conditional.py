@@ -0,0 +1,55 @@
+"""
+Requêtes conditionnelles pour les listes et statistiques relues en boucle
+
+Le tableau de bord et les bornes relisent régulièrement les mêmes points
+d'accès. Chaque réponse porte un ETag et un Last-Modified calculés à partir
+des versions du cache des statistiques (presences/cache.py) ; une relecture
+avec If-None-Match ou If-Modified-Since reçoit un 304 sans que la requête
+soit exécutée ni la réponse sérialisée.
+
+Les versions doivent être communes à tous les processus qui écrivent des
+présences (serveur, tâches cron) : avec un cache propre à chaque processus
+(STATISTICS_CACHE_BACKEND='locmem'), les réponses sont toujours complètes et
+sans validateurs.
+"""
+import hashlib
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from presences.cache import StatisticsCache
+
+
+def conditional_response(request, validators, build):
+    """
+    Retourne 304 si le client a déjà la version courante, sinon la réponse de `build()`
+
+    Args:
+        request: Requête (DRF ou Django)
+        validators (tuple): (empreinte des versions, timestamp de la dernière modification)
+        build (callable): Construit la réponse complète
+    """
+    if not StatisticsCache.is_shared():
+        # Un 304 pourrait masquer les écritures des autres processus
+        return build()
+    version, last_modified = validators
+    # L'URL (paramètres, curseur), le format négocié et la date du jour (périodes
+    # glissantes) font partie de l'empreinte
+    fingerprint = repr((
+        request.get_full_path(), getattr(request, 'accepted_media_type', None), timezone.now().date(), version
+    ))
+    etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+    last_modified = int(last_modified)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Le navigateur conserve la réponse mais la revalide à chaque lecture
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
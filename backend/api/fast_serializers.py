@@ -0,0 +1,133 @@
+"""
+Sérialisation rapide des listes les plus consultées
+
+Les bornes et le tableau de bord relisent en permanence les présences du jour
+et la liste des étudiants. Pour ces listes, l'instanciation d'un
+ModelSerializer et la lecture champ par champ des objets coûtent plus cher
+que la requête elle-même : les lignes sont ici lues par `values_list()` et
+converties en dictionnaires à partir d'une table de champs calculée une seule
+fois depuis le sérialiseur DRF, dont le JSON produit est identique.
+
+Activée par API_FAST_SERIALIZATION.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+from rest_framework.settings import api_settings
+
+from .serializers import EtudiantListSerializer, PresenceSerializer
+
+
+class FastListSerializer:
+    """
+    Sérialisation en lecture seule d'une liste, équivalente à `serializer_class(many=True)`
+
+    Seuls les champs simples sont pris en charge (valeurs, clés étrangères,
+    dates, heures, fichiers) : une source avec un sérialiseur imbriqué ou une
+    méthode lève ImproperlyConfigured.
+    """
+
+    # Champs recopiés tels quels depuis la base
+    RAW_FIELDS = (
+        drf_fields.ReadOnlyField, drf_fields.CharField, drf_fields.IntegerField,
+        drf_fields.BooleanField, drf_fields.ChoiceField, relations.PrimaryKeyRelatedField,
+    )
+    # Champs dont la valeur est mise en forme (fichiers, dates, heures)
+    CONVERTED_FIELDS = (
+        drf_fields.FileField, drf_fields.DateTimeField, drf_fields.DateField, drf_fields.TimeField,
+    )
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._field_map = None
+
+    @property
+    def field_map(self):
+        """[(clé du JSON, chemin pour values_list, champ DRF ou None si recopié tel quel)]"""
+        if self._field_map is None:
+            field_map = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, self.CONVERTED_FIELDS):
+                    converter = field
+                elif isinstance(field, self.RAW_FIELDS) and not isinstance(field, drf_fields.MultipleChoiceField):
+                    converter = None
+                else:
+                    raise ImproperlyConfigured(
+                        f"{self.serializer_class.__name__}.{name}: champ {type(field).__name__} non pris en charge"
+                    )
+                field_map.append((name, '__'.join(field.source_attrs), converter))
+            self._field_map = field_map
+        return self._field_map
+
+    def values(self, queryset):
+        """Queryset des tuples à sérialiser (les select_related et defer sont ignorés)"""
+        return queryset.values_list(*[path for _, path, _ in self.field_map])
+
+    def to_representation(self, rows, request=None):
+        """Liste de dictionnaires pour des tuples lus par `values()`"""
+        keys = [name for name, _, _ in self.field_map]
+        converters = [
+            (index, self._converter(field, request))
+            for index, (_, _, field) in enumerate(self.field_map)
+            if field is not None
+        ]
+
+        data = []
+        for row in rows:
+            if converters:
+                row = list(row)
+                for index, convert in converters:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+            data.append(dict(zip(keys, row)))
+        return data
+
+    def serialize(self, queryset, request=None):
+        return self.to_representation(self.values(queryset), request)
+
+    @staticmethod
+    def _converter(field, request):
+        """Fonction de conversion d'une valeur lue en base, identique à `field.to_representation`"""
+        if isinstance(field, drf_fields.FileField):
+            storage = FastListSerializer._storage(field)
+            if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+                return lambda name: name or None
+            if request is not None:
+                return lambda name: request.build_absolute_uri(storage.url(name)) if name else None
+            return lambda name: storage.url(name) if name else None
+
+        if isinstance(field, drf_fields.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is None or output_format.lower() != drf_fields.ISO_8601:
+                return field.to_representation
+            current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+
+            def convert_datetime(value):
+                if current_timezone is not None and timezone.is_aware(value):
+                    value = value.astimezone(current_timezone)
+                value = value.isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+            return convert_datetime
+
+        # Dates et heures
+        default_format = api_settings.DATE_FORMAT if isinstance(field, drf_fields.DateField) else api_settings.TIME_FORMAT
+        output_format = getattr(field, 'format', default_format)
+        if output_format is None or output_format.lower() != drf_fields.ISO_8601:
+            return field.to_representation
+        return lambda value: value.isoformat()
+
+    @staticmethod
+    def _storage(field):
+        """Stockage du fichier, éventuellement lu à travers des relations (ex. etudiant.photo)"""
+        model = field.parent.Meta.model
+        for attr in field.source_attrs[:-1]:
+            model = model._meta.get_field(attr).related_model
+        return model._meta.get_field(field.source_attrs[-1]).storage
+
+
+presence_list = FastListSerializer(PresenceSerializer)
+etudiant_list = FastListSerializer(EtudiantListSerializer)
@@ -0,0 +1,145 @@
+"""
+Pagination de l'API
+
+Le corps des réponses reste une liste (compatible avec le frontend) ; les
+informations de pagination sont transmises dans les en-têtes :
+- `Link` vers la page suivante (rel="next") et la précédente (rel="prev")
+  ou la première (rel="first", pagination par clé) ;
+- `X-Next-Cursor` pour la pagination par clé ;
+- `X-Total-Count` pour la pagination par limite et décalage.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _link_header(links):
+    return ', '.join(f'<{url}>; rel="{rel}"' for rel, url in links if url)
+
+
+class HeaderLimitOffsetPagination(LimitOffsetPagination):
+    """
+    Pagination par limite et décalage (?limit=&offset=), pour les tables de
+    taille bornée (étudiants, classes, parents...)
+
+    Sans `limit` et tant que API_DEFAULT_LIMIT n'est pas défini, la liste
+    complète est retournée comme auparavant.
+    """
+    default_limit = settings.API_DEFAULT_LIMIT
+    max_limit = settings.API_MAX_PAGE_SIZE
+
+    def get_paginated_response(self, data):
+        headers = {'X-Total-Count': str(self.count)}
+        link = _link_header([('next', self.get_next_link()), ('prev', self.get_previous_link())])
+        if link:
+            headers['Link'] = link
+        return Response(data, headers=headers)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par clé sur (`ordering_field` décroissant, ou croissant avec
+    `ascending`, id croissant)
+
+    La page suivante est lue par `WHERE champ <= valeur AND (champ < valeur OR
+    id > dernier id)` (bornes inversées dans l'ordre croissant) sur l'index
+    correspondant : le coût d'une page ne dépend ni de sa position ni de la
+    taille de la table, contrairement à un décalage.
+    La page suivante est indiquée par `?cursor=` (en-têtes Link et X-Next-Cursor).
+    """
+    ordering_field = None
+    ascending = False
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = queryset.model._meta.get_field(self.ordering_field)
+
+        queryset = queryset.order_by(self.ordering_field if self.ascending else f'-{self.ordering_field}', 'id')
+        cursor = self.decode_cursor(request, field)
+        if cursor is not None:
+            value, pk = cursor
+            bound, strict = ('gte', 'gt') if self.ascending else ('lte', 'lt')
+            # La borne large permet à la base de démarrer la lecture de l'index à la bonne position
+            queryset = queryset.filter(**{f'{self.ordering_field}__{bound}': value}).filter(
+                Q(**{f'{self.ordering_field}__{strict}': value}) | Q(id__gt=pk)
+            )
+
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        rows = list(queryset[:self.page_size + 1])
+        page = rows[:self.page_size]
+        self.next_cursor = None
+        if len(rows) > self.page_size:
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(field.value_to_string(last), last.pk)
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, settings.API_MAX_PAGE_SIZE)
+        except (KeyError, ValueError):
+            pass
+        return settings.API_PAGE_SIZE
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            return field.to_python(value), int(pk)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound("Curseur invalide")
+
+    def encode_cursor(self, value, pk):
+        return base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.next_cursor is not None:
+            headers['X-Next-Cursor'] = self.next_cursor
+        link = _link_header([('next', self.get_next_link()), ('first', self.get_first_link())])
+        if link:
+            headers['Link'] = link
+        return Response(data, headers=headers)
+
+
+class PresencePagination(KeysetPagination):
+    """Présences de la plus récente à la plus ancienne"""
+    ordering_field = 'date'
+
+
+class MessagePagination(KeysetPagination):
+    """Messages du plus récent au plus ancien"""
+    ordering_field = 'date_envoi'
+
+
+class ScheduledMessagePagination(KeysetPagination):
+    """Messages programmés, du prochain envoi au plus lointain"""
+    ordering_field = 'date_programmee'
+    ascending = True
+
+
+class RetryQueuePagination(KeysetPagination):
+    """File des nouvelles tentatives, de la plus proche à la plus lointaine"""
+    ordering_field = 'prochaine_tentative'
+    ascending = True
@@ -1,12 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.template import TemplateSyntaxError
+from django.urls import reverse
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from ecole.models import Ecole
 from etudiants.models import Classe, Etudiant, Parent
-from presences.models import Presence, Message
+from presences.models import Presence, Message, MessageTemplate, ExportJob
 from reconnaissance.models import DonneesBiometriques
+from presences.school_calendar import SchoolCalendar
+from presences.services.template_engine import CompiledMessageTemplate
 
 User = get_user_model()
 
@@ -44,6 +48,14 @@ class EcoleSerializer(serializers.ModelSerializer):
         model = Ecole
         fields = '__all__'
 
+    def validate_configuration(self, value):
+        # Vérifier le calendrier scolaire (jours fériés, vacances) avant enregistrement
+        try:
+            SchoolCalendar.from_configuration(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
 # Sérialiseurs pour les classes
 class ClasseSerializer(serializers.ModelSerializer):
     class Meta:
@@ -85,6 +97,11 @@ class EtudiantSerializer(serializers.ModelSerializer):
     def get_classe_nom(self, obj):
         return obj.classe.nom
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Charge la classe avec l'étudiant (classe_nom)"""
+        return queryset.select_related('classe')
+
 class EtudiantListSerializer(serializers.ModelSerializer):
     classe_nom = serializers.ReadOnlyField(source='classe.nom')
     date_naissance = serializers.DateField(format='%Y-%m-%d')
@@ -93,6 +110,11 @@ class EtudiantListSerializer(serializers.ModelSerializer):
         model = Etudiant
         fields = ('id', 'nom', 'prenom', 'classe', 'classe_nom', 'sexe', 'statut', 'photo', 'date_naissance')
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Charge la classe avec l'étudiant, sans les données biométriques ni l'adresse (non sérialisées)"""
+        return queryset.select_related('classe').defer('donnees_biometriques', 'adresse')
+
 class EtudiantDetailSerializer(serializers.ModelSerializer):
     classe = ClasseSerializer(read_only=True)
     date_naissance = serializers.DateField(format='%Y-%m-%d')
@@ -101,6 +123,10 @@ class EtudiantDetailSerializer(serializers.ModelSerializer):
         model = Etudiant
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('classe')
+
 # Sérialiseurs pour les parents
 class ParentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -114,17 +140,36 @@ class ParentDetailSerializer(serializers.ModelSerializer):
         model = Parent
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('etudiant__classe').defer(
+            'etudiant__donnees_biometriques', 'etudiant__adresse'
+        )
+
 # Sérialiseurs pour les présences
 class PresenceSerializer(serializers.ModelSerializer):
     # Ajouter les champs pour les noms d'étudiant et de classe
     etudiant_nom = serializers.ReadOnlyField(source='etudiant.nom')
     etudiant_prenom = serializers.ReadOnlyField(source='etudiant.prenom')
     etudiant_photo = serializers.ImageField(source='etudiant.photo', read_only=True)
-    classe_nom = serializers.ReadOnlyField(source='etudiant.classe.nom')
+    # Classe au moment de la présence (et non la classe actuelle de l'étudiant)
+    classe_nom = serializers.ReadOnlyField(source='classe.nom', default=None)
 
     class Meta:
         model = Presence
         fields = '__all__'
+        # Renseignée à l'enregistrement d'après l'étudiant
+        read_only_fields = ('classe',)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Charge l'étudiant et la classe dans la même requête que les présences ;
+        les données biométriques et l'adresse de l'étudiant ne sont pas lues
+        """
+        return queryset.select_related('etudiant', 'classe').defer(
+            'etudiant__donnees_biometriques', 'etudiant__adresse'
+        )
 
 class PresenceDetailSerializer(serializers.ModelSerializer):
     etudiant = EtudiantListSerializer(read_only=True)
@@ -132,6 +177,34 @@ class PresenceDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Presence
         fields = '__all__'
+        read_only_fields = ('classe',)
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('etudiant__classe', 'classe').defer(
+            'etudiant__donnees_biometriques', 'etudiant__adresse'
+        )
+
+# Sérialiseur des exportations en tâche de fond
+class ExportJobSerializer(serializers.ModelSerializer):
+    type_display = serializers.CharField(source='get_type_display', read_only=True)
+    statut_display = serializers.CharField(source='get_statut_display', read_only=True)
+    telechargement = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = (
+            'id', 'type', 'type_display', 'format', 'parametres', 'statut', 'statut_display',
+            'progression', 'details_erreur', 'date_creation', 'date_debut', 'date_fin', 'telechargement'
+        )
+        read_only_fields = fields
+
+    def get_telechargement(self, obj):
+        if obj.statut != 'termine' or not obj.fichier:
+            return None
+        url = reverse('export_job_download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 # Sérialiseurs pour les messages
 class MessageSerializer(serializers.ModelSerializer):
@@ -147,6 +220,30 @@ class MessageDetailSerializer(serializers.ModelSerializer):
         model = Message
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('parent', 'classe')
+
+class MessageTemplateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MessageTemplate
+        fields = '__all__'
+
+    def validate(self, data):
+        """
+        Vérifie que le sujet et le contenu sont des modèles valides
+        """
+        try:
+            CompiledMessageTemplate(
+                data.get('type', getattr(self.instance, 'type', 'sms')),
+                data.get('contenu', getattr(self.instance, 'contenu', '')),
+                data.get('sujet', getattr(self.instance, 'sujet', None)),
+                data.get('est_html', getattr(self.instance, 'est_html', False))
+            )
+        except TemplateSyntaxError as e:
+            raise serializers.ValidationError({'contenu': f"Modèle invalide: {str(e)}"})
+        return data
+
 class BulkMessageSerializer(serializers.Serializer):
     type = serializers.ChoiceField(choices=Message.TYPE_CHOICES, default='sms')
     sujet = serializers.CharField(max_length=255, required=True)
@@ -11,6 +11,7 @@ router.register(r'etudiants', views.EtudiantViewSet)
 router.register(r'parents', views.ParentViewSet)
 router.register(r'presences', views.PresenceViewSet)
 router.register(r'messages', views.MessageViewSet)
+router.register(r'message-templates', views.MessageTemplateViewSet)
 
 urlpatterns = [
     # Routes d'authentification
@@ -26,6 +27,7 @@ urlpatterns = [
     path('reconnaissance/face/', views.recognize_face, name='recognize_face'),
     path('reconnaissance/reset-model/', views.reset_face_model, name='reset_face_model'),
     path('presences/register/', views.register_attendance, name='register_attendance'),
+    path('presences/live/', views.presences_live, name='presences_live'),
 
     # Routes pour les statistiques
     path('statistiques/presences/jour/', views.presence_count_by_date, name='presence_count_by_date'),
@@ -33,12 +35,19 @@ urlpatterns = [
     path('statistiques/assiduite/etudiants/', views.attendance_rate_by_student, name='attendance_rate_by_student'),
     path('statistiques/alertes/absences/', views.absence_alerts, name='absence_alerts'),
     path('statistiques/presences/aujourd-hui/', views.today_presence_summary, name='today_presence_summary'),
+    path('statistiques/tendances/', views.attendance_trends, name='attendance_trends'),
+    path('statistiques/cache/', views.statistics_cache_stats, name='statistics_cache_stats'),
 
     # Routes pour les exportations
     path('export/presences/jour/', views.export_presence_count_by_date, name='export_presence_count_by_date'),
     path('export/presences/classe/', views.export_presence_count_by_class, name='export_presence_count_by_class'),
     path('export/assiduite/etudiants/', views.export_attendance_rate_by_student, name='export_attendance_rate_by_student'),
     path('export/alertes/absences/', views.export_absence_alerts, name='export_absence_alerts'),
+    path('export/presences/brut/', views.export_presences_raw, name='export_presences_raw'),
+    path('export/donnees/<str:table>/', views.export_table, name='export_table'),
+    path('export/taches/', views.export_jobs, name='export_jobs'),
+    path('export/taches/<int:pk>/', views.export_job_detail, name='export_job_detail'),
+    path('export/taches/<int:pk>/telecharger/', views.export_job_download, name='export_job_download'),
 
     # Inclure les routes du routeur
     path('', include(router.urls)),
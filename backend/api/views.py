@@ -3,10 +3,10 @@ from rest_framework.decorators import api_view, action, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.views import TokenObtainPairView
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
-from django.db.models import Q, Count
+from django.db.models import Q, Count, FilteredRelation
 from django.shortcuts import get_object_or_404
 from datetime import datetime, timedelta
 
@@ -17,10 +17,14 @@ from .serializers import (
     ParentSerializer, ParentDetailSerializer,
     PresenceSerializer, PresenceDetailSerializer,
     MessageSerializer, MessageDetailSerializer, BulkMessageSerializer,
-    DonneesBiometriquesSerializer
+    DonneesBiometriquesSerializer, ExportJobSerializer
 )
+from .conditional import conditional_response
+from .pagination import PresencePagination
+from . import fast_serializers
 from django.conf import settings as django_settings
 import base64
+import functools
 import os
 from django.core.files.base import ContentFile
 
@@ -29,10 +33,13 @@ from django.db.models import Q
 from ecole.models import Ecole
 from etudiants.models import Classe, Etudiant, Parent
 from presences.models import Presence, Message
+from presences.statistics import ATTENDED_STATUTS
 from reconnaissance.models import DonneesBiometriques
 from reconnaissance.services import FaceRecognitionService
 from presences.services import SMSService, EmailService
 from presences.services.message_scheduler import MessageSchedulerService
+from presences.services.retry_service import MessageRetryService
+from presences.services.absence_digest import AbsenceDigestService
 
 User = get_user_model()
 
@@ -75,7 +82,9 @@ class ClasseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def etudiants(self, request, pk=None):
         classe = self.get_object()
-        etudiants = classe.etudiants.all()
+        if django_settings.API_FAST_SERIALIZATION:
+            return Response(fast_serializers.etudiant_list.serialize(classe.etudiants.all()))
+        etudiants = EtudiantListSerializer.setup_eager_loading(classe.etudiants.all())
         serializer = EtudiantListSerializer(etudiants, many=True)
         return Response(serializer.data)
 
@@ -90,6 +99,20 @@ class EtudiantViewSet(viewsets.ModelViewSet):
             return EtudiantDetailSerializer
         return EtudiantSerializer
 
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        if not django_settings.API_FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        serializer = fast_serializers.etudiant_list
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.to_representation(page, request))
+        return Response(serializer.to_representation(queryset, request))
+
     def create(self, request, *args, **kwargs):
         """
         Surcharge de la méthode create pour gérer les erreurs de photo
@@ -152,9 +175,11 @@ class EtudiantViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def presences(self, request, pk=None):
         etudiant = self.get_object()
-        presences = etudiant.presences.all().order_by('-date')
-        serializer = PresenceSerializer(presences, many=True)
-        return Response(serializer.data)
+        paginator = PresencePagination()
+        presences = PresenceSerializer.setup_eager_loading(etudiant.presences.all())
+        page = paginator.paginate_queryset(presences, request, view=self)
+        serializer = PresenceSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post'])
     def register_face(self, request, pk=None):
@@ -197,6 +222,12 @@ class ParentViewSet(viewsets.ModelViewSet):
             return ParentDetailSerializer
         return ParentSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            return ParentDetailSerializer.setup_eager_loading(queryset)
+        return queryset
+
     @action(detail=True, methods=['post'])
     def send_sms(self, request, pk=None):
         parent = self.get_object()
@@ -217,14 +248,14 @@ class ParentViewSet(viewsets.ModelViewSet):
                 statut='envoye'
             )
         else:
-            # Enregistrer l'échec dans la base de données
-            Message.objects.create(
+            # Enregistrer l'échec dans la base de données et programmer une nouvelle tentative
+            failed_message = Message.objects.create(
                 parent=parent,
                 type='sms',
                 contenu=message,
-                statut='echec',
-                details_erreur=result.get('message', '')
+                statut='echec'
             )
+            MessageRetryService.record_failure(failed_message, result.get('message', ''))
 
         return Response(result)
 
@@ -256,15 +287,15 @@ class ParentViewSet(viewsets.ModelViewSet):
                 statut='envoye'
             )
         else:
-            # Enregistrer l'échec dans la base de données
-            Message.objects.create(
+            # Enregistrer l'échec dans la base de données et programmer une nouvelle tentative
+            failed_message = Message.objects.create(
                 parent=parent,
                 type='email',
                 contenu=message,
                 sujet=subject,
-                statut='echec',
-                details_erreur=result.get('message', '')
+                statut='echec'
             )
+            MessageRetryService.record_failure(failed_message, result.get('message', ''))
 
         return Response(result)
 
@@ -386,19 +417,49 @@ class ParentViewSet(viewsets.ModelViewSet):
 
 # Vues pour les présences
 class PresenceViewSet(viewsets.ModelViewSet):
-    queryset = Presence.objects.all().order_by('-date')
+    queryset = Presence.objects.all().order_by('-date', 'id')
+    pagination_class = PresencePagination
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return PresenceDetailSerializer
         return PresenceSerializer
 
+    def get_queryset(self):
+        return self.get_serializer_class().setup_eager_loading(super().get_queryset())
+
+    def list(self, request, *args, **kwargs):
+        build = functools.partial(super().list, request, *args, **kwargs)
+        return conditional_response(request, StatisticsCache.presences_validators(), build)
+
     @action(detail=False, methods=['get'])
     def today(self, request):
         today = timezone.now().date()
-        presences = Presence.objects.filter(date=today)
-        serializer = PresenceSerializer(presences, many=True)
-        return Response(serializer.data)
+
+        def build():
+            if django_settings.API_FAST_SERIALIZATION:
+                return Response(fast_serializers.presence_list.serialize(Presence.objects.filter(date=today)))
+            presences = PresenceSerializer.setup_eager_loading(Presence.objects.filter(date=today))
+            serializer = PresenceSerializer(presences, many=True)
+            return Response(serializer.data)
+
+        return conditional_response(request, StatisticsCache.presences_validators(today), build)
+
+    @action(detail=False, methods=['post'])
+    def absence_digest(self, request):
+        """
+        Envoie le récapitulatif des absences et retards d'une journée (par défaut aujourd'hui)
+        """
+        date = request.data.get('date')
+        if date:
+            try:
+                date = datetime.strptime(date, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'error': 'Format de date invalide (YYYY-MM-DD)'},
+                               status=status.HTTP_400_BAD_REQUEST)
+
+        result = AbsenceDigestService.run(date=date, force=bool(request.data.get('force', False)))
+        return Response(result)
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -407,37 +468,52 @@ class PresenceViewSet(viewsets.ModelViewSet):
         start_of_week = today - timedelta(days=today.weekday())
         end_of_week = start_of_week + timedelta(days=6)
 
-        # Présences par jour de la semaine
+        # Présences par jour de la semaine (une requête groupée par date)
+        counts_by_day = dict(
+            Presence.objects.filter(
+                date__gte=start_of_week,
+                date__lte=end_of_week,
+                statut__in=ATTENDED_STATUTS
+            )
+            .values('date')
+            .annotate(count=Count('id'))
+            .values_list('date', 'count')
+        )
         presences_par_jour = []
         for i in range(7):
             day = start_of_week + timedelta(days=i)
-            count = Presence.objects.filter(date=day).count()
             presences_par_jour.append({
                 'jour': day.strftime('%A'),
                 'date': day.strftime('%Y-%m-%d'),
-                'count': count
+                'count': counts_by_day.get(day, 0)
             })
 
-        # Taux de présence par classe
-        classes = Classe.objects.all()
+        # Taux de présence par classe : effectif et présents du jour en une seule requête,
+        # la jointure sur les présences étant limitée à la journée
+        classes = (
+            Classe.objects
+            .annotate(presences_du_jour=FilteredRelation(
+                'etudiants__presences',
+                condition=Q(etudiants__presences__date=today)
+            ))
+            .annotate(
+                total_etudiants=Count('etudiants'),
+                presents_today=Count('presences_du_jour', filter=Q(presences_du_jour__statut='present'))
+            )
+            .order_by('id')
+        )
         taux_par_classe = []
         for classe in classes:
-            total_etudiants = classe.etudiants.count()
-            if total_etudiants > 0:
-                presents_today = Presence.objects.filter(
-                    etudiant__classe=classe,
-                    date=today,
-                    statut='present'
-                ).count()
-                taux = (presents_today / total_etudiants) * 100
+            if classe.total_etudiants > 0:
+                taux = (classe.presents_today / classe.total_etudiants) * 100
             else:
                 taux = 0
 
             taux_par_classe.append({
                 'classe': classe.nom,
                 'taux': taux,
-                'presents': presents_today,
-                'total': total_etudiants
+                'presents': classe.presents_today,
+                'total': classe.total_etudiants
             })
 
         return Response({
@@ -446,11 +522,17 @@ class PresenceViewSet(viewsets.ModelViewSet):
         })
 
 # Vues pour les messages
-from .views_messages import MessageViewSet
+from .views_messages import MessageViewSet, MessageTemplateViewSet
+from .views_live import presences_live
 
 # Vues pour les statistiques et exportations
 from presences.statistics import PresenceStatisticsService
+from presences.analytics import AttendanceAnalytics, academic_year_bounds, current_academic_year
+from presences.cache import StatisticsCache
 from presences.exports import ExportService
+from presences.bulk_export import BulkExportService
+from presences.export_jobs import ExportJobService
+from presences.models import ExportJob
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -476,13 +558,22 @@ def presence_count_by_date(request):
             return Response({'error': 'Format de date invalide pour end_date (YYYY-MM-DD)'},
                            status=status.HTTP_400_BAD_REQUEST)
 
-    result = PresenceStatisticsService.get_presence_count_by_date(
-        start_date=start_date,
-        end_date=end_date,
-        classe_id=classe_id
-    )
+    def build():
+        result = StatisticsCache.get_or_set(
+            'presence_count_by_date',
+            {'classe_id': classe_id},
+            lambda: PresenceStatisticsService.get_presence_count_by_date(
+                start_date=start_date,
+                end_date=end_date,
+                classe_id=classe_id
+            ),
+            start_date=start_date,
+            end_date=end_date,
+            classe_id=classe_id
+        )
+        return Response(list(result))
 
-    return Response(list(result))
+    return conditional_response(request, StatisticsCache.validators(start_date, end_date, classe_id), build)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -507,12 +598,20 @@ def presence_count_by_class(request):
             return Response({'error': 'Format de date invalide pour end_date (YYYY-MM-DD)'},
                            status=status.HTTP_400_BAD_REQUEST)
 
-    result = PresenceStatisticsService.get_presence_count_by_class(
-        start_date=start_date,
-        end_date=end_date
-    )
+    def build():
+        result = StatisticsCache.get_or_set(
+            'presence_count_by_class',
+            {},
+            lambda: list(PresenceStatisticsService.get_presence_count_by_class(
+                start_date=start_date,
+                end_date=end_date
+            )),
+            start_date=start_date,
+            end_date=end_date
+        )
+        return Response(result)
 
-    return Response(list(result))
+    return conditional_response(request, StatisticsCache.validators(start_date, end_date), build)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -538,13 +637,22 @@ def attendance_rate_by_student(request):
             return Response({'error': 'Format de date invalide pour end_date (YYYY-MM-DD)'},
                            status=status.HTTP_400_BAD_REQUEST)
 
-    result = PresenceStatisticsService.get_attendance_rate_by_student(
-        start_date=start_date,
-        end_date=end_date,
-        classe_id=classe_id
-    )
+    def build():
+        result = StatisticsCache.get_or_set(
+            'attendance_rate_by_student',
+            {'classe_id': classe_id},
+            lambda: PresenceStatisticsService.get_attendance_rate_by_student(
+                start_date=start_date,
+                end_date=end_date,
+                classe_id=classe_id
+            ),
+            start_date=start_date,
+            end_date=end_date,
+            classe_id=classe_id
+        )
+        return Response(result)
 
-    return Response(result)
+    return conditional_response(request, StatisticsCache.validators(start_date, end_date, classe_id), build)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -562,12 +670,21 @@ def absence_alerts(request):
         return Response({'error': 'Valeurs invalides pour threshold ou days'},
                        status=status.HTTP_400_BAD_REQUEST)
 
-    result = PresenceStatisticsService.get_absence_alerts(
-        threshold=threshold,
-        days=days
-    )
+    start_date = timezone.now().date() - timedelta(days=days)
+
+    def build():
+        result = StatisticsCache.get_or_set(
+            'absence_alerts',
+            {'threshold': threshold, 'days': days},
+            lambda: PresenceStatisticsService.get_absence_alerts(
+                threshold=threshold,
+                days=days
+            ),
+            start_date=start_date
+        )
+        return Response(result)
 
-    return Response(result)
+    return conditional_response(request, StatisticsCache.validators(start_date), build)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -575,8 +692,67 @@ def today_presence_summary(request):
     """
     Récupère un résumé des présences du jour
     """
-    result = PresenceStatisticsService.get_today_presence_summary()
-    return Response(result)
+    today = timezone.now().date()
+
+    def build():
+        result = StatisticsCache.get_or_set(
+            'today_presence_summary',
+            {},
+            PresenceStatisticsService.get_today_presence_summary,
+            start_date=today,
+            end_date=today
+        )
+        return Response(result)
+
+    return conditional_response(request, StatisticsCache.validators(today, today), build)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def statistics_cache_stats(request):
+    """
+    Nombre de succès et d'échecs du cache des statistiques par endpoint
+    """
+    return Response(StatisticsCache.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def attendance_trends(request):
+    """
+    Tendances de présence d'une année scolaire : taux glissants, profils par jour
+    de la semaine, agrégats par classe et absences chroniques
+    """
+    annee_scolaire = request.query_params.get('annee_scolaire')
+    classe_id = request.query_params.get('classe_id')
+
+    try:
+        window = int(request.query_params.get('window', 20))
+        streak = int(request.query_params.get('streak', 3))
+        if classe_id:
+            classe_id = int(classe_id)
+        if window < 1 or streak < 1:
+            raise ValueError
+    except ValueError:
+        return Response({'error': 'Valeurs invalides pour window, streak ou classe_id'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start_date, end_date = academic_year_bounds(annee_scolaire or current_academic_year())
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    def build():
+        try:
+            result = AttendanceAnalytics.get_trends(
+                annee_scolaire=annee_scolaire,
+                window=window,
+                classe_id=classe_id,
+                streak_threshold=streak
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+    return conditional_response(request, StatisticsCache.validators(start_date, end_date, classe_id), build)
 
 # Vues pour l'exportation des données
 @api_view(['GET'])
@@ -708,6 +884,112 @@ def export_absence_alerts(request):
     except ValueError as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_presences_raw(request):
+    """
+    Exporte toutes les présences d'une année scolaire (CSV en flux, Excel ou PDF)
+    """
+    annee_scolaire = request.query_params.get('annee_scolaire')
+    classe_id = request.query_params.get('classe_id')
+    # `format` est réservé par DRF à la négociation du rendu
+    export_format = request.query_params.get('export_format', 'csv')
+
+    try:
+        return ExportService.export_presences_raw(
+            annee_scolaire=annee_scolaire,
+            classe_id=classe_id,
+            format=export_format
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_table(request, table):
+    """
+    Exporte une table brute (presences, etudiants, classes, messages) pour l'analyse de données
+
+    Parquet si pyarrow est installé, sinon NDJSON compressé (export_format=ndjson pour le forcer).
+    start_date et end_date restreignent les présences et les messages à une période.
+    """
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+    # `format` est réservé par DRF à la négociation du rendu
+    export_format = request.query_params.get('export_format')
+
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return Response({'error': 'Format de date invalide (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return BulkExportService.export(table, format=export_format, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+# Vues pour les exportations en tâche de fond
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def export_jobs(request):
+    """
+    GET : dernières exportations de l'utilisateur
+    POST : lance une exportation en tâche de fond (type, format et paramètres du rapport)
+
+    Une demande identique sur des données inchangées retourne l'exportation
+    existante (200) au lieu d'en créer une nouvelle (202).
+    """
+    if request.method == 'GET':
+        jobs = ExportJob.objects.filter(cree_par=request.user)[:20]
+        return Response(ExportJobSerializer(jobs, many=True, context={'request': request}).data)
+
+    # `format` est réservé par DRF à la négociation du rendu dans l'URL, pas dans le corps
+    parametres = {key: value for key, value in request.data.items() if key not in ('type', 'format')}
+    try:
+        job, reused = ExportJobService.submit(
+            type=request.data.get('type'),
+            format=request.data.get('format', 'xlsx'),
+            parametres=parametres,
+            user=request.user
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(
+        ExportJobSerializer(job, context={'request': request}).data,
+        status=status.HTTP_200_OK if reused else status.HTTP_202_ACCEPTED
+    )
+
+def _get_export_job(request, pk):
+    """Exportation de l'utilisateur (toutes pour un membre du personnel), ou 404"""
+    jobs = ExportJob.objects.all() if request.user.is_staff else ExportJob.objects.filter(cree_par=request.user)
+    return get_object_or_404(jobs, pk=pk)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_detail(request, pk):
+    """
+    État et avancement d'une exportation
+    """
+    job = _get_export_job(request, pk)
+    return Response(ExportJobSerializer(job, context={'request': request}).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_download(request, pk):
+    """
+    Télécharge le fichier d'une exportation terminée
+    """
+    job = _get_export_job(request, pk)
+    if job.statut != 'termine':
+        return Response({'error': "L'exportation n'est pas terminée", 'statut': job.statut},
+                       status=status.HTTP_409_CONFLICT)
+    if not job.fichier or not os.path.exists(job.fichier):
+        return Response({'error': "Le fichier de l'exportation a expiré"}, status=status.HTTP_410_GONE)
+
+    return FileResponse(open(job.fichier, 'rb'), as_attachment=True, filename=ExportJobService.download_name(job))
+
 # Vues pour les paramètres
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
@@ -837,7 +1119,7 @@ def recognize_face(request):
 @permission_classes([IsAuthenticated])
 def register_attendance(request):
     student_id = request.data.get('student_id')
-    status = request.data.get('status', 'present')
+    statut = request.data.get('status', 'present')
 
     if not student_id:
         return Response({'error': 'ID étudiant non fourni'}, status=status.HTTP_400_BAD_REQUEST)
@@ -852,13 +1134,13 @@ def register_attendance(request):
             date=today,
             defaults={
                 'heure_arrivee': timezone.now().time(),
-                'statut': status
+                'statut': statut
             }
         )
 
         if not created:
             # Mettre à jour le statut si l'étudiant a déjà été marqué
-            presence.statut = status
+            presence.statut = statut
             presence.save()
 
             return Response({
@@ -869,10 +1151,11 @@ def register_attendance(request):
             })
 
         # Si l'étudiant est absent ou en retard, envoyer une notification aux parents
-        if status in ['absent', 'retard']:
+        # (sauf si le récapitulatif quotidien s'en charge après l'heure limite)
+        if statut in ['absent', 'retard'] and not django_settings.ABSENCE_DIGEST_ENABLED:
             for parent in etudiant.parents.filter(notifications_sms=True):
                 sms_service = SMSService()
-                if status == 'absent':
+                if statut == 'absent':
                     sms_service.send_absence_notification(parent, etudiant, today.strftime('%d/%m/%Y'))
                 else:
                     sms_service.send_late_notification(parent, etudiant, today.strftime('%d/%m/%Y'), presence.heure_arrivee.strftime('%H:%M'))
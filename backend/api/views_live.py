@@ -0,0 +1,103 @@
+"""
+Flux des présences en direct (Server-Sent Events)
+
+Le navigateur ouvre une seule connexion (EventSource) et reçoit les
+événements de presences/live.py au lieu de relire périodiquement
+`/presences/today/` et `/statistiques/presences/aujourd-hui/`.
+
+EventSource ne permet pas d'envoyer l'en-tête Authorization : le jeton
+d'accès JWT peut être passé dans `?token=`. Sous ASGI, une connexion ne
+mobilise aucun thread ; sous WSGI (serveur de développement), elle occupe un
+thread tant qu'elle reste ouverte. Chaque connexion est fermée après
+LIVE_FEED_MAX_SECONDS et le navigateur se reconnecte de lui-même.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from presences.live import LiveFeed
+
+# Délai de reconnexion conseillé au navigateur, en millisecondes
+RETRY_MS = 3000
+
+
+def _authenticate(request):
+    """Utilisateur du jeton JWT (en-tête Authorization ou paramètre token), ou None"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if raw_token is None and request.GET.get('token'):
+        raw_token = request.GET['token'].encode()
+    if raw_token is None:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _opening():
+    return f"retry: {RETRY_MS}\n\n" + LiveFeed.format({'type': 'ready', 'date': str(timezone.now().date())})
+
+
+def _next(subscriber, event):
+    """Texte à envoyer pour un événement (ou l'absence d'événement) reçu par l'abonné"""
+    if subscriber.lagging:
+        # File débordée : les événements en attente sont remplacés par une demande de relecture
+        subscriber.lagging = False
+        subscriber.drain()
+        return LiveFeed.format({'type': 'resync', 'date': str(timezone.now().date())})
+    if event is None:
+        # Commentaire de maintien : détecte les connexions fermées par le client
+        return ": ping\n\n"
+    return LiveFeed.format(event)
+
+
+async def _async_stream():
+    subscriber = LiveFeed.subscribe_async()
+    deadline = time.monotonic() + settings.LIVE_FEED_MAX_SECONDS
+    try:
+        yield _opening()
+        while time.monotonic() < deadline:
+            event = await subscriber.get(settings.LIVE_FEED_HEARTBEAT_SECONDS)
+            yield _next(subscriber, event)
+    finally:
+        LiveFeed.unsubscribe(subscriber)
+
+
+def _stream():
+    subscriber = LiveFeed.subscribe()
+    deadline = time.monotonic() + settings.LIVE_FEED_MAX_SECONDS
+    try:
+        yield _opening()
+        while time.monotonic() < deadline:
+            event = subscriber.get(settings.LIVE_FEED_HEARTBEAT_SECONDS)
+            yield _next(subscriber, event)
+    finally:
+        LiveFeed.unsubscribe(subscriber)
+
+
+async def presences_live(request):
+    """
+    Flux des présences en direct : événements `ready`, `presence` et `resync`
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Méthode non autorisée'}, status=405)
+
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'detail': "Informations d'authentification non fournies ou invalides"}, status=401)
+
+    stream = _async_stream() if isinstance(request, ASGIRequest) else _stream()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -3,30 +3,47 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils import timezone
 from django.db.models import Q
-from datetime import timedelta
 
-from etudiants.models import Classe
-from presences.models import Message
+from etudiants.models import Parent
+from presences.cache import StatisticsCache
+from presences.models import Message, MessageTemplate
 from presences.services.message_scheduler import MessageSchedulerService
-from .serializers import MessageSerializer, MessageDetailSerializer
+from presences.services.message_stats import MessageStatisticsService
+from presences.services.retry_service import MessageRetryService, get_circuit_breaker
+from presences.services.template_engine import TemplateEngine
+from .conditional import conditional_response
+from .pagination import MessagePagination, RetryQueuePagination, ScheduledMessagePagination
+from .serializers import MessageSerializer, MessageDetailSerializer, MessageTemplateSerializer
 
 class MessageViewSet(viewsets.ModelViewSet):
-    queryset = Message.objects.all().order_by('-date_envoi')
+    queryset = Message.objects.all().order_by('-date_envoi', 'id')
+    pagination_class = MessagePagination
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return MessageDetailSerializer
         return MessageSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            return MessageDetailSerializer.setup_eager_loading(queryset)
+        return queryset
+
+    def _paginated(self, messages):
+        """Page de messages, du plus récent au plus ancien"""
+        page = self.paginate_queryset(messages)
+        serializer = MessageSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'])
     def by_parent(self, request):
         parent_id = request.query_params.get('parent_id')
         if not parent_id:
             return Response({'error': 'ID du parent non fourni'}, status=status.HTTP_400_BAD_REQUEST)
 
-        messages = Message.objects.filter(parent_id=parent_id).order_by('-date_envoi')
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = Message.objects.filter(parent_id=parent_id)
+        return self._paginated(messages)
 
     @action(detail=False, methods=['get'])
     def by_classe(self, request):
@@ -34,24 +51,21 @@ class MessageViewSet(viewsets.ModelViewSet):
         if not classe_id:
             return Response({'error': 'ID de la classe non fourni'}, status=status.HTTP_400_BAD_REQUEST)
 
-        messages = Message.objects.filter(classe_id=classe_id, est_message_groupe=True).order_by('-date_envoi')
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = Message.objects.filter(classe_id=classe_id, est_message_groupe=True)
+        return self._paginated(messages)
 
     @action(detail=False, methods=['get'])
     def bulk_messages(self, request):
-        messages = Message.objects.filter(est_message_groupe=True).order_by('-date_envoi')
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = Message.objects.filter(est_message_groupe=True)
+        return self._paginated(messages)
         
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_class=ScheduledMessagePagination)
     def scheduled(self, request):
         """
-        Récupère tous les messages programmés
+        Récupère les messages programmés, du prochain envoi au plus lointain (par pages)
         """
-        messages = Message.objects.filter(statut='programme').order_by('date_programmee')
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        messages = Message.objects.filter(statut='programme', date_programmee__isnull=False)
+        return self._paginated(messages)
         
     @action(detail=False, methods=['post'])
     def process_scheduled(self, request):
@@ -60,6 +74,46 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         result = MessageSchedulerService.process_scheduled_messages()
         return Response(result)
+
+    @action(detail=False, methods=['get'], pagination_class=RetryQueuePagination)
+    def retry_queue(self, request):
+        """
+        Récupère les messages en échec en attente d'une nouvelle tentative (par pages)
+        """
+        messages = Message.objects.filter(
+            statut='echec',
+            prochaine_tentative__isnull=False
+        )
+        page = self.paginate_queryset(messages)
+        return self.get_paginated_response({
+            'messages': MessageSerializer(page, many=True).data,
+            'circuit_breakers': [get_circuit_breaker(provider).to_dict() for provider, _ in Message.TYPE_CHOICES]
+        })
+
+    @action(detail=False, methods=['get'])
+    def dead_letters(self, request):
+        """
+        Récupère les messages abandonnés après épuisement des tentatives
+        """
+        messages = Message.objects.filter(statut='abandonne')
+        return self._paginated(messages)
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        """
+        Remet un message en échec ou abandonné dans la file des nouvelles tentatives
+        """
+        message = self.get_object()
+        if message.statut not in ('echec', 'abandonne'):
+            return Response({'error': 'Seuls les messages en échec ou abandonnés peuvent être renvoyés'},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+        MessageRetryService.requeue(message)
+
+        return Response({
+            'success': True,
+            'message': 'Message remis dans la file des nouvelles tentatives'
+        })
         
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
@@ -85,53 +139,46 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         Récupère les statistiques des messages
         """
-        # Statistiques générales
-        total_messages = Message.objects.count()
-        total_sms = Message.objects.filter(type='sms').count()
-        total_email = Message.objects.filter(type='email').count()
-        
-        # Statistiques par statut
-        status_counts = {
-            'envoye': Message.objects.filter(statut='envoye').count(),
-            'echec': Message.objects.filter(statut='echec').count(),
-            'programme': Message.objects.filter(statut='programme').count(),
-            'en_attente': Message.objects.filter(statut='en_attente').count(),
-            'brouillon': Message.objects.filter(statut='brouillon').count()
-        }
-        
-        # Taux de lecture des emails
-        total_emails_sent = Message.objects.filter(type='email', statut='envoye').count()
-        emails_read = Message.objects.filter(type='email', statut='envoye', est_lu=True).count()
-        read_rate = (emails_read / total_emails_sent * 100) if total_emails_sent > 0 else 0
-        
-        # Messages par classe
-        messages_by_class = []
-        for classe in Classe.objects.all():
-            count = Message.objects.filter(classe=classe, est_message_groupe=True).count()
-            messages_by_class.append({
-                'classe': classe.nom,
-                'count': count
-            })
-        
-        # Messages par jour (30 derniers jours)
-        today = timezone.now().date()
-        start_date = today - timedelta(days=30)
-        messages_by_day = []
-        
-        for i in range(31):
-            day = start_date + timedelta(days=i)
-            count = Message.objects.filter(date_envoi__date=day).count()
-            messages_by_day.append({
-                'date': day.strftime('%Y-%m-%d'),
-                'count': count
-            })
-        
+        return conditional_response(
+            request,
+            StatisticsCache.messages_validators(),
+            lambda: Response(MessageStatisticsService.get_stats())
+        )
+
+
+class MessageTemplateViewSet(viewsets.ModelViewSet):
+    queryset = MessageTemplate.objects.all().order_by('nom')
+    serializer_class = MessageTemplateSerializer
+
+    @action(detail=False, methods=['get'])
+    def by_type(self, request):
+        template_type = request.query_params.get('type')
+        if not template_type:
+            return Response({'error': 'Type de modèle non fourni'}, status=status.HTTP_400_BAD_REQUEST)
+
+        templates = MessageTemplate.objects.filter(type=template_type).order_by('nom')
+        serializer = MessageTemplateSerializer(templates, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def preview(self, request, pk=None):
+        """
+        Rend le modèle pour un parent donné (aperçu avant envoi)
+        """
+        parent_id = request.query_params.get('parent_id')
+        if not parent_id:
+            return Response({'error': 'ID du parent non fourni'}, status=status.HTTP_400_BAD_REQUEST)
+
+        template = self.get_object()
+        parent = Parent.objects.select_related('etudiant__classe').filter(id=parent_id).first()
+        if parent is None:
+            return Response({'error': 'Parent non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+
+        rendered = TemplateEngine.compile(template).render(
+            TemplateEngine.parent_context(parent, date=timezone.now().date().strftime('%d/%m/%Y'))
+        )
         return Response({
-            'total_messages': total_messages,
-            'total_sms': total_sms,
-            'total_email': total_email,
-            'status_counts': status_counts,
-            'read_rate': read_rate,
-            'messages_by_class': messages_by_class,
-            'messages_by_day': messages_by_day
+            'sujet': rendered.subject,
+            'contenu': rendered.text,
+            'contenu_html': rendered.html
         })
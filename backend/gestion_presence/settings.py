@@ -133,8 +133,20 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Les présences et les messages sont paginés par clé (voir api/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.HeaderLimitOffsetPagination',
 }
 
+# Pagination : taille des pages des présences et des messages, taille maximale
+# demandée par ?limit=, et limite par défaut des autres listes (vide : liste complète)
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', 100))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 1000))
+API_DEFAULT_LIMIT = int(os.getenv('API_DEFAULT_LIMIT')) if os.getenv('API_DEFAULT_LIMIT') else None
+
+# Sérialisation rapide (api/fast_serializers.py) des présences du jour et des
+# listes d'étudiants ; False pour revenir aux sérialiseurs DRF
+API_FAST_SERIALIZATION = os.getenv('API_FAST_SERIALIZATION', 'True') == 'True'
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:8080,http://localhost:5173,http://localhost:5174,http://localhost:5175').split(',')
 CORS_ALLOW_CREDENTIALS = True
@@ -157,7 +169,12 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    # Requêtes conditionnelles (api/conditional.py)
+    'if-none-match',
+    'if-modified-since',
 ]
+# En-têtes de pagination et validateurs des réponses lisibles par le frontend
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor', 'X-Total-Count', 'ETag', 'Last-Modified']
 
 # JWT settings
 SIMPLE_JWT = {
@@ -183,13 +200,130 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@ecoleapp.com')
 
+# Transport asynchrone des notifications
+# En mode simulation, les SMS et emails sont journalisés au lieu d'être envoyés
+NOTIFICATIONS_SIMULATION = os.getenv('NOTIFICATIONS_SIMULATION', 'True') == 'True'
+# Nombre maximal de livraisons en vol par envoi groupé
+NOTIFICATIONS_MAX_CONCURRENCY = int(os.getenv('NOTIFICATIONS_MAX_CONCURRENCY', 500))
+NOTIFICATIONS_HTTP_TIMEOUT = int(os.getenv('NOTIFICATIONS_HTTP_TIMEOUT', 30))
+# Nombre de connexions SMTP ouvertes en parallèle pour les envois groupés
+EMAIL_MAX_CONNECTIONS = int(os.getenv('EMAIL_MAX_CONNECTIONS', 10))
+
+# Nouvelles tentatives d'envoi des messages en échec (délais en secondes)
+MESSAGE_RETRY_MAX_ATTEMPTS = int(os.getenv('MESSAGE_RETRY_MAX_ATTEMPTS', 5))
+MESSAGE_RETRY_BASE_DELAY = int(os.getenv('MESSAGE_RETRY_BASE_DELAY', 60))
+MESSAGE_RETRY_MAX_DELAY = int(os.getenv('MESSAGE_RETRY_MAX_DELAY', 3600))
+
+# Disjoncteur par fournisseur (SMS, email) : nombre d'échecs consécutifs avant ouverture
+# et durée d'ouverture en secondes
+MESSAGE_CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('MESSAGE_CIRCUIT_BREAKER_THRESHOLD', 5))
+MESSAGE_CIRCUIT_BREAKER_TIMEOUT = int(os.getenv('MESSAGE_CIRCUIT_BREAKER_TIMEOUT', 300))
+# Taille des lots de messages individuels envoyés en parallèle par la tâche des messages
+# programmés ; le disjoncteur est consulté avant chaque lot
+MESSAGE_SEND_CHUNK_SIZE = int(os.getenv('MESSAGE_SEND_CHUNK_SIZE', 100))
+
+# Récapitulatif quotidien des absences : après l'heure limite, les absences et retards
+# du jour sont notifiés en un seul message par parent au lieu d'une notification immédiate
+ABSENCE_DIGEST_ENABLED = os.getenv('ABSENCE_DIGEST_ENABLED', 'True') == 'True'
+ABSENCE_DIGEST_CUTOFF = os.getenv('ABSENCE_DIGEST_CUTOFF', '10:00')
+# Intervalle en minutes (moins de 60) des récapitulatifs de rattrapage, jusqu'à la fin de la
+# journée, pour les absences et retards enregistrés après l'heure limite
+ABSENCE_DIGEST_CATCHUP_MINUTES = int(os.getenv('ABSENCE_DIGEST_CATCHUP_MINUTES', 15))
+
+# Alertes d'absence : fenêtre glissante en jours, seuil de présence en pourcentage et
+# nombre minimal de journées enregistrées dans la fenêtre avant de pouvoir alerter
+ABSENCE_ALERT_WINDOW_DAYS = int(os.getenv('ABSENCE_ALERT_WINDOW_DAYS', 30))
+ABSENCE_ALERT_THRESHOLD = float(os.getenv('ABSENCE_ALERT_THRESHOLD', 70))
+ABSENCE_ALERT_MIN_DAYS = int(os.getenv('ABSENCE_ALERT_MIN_DAYS', 5))
+
+# Cache des résultats statistiques, invalidé à chaque écriture de présence. Ses
+# versions servent aussi d'ETag aux listes et statistiques de l'API.
+# 'locmem' garde un cache par processus ; 'file' le partage entre les processus du
+# serveur et les tâches cron, ce qui est nécessaire pour que l'invalidation les
+# atteigne tous. Les requêtes conditionnelles (ETag, 304) ne sont activées qu'avec
+# un cache partagé : en 'locmem', un processus ne voit pas les écritures des autres.
+STATISTICS_CACHE_ALIAS = 'statistics'
+STATISTICS_CACHE_BACKEND = os.getenv('STATISTICS_CACHE_BACKEND', 'locmem')
+STATISTICS_CACHE_TIMEOUT = int(os.getenv('STATISTICS_CACHE_TIMEOUT', 600))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    STATISTICS_CACHE_ALIAS: {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache'
+            if STATISTICS_CACHE_BACKEND == 'file'
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': (
+            os.getenv('STATISTICS_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'statistiques'))
+            if STATISTICS_CACHE_BACKEND == 'file'
+            else 'statistiques'
+        ),
+        'TIMEOUT': STATISTICS_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('STATISTICS_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+# Analyses de tendance : premier mois de l'année scolaire et nombre d'années
+# dont la matrice de présences reste en mémoire dans chaque processus
+ACADEMIC_YEAR_START_MONTH = int(os.getenv('ACADEMIC_YEAR_START_MONTH', 9))
+ANALYTICS_MATRIX_CACHE_SIZE = int(os.getenv('ANALYTICS_MATRIX_CACHE_SIZE', 2))
+
+# Exportations : nombre de lignes lues en base à la fois lors d'un export en flux
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+# Exportations PDF : lignes par tableau et taille au-delà de laquelle le fichier passe sur disque
+EXPORT_PDF_ROWS_PER_TABLE = int(os.getenv('EXPORT_PDF_ROWS_PER_TABLE', 100))
+EXPORT_SPOOL_MAX_SIZE = int(os.getenv('EXPORT_SPOOL_MAX_SIZE', 5 * 1024 * 1024))
+
+# Exportations en tâche de fond : dossier des fichiers produits, durée de
+# réutilisation d'un fichier et exécution dans un thread du processus web
+# (sinon uniquement par la tâche cron process_export_jobs)
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', os.path.join(MEDIA_ROOT, 'exports'))
+EXPORT_ARTIFACT_TTL_HOURS = int(os.getenv('EXPORT_ARTIFACT_TTL_HOURS', 24))
+EXPORT_JOBS_IN_THREAD = os.getenv('EXPORT_JOBS_IN_THREAD', 'True') == 'True'
+
+# Flux des présences en direct (presences/live.py) : broker Redis partagé par les
+# processus serveur (ex. redis://localhost:6379/0, vide : diffusion dans le
+# processus uniquement), intervalle des messages de maintien de la connexion,
+# durée d'une connexion avant reconnexion du navigateur et taille de la file
+# d'un abonné au-delà de laquelle il doit relire les listes
+LIVE_FEED_BROKER_URL = os.getenv('LIVE_FEED_BROKER_URL', '')
+LIVE_FEED_HEARTBEAT_SECONDS = int(os.getenv('LIVE_FEED_HEARTBEAT_SECONDS', 15))
+LIVE_FEED_MAX_SECONDS = int(os.getenv('LIVE_FEED_MAX_SECONDS', 600))
+LIVE_FEED_QUEUE_SIZE = int(os.getenv('LIVE_FEED_QUEUE_SIZE', 100))
+
 # Configuration des tâches cron
+_digest_hour, _digest_minute = ABSENCE_DIGEST_CUTOFF.split(':')
 CRONJOBS = [
     # Exécuter le traitement des messages programmés toutes les 5 minutes
     ('*/5 * * * *', 'presences.cron.process_scheduled_messages', '>> /tmp/scheduled_messages.log'),
 
     # Exécuter le traitement des messages programmés tous les jours à minuit
     ('0 0 * * *', 'presences.cron.process_scheduled_messages', '>> /tmp/scheduled_messages_daily.log'),
+
+    # Envoyer le récapitulatif des absences à l'heure limite, du lundi au vendredi, puis
+    # les rattrapages (absences et retards enregistrés après l'heure limite)
+    (
+        f'{int(_digest_minute)}-59/{ABSENCE_DIGEST_CATCHUP_MINUTES} {int(_digest_hour)} * * 1-5',
+        'presences.cron.send_absence_digest', '>> /tmp/absence_digest.log'
+    ),
+    *(
+        [(
+            f'*/{ABSENCE_DIGEST_CATCHUP_MINUTES} {int(_digest_hour) + 1}-23 * * 1-5',
+            'presences.cron.send_absence_digest', '>> /tmp/absence_digest.log'
+        )]
+        if int(_digest_hour) < 23 else []
+    ),
+
+    # Décaler chaque nuit la fenêtre glissante des alertes d'absence
+    ('5 0 * * *', 'presences.cron.slide_absence_windows', '>> /tmp/absence_alerts.log'),
+
+    # Exécuter les exportations en attente et supprimer les fichiers expirés chaque minute
+    ('* * * * *', 'presences.cron.process_export_jobs', '>> /tmp/export_jobs.log'),
 ]
 
 # Format de date pour les logs cron
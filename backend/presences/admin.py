@@ -1,10 +1,13 @@
 from django.contrib import admin
-from .models import Presence, Message
+from .models import (
+    Presence, DailyAttendanceSummary, AttendanceWindow, AbsenceAlert, CircuitBreakerState, ExportJob, Message,
+    MessageTemplate
+)
 
 @admin.register(Presence)
 class PresenceAdmin(admin.ModelAdmin):
     list_display = ('etudiant', 'date', 'statut', 'heure_arrivee', 'notification_envoyee')
-    list_filter = ('date', 'statut', 'notification_envoyee')
+    list_filter = ('date', 'statut', 'classe', 'notification_envoyee')
     search_fields = ('etudiant__nom', 'etudiant__prenom', 'commentaire')
     date_hierarchy = 'date'
 
@@ -21,6 +24,46 @@ class PresenceAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(DailyAttendanceSummary)
+class DailyAttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('date', 'classe', 'presents', 'retards', 'absents', 'departs_anticipes', 'effectif')
+    list_filter = ('classe',)
+    date_hierarchy = 'date'
+    # Tenu à jour automatiquement ; `manage.py rebuild_attendance_summary` pour le recalculer
+    readonly_fields = ('date', 'classe', 'presents', 'retards', 'absents', 'departs_anticipes', 'effectif', 'updated_at')
+
+
+@admin.register(AttendanceWindow)
+class AttendanceWindowAdmin(admin.ModelAdmin):
+    list_display = ('etudiant', 'fin_fenetre', 'jours_presents', 'jours_enregistres', 'jours_ouvres', 'taux')
+    search_fields = ('etudiant__nom', 'etudiant__prenom')
+    # Tenu à jour automatiquement ; `manage.py rebuild_absence_windows` pour le recalculer
+    readonly_fields = (
+        'etudiant', 'fin_fenetre', 'jours_presents', 'jours_enregistres', 'jours_ouvres', 'taux', 'updated_at'
+    )
+
+
+@admin.register(AbsenceAlert)
+class AbsenceAlertAdmin(admin.ModelAdmin):
+    list_display = ('etudiant', 'taux', 'seuil', 'est_active', 'date_declenchement', 'date_resolution')
+    list_filter = ('est_active', 'date_declenchement')
+    search_fields = ('etudiant__nom', 'etudiant__prenom')
+    readonly_fields = ('etudiant', 'taux', 'seuil', 'date_declenchement', 'date_resolution')
+
+
+@admin.register(CircuitBreakerState)
+class CircuitBreakerStateAdmin(admin.ModelAdmin):
+    list_display = ('fournisseur', 'echecs', 'ouvert_jusqua', 'updated_at')
+    # Tenu à jour par l'envoi des messages
+    readonly_fields = ('fournisseur', 'echecs', 'ouvert_jusqua', 'updated_at')
+
+
+@admin.register(MessageTemplate)
+class MessageTemplateAdmin(admin.ModelAdmin):
+    list_display = ('nom', 'code', 'type', 'est_html', 'date_modification')
+    list_filter = ('type', 'est_html')
+    search_fields = ('nom', 'code', 'sujet', 'contenu')
+
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
@@ -68,3 +111,12 @@ class MessageAdmin(admin.ModelAdmin):
             )
 
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('type', 'format', 'statut', 'progression', 'cree_par', 'date_creation', 'date_fin')
+    list_filter = ('type', 'format', 'statut')
+    date_hierarchy = 'date_creation'
+    readonly_fields = (
+        'type', 'format', 'parametres', 'empreinte', 'statut', 'progression', 'fichier',
+        'details_erreur', 'cree_par', 'date_creation', 'date_debut', 'date_fin'
+    )
@@ -0,0 +1,318 @@
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Exists, F, FloatField, Max, Min, OuterRef, PositiveIntegerField, Q, Value, When
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .cache import StatisticsCache
+from .models import ATTENDED_STATUTS, Presence, AttendanceWindow, AbsenceAlert
+from .school_calendar import SchoolCalendar
+from etudiants.models import Etudiant
+
+logger = logging.getLogger(__name__)
+
+# Jours comptés dans une fenêtre : jours de classe écoulés, ou journées enregistrées
+# si elles sont plus nombreuses (sorties, samedis) pour que le taux ne dépasse pas 100 %
+JOURS = Greatest(F('jours_ouvres'), F('jours_enregistres'))
+
+# Taux de présence d'une fenêtre, calculé en base à partir de ses compteurs
+TAUX = Case(
+    When(
+        Q(jours_ouvres__gt=0) | Q(jours_enregistres__gt=0),
+        then=Cast(F('jours_presents'), FloatField()) * Value(100.0) / Cast(JOURS, FloatField())
+    ),
+    default=Value(None),
+    output_field=FloatField()
+)
+
+
+class AbsenceAlertService:
+    """
+    Moteur d'alertes d'absence sur fenêtre glissante
+
+    Chaque étudiant a une fenêtre des ABSENCE_ALERT_WINDOW_DAYS derniers jours :
+    nombre de journées enregistrées et nombre de journées où il est venu. Une
+    écriture de présence ajuste ces compteurs et réévalue aussitôt l'étudiant ;
+    une alerte est déclenchée dès que son taux passe sous le seuil et résolue
+    dès qu'il repasse au-dessus. Chaque nuit, `slide` retire de toutes les
+    fenêtres la journée sortie de la période.
+
+    Le taux est rapporté aux jours de classe écoulés (calendrier scolaire),
+    comptés jusqu'à la veille depuis la mise en service (première présence
+    enregistrée) et l'inscription de l'étudiant : un étudiant qui ne vient
+    jamais, sans aucune présence enregistrée, est à 0 %. Les alertes et la
+    liste des étudiants sous un seuil lisent ce même taux, à partir de
+    ABSENCE_ALERT_MIN_DAYS jours comptés.
+    """
+
+    @staticmethod
+    def window_start(end_date):
+        """Première journée de la fenêtre se terminant à `end_date`"""
+        return end_date - timedelta(days=settings.ABSENCE_ALERT_WINDOW_DAYS - 1)
+
+    @staticmethod
+    def _enough_days():
+        """Fenêtres comptant au moins ABSENCE_ALERT_MIN_DAYS jours"""
+        return Q(jours_ouvres__gte=settings.ABSENCE_ALERT_MIN_DAYS) | Q(
+            jours_enregistres__gte=settings.ABSENCE_ALERT_MIN_DAYS
+        )
+
+    @staticmethod
+    def _update_working_days(date):
+        """
+        Recalcule les jours de classe (`jours_ouvres`) des fenêtres se terminant à `date`
+
+        Les jours sont comptés jusqu'à la veille : la journée en cours n'est comptée
+        qu'une fois enregistrée. Une mise à jour en masse par jour d'inscription dans
+        la fenêtre, et une pour les étudiants inscrits avant.
+        """
+        windows = AttendanceWindow.objects.all()
+        first_recorded = Presence.objects.aggregate(first=Min('date'))['first']
+        if first_recorded is None:
+            windows.update(jours_ouvres=0)
+            return
+
+        calendar = SchoolCalendar.from_ecole()
+        last_day = date - timedelta(days=1)
+        since = max(AbsenceAlertService.window_start(date), first_recorded)
+
+        def day_start(day):
+            return timezone.make_aware(datetime.combine(day, time.min))
+
+        windows.filter(etudiant__created_at__lt=day_start(since + timedelta(days=1))).update(
+            jours_ouvres=calendar.working_days(since, last_day)
+        )
+        day = since + timedelta(days=1)
+        while day <= date:
+            windows.filter(
+                etudiant__created_at__gte=day_start(day), etudiant__created_at__lt=day_start(day + timedelta(days=1))
+            ).update(jours_ouvres=calendar.working_days(day, last_day))
+            day += timedelta(days=1)
+        # Inscrits après la fin de la fenêtre (reconstruction d'une date passée)
+        windows.filter(etudiant__created_at__gte=day_start(max(since, date) + timedelta(days=1))).update(jours_ouvres=0)
+
+    @staticmethod
+    def record(etudiant_id, date, recorded_delta, attended_delta):
+        """
+        Reporte une écriture de présence dans la fenêtre de l'étudiant et le réévalue
+
+        Args:
+            etudiant_id (int): Identifiant de l'étudiant
+            date (date): Journée de la présence
+            recorded_delta (int): Écart du nombre de journées enregistrées
+            attended_delta (int): Écart du nombre de journées où l'étudiant est venu
+        """
+        if isinstance(date, str):
+            date = parse_date(date)
+        today = timezone.localdate()
+        if date is None or not AbsenceAlertService.window_start(today) <= date <= today:
+            return
+
+        window, _ = AttendanceWindow.objects.get_or_create(etudiant_id=etudiant_id, defaults={'fin_fenetre': today})
+        windows = AttendanceWindow.objects.filter(pk=window.pk)
+        windows.update(
+            jours_enregistres=Greatest(F('jours_enregistres') + recorded_delta, Value(0)),
+            jours_presents=Greatest(F('jours_presents') + attended_delta, Value(0)),
+            updated_at=timezone.now()
+        )
+        windows.update(taux=TAUX)
+        AbsenceAlertService.evaluate(windows)
+
+    @staticmethod
+    def record_bulk(etudiant_ids, date, attended=False):
+        """
+        Reporte en une fois des présences créées en masse (bulk_create), une par étudiant
+
+        Args:
+            etudiant_ids (list): Identifiants des étudiants
+            date (date): Journée des présences
+            attended (bool): Présences d'étudiants venus en classe
+        """
+        today = timezone.localdate()
+        if not etudiant_ids or not AbsenceAlertService.window_start(today) <= date <= today:
+            return
+
+        AttendanceWindow.objects.bulk_create(
+            [AttendanceWindow(etudiant_id=etudiant_id, fin_fenetre=today) for etudiant_id in etudiant_ids],
+            ignore_conflicts=True,
+            batch_size=1000
+        )
+        windows = AttendanceWindow.objects.filter(etudiant_id__in=etudiant_ids)
+        windows.update(
+            jours_enregistres=F('jours_enregistres') + 1,
+            jours_presents=F('jours_presents') + (1 if attended else 0),
+            updated_at=timezone.now()
+        )
+        windows.update(taux=TAUX)
+        AbsenceAlertService.evaluate(windows)
+
+    @staticmethod
+    def evaluate(windows):
+        """
+        Déclenche ou résout les alertes des fenêtres données
+
+        Returns:
+            tuple: (alertes déclenchées, alertes résolues)
+        """
+        threshold = settings.ABSENCE_ALERT_THRESHOLD
+        active_alerts = AbsenceAlert.objects.filter(etudiant_id=OuterRef('etudiant_id'), est_active=True)
+
+        below = (
+            windows.filter(AbsenceAlertService._enough_days())
+            .filter(taux__lt=threshold, etudiant__statut='actif')
+            .filter(~Exists(active_alerts))
+            .values_list('etudiant_id', 'taux')
+        )
+        alerts = AbsenceAlert.objects.bulk_create(
+            [AbsenceAlert(etudiant_id=etudiant_id, taux=taux, seuil=threshold) for etudiant_id, taux in below],
+            batch_size=500
+        )
+        for alert in alerts:
+            logger.warning(
+                f"Alerte d'absence: étudiant {alert.etudiant_id} à {alert.taux:.1f}% de présence "
+                f"(seuil {threshold}%)"
+            )
+
+        recovered = windows.filter(Q(taux__gte=threshold) | Q(taux__isnull=True)).values('etudiant_id')
+        resolved = AbsenceAlert.objects.filter(est_active=True, etudiant_id__in=recovered).update(
+            est_active=False, date_resolution=timezone.now()
+        )
+        return len(alerts), resolved
+
+    @staticmethod
+    def slide(date=None):
+        """
+        Décale toutes les fenêtres pour qu'elles se terminent à `date` (aujourd'hui par défaut)
+
+        Les journées sorties de la fenêtre sont retirées des compteurs par des
+        mises à jour en masse et les jours de classe sont recomptés ; les
+        étudiants inscrits depuis le dernier décalage reçoivent leur fenêtre.
+        Les fenêtres sont reconstruites si elles n'existent pas encore ou n'ont
+        pas été décalées depuis plus d'une fenêtre.
+
+        Returns:
+            dict: Résultat du traitement
+        """
+        date = date or timezone.localdate()
+        last_end = AttendanceWindow.objects.aggregate(last_end=Max('fin_fenetre'))['last_end']
+        if last_end is None or (date - last_end).days >= settings.ABSENCE_ALERT_WINDOW_DAYS:
+            return AbsenceAlertService.rebuild(date)
+        if last_end >= date:
+            return {'success': True, 'message': "Fenêtres déjà à jour", 'triggered': 0, 'resolved': 0}
+
+        with transaction.atomic():
+            first_expired = AbsenceAlertService.window_start(last_end)
+            for offset in range((date - last_end).days):
+                expired = Presence.objects.filter(date=first_expired + timedelta(days=offset))
+                attended = expired.filter(etudiant_id=OuterRef('etudiant_id'), statut__in=ATTENDED_STATUTS)
+                AttendanceWindow.objects.filter(etudiant_id__in=expired.values('etudiant_id')).update(
+                    jours_enregistres=Greatest(F('jours_enregistres') - 1, Value(0)),
+                    jours_presents=Case(
+                        When(Exists(attended), then=Greatest(F('jours_presents') - 1, Value(0))),
+                        default=F('jours_presents'),
+                        output_field=PositiveIntegerField()
+                    ),
+                    updated_at=timezone.now()
+                )
+            AttendanceWindow.objects.bulk_create(
+                [
+                    AttendanceWindow(etudiant_id=etudiant_id, fin_fenetre=date)
+                    for etudiant_id in Etudiant.objects.filter(fenetre_presence__isnull=True).values_list('id', flat=True)
+                ],
+                ignore_conflicts=True,
+                batch_size=1000
+            )
+            AbsenceAlertService._update_working_days(date)
+            AttendanceWindow.objects.update(fin_fenetre=date, taux=TAUX)
+
+        triggered, resolved = AbsenceAlertService.evaluate(AttendanceWindow.objects.all())
+        StatisticsCache.bump_global()
+        return {
+            'success': True,
+            'message': f"Fenêtres décalées au {date}: {triggered} alertes déclenchées, {resolved} résolues",
+            'triggered': triggered,
+            'resolved': resolved
+        }
+
+    @staticmethod
+    def rebuild(date=None):
+        """
+        Recalcule toutes les fenêtres se terminant à `date` à partir des présences
+
+        Comme pour les écritures au fil de l'eau, les présences postérieures à
+        `date` jusqu'à aujourd'hui sont comptées : `slide` n'a ensuite qu'à
+        retirer les journées sorties de la fenêtre.
+        """
+        date = date or timezone.localdate()
+        counts = {
+            row['etudiant_id']: row
+            for row in Presence.objects.filter(
+                date__gte=AbsenceAlertService.window_start(date), date__lte=max(date, timezone.localdate())
+            )
+            .values('etudiant_id')
+            .annotate(
+                enregistres=Count('id'),
+                presents=Count('id', filter=Q(statut__in=ATTENDED_STATUTS))
+            )
+            .order_by()
+        }
+
+        with transaction.atomic():
+            AttendanceWindow.objects.all().delete()
+            AttendanceWindow.objects.bulk_create(
+                [
+                    AttendanceWindow(
+                        etudiant_id=etudiant_id,
+                        fin_fenetre=date,
+                        jours_enregistres=counts.get(etudiant_id, {}).get('enregistres', 0),
+                        jours_presents=counts.get(etudiant_id, {}).get('presents', 0)
+                    )
+                    for etudiant_id in Etudiant.objects.values_list('id', flat=True)
+                ],
+                batch_size=1000
+            )
+            AbsenceAlertService._update_working_days(date)
+            AttendanceWindow.objects.update(taux=TAUX)
+
+        triggered, resolved = AbsenceAlertService.evaluate(AttendanceWindow.objects.all())
+        StatisticsCache.bump_global()
+        return {
+            'success': True,
+            'message': f"Fenêtres reconstruites au {date}: {triggered} alertes déclenchées, {resolved} résolues",
+            'triggered': triggered,
+            'resolved': resolved
+        }
+
+    @staticmethod
+    def students_below(threshold):
+        """
+        Étudiants actifs dont le taux sur la fenêtre est sous le seuil
+
+        Lecture de l'index des taux, avec les mêmes conditions que le déclenchement
+        des alertes (au moins ABSENCE_ALERT_MIN_DAYS jours comptés).
+
+        Returns:
+            list: Même format que `PresenceStatisticsService.get_attendance_rate_by_student`
+        """
+        windows = (
+            AttendanceWindow.objects.filter(AbsenceAlertService._enough_days())
+            .filter(taux__lt=threshold, etudiant__statut='actif')
+            .select_related('etudiant__classe')
+            .order_by('-taux', 'etudiant_id')
+        )
+        return [
+            {
+                'etudiant_id': window.etudiant_id,
+                'etudiant_nom': window.etudiant.nom,
+                'etudiant_prenom': window.etudiant.prenom,
+                'classe_nom': window.etudiant.classe.nom if window.etudiant.classe else None,
+                'presence_count': window.jours_presents,
+                'working_days': max(window.jours_ouvres, window.jours_enregistres),
+                'attendance_rate': round(window.taux, 2)
+            }
+            for window in windows
+        ]
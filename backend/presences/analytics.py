@@ -0,0 +1,363 @@
+"""
+Analyses de tendance sur une matrice de présences étudiants × jours
+
+Les présences d'une année scolaire sont chargées en une seule requête lue
+par blocs dans une matrice NumPy de statuts (int8, une ligne par étudiant,
+une colonne par jour). Taux glissants, séries d'absences consécutives,
+profils par jour de la semaine et agrégats par classe sont ensuite calculés
+sur toute la matrice sans boucle par étudiant.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date as date_type, timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Presence, DailyAttendanceSummary
+from .school_calendar import SchoolCalendar
+from etudiants.models import Classe, Etudiant
+
+# Code de chaque statut dans la matrice (0 : aucune présence enregistrée)
+NON_RENSEIGNE = 0
+STATUT_CODES = {'present': 1, 'retard': 2, 'absent': 3, 'depart_anticipe': 4}
+
+# Table de correspondance code -> étudiant venu en classe
+ATTENDED = np.array([False, True, True, False, True])
+
+JOURS = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+
+
+def academic_year_bounds(annee_scolaire):
+    """Première et dernière journée d'une année scolaire ('2025-2026')"""
+    try:
+        first_year = int(str(annee_scolaire).split('-')[0])
+    except ValueError:
+        raise ValueError(f"Année scolaire invalide: {annee_scolaire} (format attendu: 2025-2026)")
+    start_month = settings.ACADEMIC_YEAR_START_MONTH
+    start_date = date_type(first_year, start_month, 1)
+    end_date = date_type(first_year + 1, start_month, 1) - timedelta(days=1)
+    return start_date, end_date
+
+
+def current_academic_year(today=None):
+    """Année scolaire en cours, au format '2025-2026'"""
+    today = today or timezone.now().date()
+    first_year = today.year if today.month >= settings.ACADEMIC_YEAR_START_MONTH else today.year - 1
+    return f"{first_year}-{first_year + 1}"
+
+
+def _rolling_sum(values, window):
+    """Somme glissante sur le dernier axe (fenêtres complètes uniquement)"""
+    cumulative = np.cumsum(values, axis=-1, dtype=np.int64)
+    padding = np.zeros(values.shape[:-1] + (1,), dtype=np.int64)
+    cumulative = np.concatenate([padding, cumulative], axis=-1)
+    return cumulative[..., window:] - cumulative[..., :-window]
+
+
+class AttendanceMatrix:
+    """
+    Matrice des statuts de présence d'une période
+
+    Les lignes sont triées par classe : les agrégats par classe sont des
+    réductions sur des tranches contiguës de lignes. Les colonnes couvrent
+    tous les jours de la période ; `working` indique les jours de classe déjà
+    écoulés, seuls pris en compte dans les taux.
+    """
+
+    def __init__(self, start_date, end_date, student_ids, classe_ids, statuts, working):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.student_ids = student_ids
+        self.classe_ids = classe_ids
+        self.statuts = statuts
+        self.working = working
+        self.weekdays = (np.arange(statuts.shape[1]) + start_date.weekday()) % 7
+        self.classes, self.class_starts, self.class_sizes = np.unique(
+            classe_ids, return_index=True, return_counts=True
+        )
+
+    @classmethod
+    def load(cls, start_date, end_date, calendar=None, chunk_size=20000):
+        """
+        Charge les présences d'une période
+
+        Args:
+            start_date (date): Première journée
+            end_date (date): Dernière journée
+            calendar (SchoolCalendar, optional): Calendrier scolaire (celui de l'école par défaut)
+            chunk_size (int): Nombre de présences lues et copiées dans la matrice à la fois
+        """
+        calendar = calendar or SchoolCalendar.from_ecole()
+        students = np.array(
+            Etudiant.objects.order_by('classe_id', 'id').values_list('id', 'classe_id'), dtype=np.int64
+        ).reshape(-1, 2)
+        student_ids, classe_ids = students[:, 0], students[:, 1]
+
+        n_days = (end_date - start_date).days + 1
+        statuts = np.zeros((len(student_ids), n_days), dtype=np.int8)
+
+        # Ligne de chaque étudiant, indexée par identifiant
+        row_of = np.full(int(student_ids.max(initial=0)) + 1, -1, dtype=np.int64)
+        row_of[student_ids] = np.arange(len(student_ids))
+
+        origin = start_date.toordinal()
+        presences = (
+            Presence.objects.filter(date__gte=start_date, date__lte=end_date)
+            .values_list('etudiant_id', 'date', 'statut')
+            .iterator(chunk_size=chunk_size)
+        )
+        while True:
+            chunk = list(islice(presences, chunk_size))
+            if not chunk:
+                break
+            etudiants = np.fromiter((row[0] for row in chunk), dtype=np.int64, count=len(chunk))
+            days = np.fromiter((row[1].toordinal() - origin for row in chunk), dtype=np.int64, count=len(chunk))
+            codes = np.fromiter(
+                (STATUT_CODES.get(row[2], NON_RENSEIGNE) for row in chunk), dtype=np.int8, count=len(chunk)
+            )
+            # Ignorer les étudiants créés après la lecture de la liste des étudiants
+            known = etudiants < len(row_of)
+            rows = row_of[etudiants[known]]
+            statuts[rows, days[known]] = codes[known]
+
+        # Jours de classe déjà écoulés
+        last_day = min(end_date, timezone.now().date())
+        working = np.fromiter(
+            (
+                day <= last_day and calendar.is_working_day(day)
+                for day in (start_date + timedelta(days=offset) for offset in range(n_days))
+            ),
+            dtype=bool,
+            count=n_days
+        )
+        return cls(start_date, end_date, student_ids, classe_ids, statuts, working)
+
+    @property
+    def working_dates(self):
+        """Dates des jours de classe écoulés"""
+        return [self.start_date + timedelta(days=int(offset)) for offset in np.flatnonzero(self.working)]
+
+    def attended(self):
+        """Matrice booléenne des étudiants venus, restreinte aux jours de classe"""
+        return ATTENDED[self.statuts[:, self.working]]
+
+    def attendance_rates(self):
+        """Taux de présence de chaque étudiant sur la période (entre 0 et 1)"""
+        attended = self.attended()
+        if attended.shape[1] == 0:
+            return np.zeros(len(self.student_ids))
+        return attended.mean(axis=1)
+
+    def rolling_rates(self, window):
+        """
+        Taux de présence glissant de chaque étudiant
+
+        Returns:
+            ndarray: (étudiants × jours) taux sur les `window` derniers jours de
+            classe, à partir du `window`-ième jour de classe
+        """
+        attended = self.attended()
+        if attended.shape[1] < window:
+            return np.zeros((len(self.student_ids), 0))
+        return _rolling_sum(attended, window) / window
+
+    def absence_streaks(self):
+        """
+        Séries de jours de classe consécutifs sans venir en classe
+
+        Un jour de classe sans présence enregistrée compte comme une absence.
+
+        Returns:
+            tuple: (plus longue série, série en cours) pour chaque étudiant
+        """
+        absent = ~self.attended()
+        if absent.shape[1] == 0:
+            empty = np.zeros(len(self.student_ids), dtype=np.int64)
+            return empty, empty
+        count = np.cumsum(absent, axis=1, dtype=np.int64)
+        # Valeur du compteur au dernier jour de présence, propagée vers la droite
+        last_reset = np.maximum.accumulate(np.where(absent, 0, count), axis=1)
+        streaks = count - last_reset
+        return streaks.max(axis=1), streaks[:, -1]
+
+    def class_counts(self, values):
+        """Somme des lignes de chaque classe (classes × colonnes)"""
+        if len(self.student_ids) == 0:
+            return np.zeros((0,) + values.shape[1:], dtype=np.int64)
+        return np.add.reduceat(values.astype(np.int64), self.class_starts, axis=0)
+
+    def class_daily_rates(self):
+        """Taux de présence de chaque classe pour chaque jour de classe"""
+        return self.class_counts(self.attended()) / self.class_sizes[:, None]
+
+    def class_rolling_rates(self, window):
+        """Taux de présence glissant de chaque classe (classes × jours)"""
+        counts = self.class_counts(self.attended())
+        if counts.shape[1] < window:
+            return np.zeros((len(self.classes), 0))
+        return _rolling_sum(counts, window) / (self.class_sizes[:, None] * window)
+
+    def weekday_rates(self):
+        """
+        Taux de présence par jour de la semaine
+
+        Returns:
+            tuple: (taux global par jour, taux par classe et par jour), NaN pour
+            un jour de la semaine sans jour de classe
+        """
+        attended = self.attended()
+        weekdays = self.weekdays[self.working]
+        class_counts = self.class_counts(attended)
+
+        overall = np.full(7, np.nan)
+        by_class = np.full((len(self.classes), 7), np.nan)
+        for weekday in np.unique(weekdays):
+            columns = weekdays == weekday
+            overall[weekday] = attended[:, columns].mean()
+            by_class[:, weekday] = class_counts[:, columns].sum(axis=1) / (self.class_sizes * columns.sum())
+        return overall, by_class
+
+
+class AttendanceAnalytics:
+    """
+    Service d'analyse des tendances de présence
+
+    La matrice de chaque année scolaire reste en mémoire dans le processus
+    (ANALYTICS_MATRIX_CACHE_SIZE années au plus). Elle est rechargée lorsque
+    les résumés quotidiens de l'année, la liste des étudiants ou le
+    calendrier scolaire ont changé.
+    """
+
+    _cache = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _version(start_date, end_date, calendar):
+        summaries = DailyAttendanceSummary.objects.filter(date__gte=start_date, date__lte=end_date).aggregate(
+            count=Count('id'), updated=Max('updated_at')
+        )
+        students = Etudiant.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+        return (
+            summaries['count'], summaries['updated'],
+            students['count'], students['updated'],
+            calendar.holidays, tuple(calendar.vacations),
+            min(end_date, timezone.now().date()),
+        )
+
+    @classmethod
+    def get_matrix(cls, annee_scolaire=None):
+        """Matrice des présences d'une année scolaire (l'année en cours par défaut)"""
+        annee_scolaire = annee_scolaire or current_academic_year()
+        start_date, end_date = academic_year_bounds(annee_scolaire)
+        calendar = SchoolCalendar.from_ecole()
+        version = cls._version(start_date, end_date, calendar)
+
+        with cls._lock:
+            cached = cls._cache.get(annee_scolaire)
+            if cached is not None and cached[0] == version:
+                cls._cache.move_to_end(annee_scolaire)
+                return cached[1]
+
+        matrix = AttendanceMatrix.load(start_date, end_date, calendar)
+        with cls._lock:
+            cls._cache[annee_scolaire] = (version, matrix)
+            cls._cache.move_to_end(annee_scolaire)
+            while len(cls._cache) > settings.ANALYTICS_MATRIX_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        return matrix
+
+    @staticmethod
+    def _percent(value):
+        return None if np.isnan(value) else round(float(value) * 100, 2)
+
+    @staticmethod
+    def _weekday_dict(rates):
+        return {JOURS[weekday]: AttendanceAnalytics._percent(rates[weekday]) for weekday in range(5)}
+
+    @classmethod
+    def get_trends(cls, annee_scolaire=None, window=20, classe_id=None, streak_threshold=3):
+        """
+        Tendances de présence d'une année scolaire
+
+        Args:
+            annee_scolaire (str, optional): Année scolaire ('2025-2026'), l'année en cours par défaut
+            window (int): Nombre de jours de classe des taux glissants
+            classe_id (int, optional): Restreindre les résultats à une classe
+            streak_threshold (int): Nombre de jours d'absence consécutifs d'un absentéisme chronique
+
+        Returns:
+            dict: Taux globaux, par jour de la semaine, par classe et absences chroniques
+        """
+        annee_scolaire = annee_scolaire or current_academic_year()
+        matrix = cls.get_matrix(annee_scolaire)
+        dates = matrix.working_dates
+
+        rates = matrix.attendance_rates()
+        longest, current = matrix.absence_streaks()
+        weekday_overall, weekday_by_class = matrix.weekday_rates()
+        class_rates = matrix.class_counts(matrix.attended()).sum(axis=1) / np.maximum(
+            matrix.class_sizes * len(dates), 1
+        )
+        class_rolling = matrix.class_rolling_rates(window)
+        rolling_dates = dates[window - 1:] if class_rolling.shape[1] else []
+
+        selected = np.ones(len(matrix.classes), dtype=bool)
+        if classe_id:
+            selected = matrix.classes == int(classe_id)
+        class_names = dict(Classe.objects.filter(id__in=matrix.classes[selected].tolist()).values_list('id', 'nom'))
+
+        classes = []
+        for index in np.flatnonzero(selected):
+            classe = int(matrix.classes[index])
+            classes.append({
+                'classe_id': classe,
+                'classe_nom': class_names.get(classe),
+                'effectif': int(matrix.class_sizes[index]),
+                'attendance_rate': cls._percent(class_rates[index]),
+                'weekday_rates': cls._weekday_dict(weekday_by_class[index]),
+                'rolling_rates': [
+                    {'date': day, 'rate': cls._percent(rate)}
+                    for day, rate in zip(rolling_dates, class_rolling[index])
+                ],
+            })
+
+        # Absences chroniques : série en cours au moins égale au seuil
+        chronic = current >= streak_threshold
+        if classe_id:
+            chronic &= matrix.classe_ids == int(classe_id)
+        chronic_rows = np.flatnonzero(chronic)
+        chronic_rows = chronic_rows[np.argsort(-current[chronic_rows], kind='stable')]
+        students = {
+            student['id']: student
+            for student in Etudiant.objects.filter(id__in=matrix.student_ids[chronic_rows].tolist())
+            .values('id', 'nom', 'prenom', 'classe__nom')
+        }
+        chronic_absences = []
+        for row in chronic_rows:
+            student = students.get(int(matrix.student_ids[row]))
+            if student is None:
+                continue
+            chronic_absences.append({
+                'etudiant_id': student['id'],
+                'etudiant_nom': student['nom'],
+                'etudiant_prenom': student['prenom'],
+                'classe_nom': student['classe__nom'],
+                'attendance_rate': cls._percent(rates[row]),
+                'current_streak': int(current[row]),
+                'longest_streak': int(longest[row]),
+            })
+
+        return {
+            'annee_scolaire': annee_scolaire,
+            'start_date': matrix.start_date,
+            'end_date': matrix.end_date,
+            'working_days': len(dates),
+            'attendance_rate': cls._percent(rates.mean()) if len(rates) and len(dates) else None,
+            'weekday_rates': cls._weekday_dict(weekday_overall),
+            'classes': classes,
+            'chronic_absences': chronic_absences,
+        }
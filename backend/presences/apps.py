@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class PresencesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'presences'
+
+    def ready(self):
+        # Mise à jour des résumés quotidiens à chaque écriture de présence
+        from . import signals  # noqa: F401
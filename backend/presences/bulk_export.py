@@ -0,0 +1,182 @@
+"""
+Exportation brute des tables pour l'analyse de données
+
+Chaque table est lue par blocs de EXPORT_CHUNK_SIZE lignes, en avançant sur
+la clé primaire (WHERE id > dernier id ORDER BY id LIMIT n) : la mémoire
+reste constante quel que soit l'historique, y compris avec les pilotes qui
+chargent tout le résultat d'une requête (MySQL). Le format est Parquet si
+pyarrow est installé, sinon du NDJSON compressé en gzip envoyé en flux.
+"""
+import datetime
+import json
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.db import models
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Presence, Message
+from etudiants.models import Classe, Etudiant
+
+# Format colonnaire (optionnel) : à défaut, NDJSON compressé
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# Tables exportables : modèle, colonnes et champ date utilisé pour filtrer une période.
+# Les photos et les données biométriques des étudiants ne sont pas exportées.
+TABLES = {
+    'presences': (
+        Presence,
+        ['id', 'etudiant_id', 'classe_id', 'date', 'statut', 'heure_arrivee', 'heure_depart',
+         'notification_envoyee', 'commentaire', 'created_at', 'updated_at'],
+        'date',
+    ),
+    'etudiants': (
+        Etudiant,
+        ['id', 'nom', 'prenom', 'date_naissance', 'sexe', 'classe_id', 'statut', 'created_at', 'updated_at'],
+        None,
+    ),
+    'classes': (
+        Classe,
+        ['id', 'nom', 'niveau', 'annee_scolaire', 'created_at', 'updated_at'],
+        None,
+    ),
+    'messages': (
+        Message,
+        ['id', 'parent_id', 'type', 'statut', 'sujet', 'contenu', 'date_envoi', 'date_programmee',
+         'est_message_groupe', 'classe_id', 'est_lu', 'date_lecture', 'tentatives', 'template_id'],
+        'date_envoi',
+    ),
+}
+
+
+class BulkExportService:
+    """Exportation des tables brutes (Parquet ou NDJSON gzip)"""
+
+    @staticmethod
+    def default_format():
+        return 'parquet' if PYARROW_AVAILABLE else 'ndjson'
+
+    @staticmethod
+    def export(table, format=None, start_date=None, end_date=None):
+        """
+        Exporte une table entière, ou la période donnée pour les présences et les messages
+
+        Raises:
+            ValueError: Table ou format non supporté
+        """
+        if table not in TABLES:
+            raise ValueError(f"Table non supportée: {table} (tables disponibles: {', '.join(TABLES)})")
+        format = format or BulkExportService.default_format()
+        if format == 'parquet' and not PYARROW_AVAILABLE:
+            raise ValueError("Le format parquet nécessite pyarrow (utilisez ndjson)")
+        if format not in ('parquet', 'ndjson'):
+            raise ValueError(f"Format d'exportation non supporté: {format}")
+
+        model, fields, date_field = TABLES[table]
+        queryset = model.objects.all()
+        if date_field:
+            # Bornes en datetime pour les champs DateTime, afin d'utiliser un index sur le champ
+            is_datetime = isinstance(model._meta.get_field(date_field), models.DateTimeField)
+            if start_date:
+                queryset = queryset.filter(**{f'{date_field}__gte': BulkExportService._bound(start_date, is_datetime)})
+            if end_date:
+                end = end_date + datetime.timedelta(days=1)
+                queryset = queryset.filter(**{f'{date_field}__lt': BulkExportService._bound(end, is_datetime)})
+
+        filename = f"{table}_{timezone.now().date()}"
+        if format == 'parquet':
+            return BulkExportService._to_parquet(model, fields, queryset, filename)
+        return BulkExportService._to_ndjson(fields, queryset, filename)
+
+    @staticmethod
+    def chunks(queryset, fields):
+        """Lignes (tuples) par blocs de EXPORT_CHUNK_SIZE, par clé primaire croissante"""
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+        pk_index = fields.index('id')
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list(*fields)[:chunk_size])
+            if not chunk:
+                return
+            yield chunk
+            last_pk = chunk[-1][pk_index]
+
+    @staticmethod
+    def _to_ndjson(fields, queryset, filename):
+        def stream():
+            compressor = zlib.compressobj(wbits=31)  # en-tête gzip
+            for chunk in BulkExportService.chunks(queryset, fields):
+                lines = ''.join(
+                    json.dumps(dict(zip(fields, row)), default=BulkExportService._json_default, ensure_ascii=False) + '\n'
+                    for row in chunk
+                )
+                data = compressor.compress(lines.encode('utf-8'))
+                if data:
+                    yield data
+            yield compressor.flush()
+
+        response = StreamingHttpResponse(stream(), content_type='application/gzip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.ndjson.gz"'
+        return response
+
+    @staticmethod
+    def _to_parquet(model, fields, queryset, filename):
+        schema = pa.schema([
+            (name, BulkExportService._arrow_type(model._meta.get_field(name)))
+            for name in fields
+        ])
+
+        # Fichier temporaire supprimé à la fermeture de la réponse ; un groupe de lignes par bloc
+        output = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_SIZE)
+        with pq.ParquetWriter(output, schema, compression='snappy') as writer:
+            for chunk in BulkExportService.chunks(queryset, fields):
+                columns = list(zip(*chunk))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema
+                ))
+        output.seek(0)
+
+        return FileResponse(
+            output, as_attachment=True, filename=f'{filename}.parquet', content_type='application/vnd.apache.parquet'
+        )
+
+    @staticmethod
+    def _arrow_type(field):
+        """Type Arrow d'un champ Django (clé étrangère : type de la clé primaire référencée)"""
+        if field.is_relation:
+            field = field.target_field
+        if isinstance(field, models.BooleanField):
+            return pa.bool_()
+        if isinstance(field, (models.AutoField, models.IntegerField)):
+            return pa.int64()
+        if isinstance(field, models.FloatField):
+            return pa.float64()
+        if isinstance(field, models.DateTimeField):
+            return pa.timestamp('us', tz='UTC')
+        if isinstance(field, models.DateField):
+            return pa.date32()
+        if isinstance(field, models.TimeField):
+            return pa.time64('us')
+        return pa.string()
+
+    @staticmethod
+    def _bound(day, is_datetime):
+        if is_datetime:
+            return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        return day
+
+    @staticmethod
+    def _json_default(value):
+        # Dates, heures et horodatages au format ISO 8601
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        return str(value)
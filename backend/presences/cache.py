@@ -0,0 +1,260 @@
+"""
+Cache des résultats des statistiques de présence
+
+Chaque résultat est stocké sous une clé construite à partir du nom de
+l'endpoint, de ses paramètres et des versions des journées (et de la classe)
+dont il dépend. Une écriture de présence incrémente la version de sa journée
+et de sa classe : les résultats concernés ne sont plus jamais relus, sans
+avoir à retrouver ni supprimer les entrées correspondantes. Une version
+globale couvre les changements d'étudiants, de classes et du calendrier.
+
+Chaque écriture incrémente aussi la version de son mois : une période de
+plusieurs jours dépend des versions de ses mois (13 lectures pour une année
+au lieu de 366), au prix d'une invalidation par toute écriture du même mois.
+Seules les requêtes d'une seule journée lisent les versions par jour.
+
+Les mêmes versions, avec la date de leur dernière modification, servent de
+validateurs (ETag, Last-Modified) aux requêtes conditionnelles de l'API. Les
+listes de présences ont leurs propres versions, incrémentées à chaque écriture
+d'une présence (y compris les champs sans effet sur les statistiques).
+
+Un cache propre à chaque processus ('locmem') ne voit pas les écritures des
+autres processus (tâches cron, autres workers) : les validateurs ne sont
+alors pas utilisés (voir `is_shared`).
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils import timezone
+
+GLOBAL_VERSION_KEY = 'stats:v:global'
+MESSAGES_VERSION_KEY = 'stats:v:messages'
+PRESENCES_VERSION_KEY = 'stats:v:presences'
+
+# Endpoints dont les compteurs de succès et d'échecs sont exposés
+ENDPOINTS = (
+    'presence_count_by_date',
+    'presence_count_by_class',
+    'attendance_rate_by_student',
+    'absence_alerts',
+    'today_presence_summary',
+    'message_stats',
+)
+
+
+class StatisticsCache:
+    """
+    Cache des statistiques, versionné par (date, classe)
+    """
+
+    @staticmethod
+    def backend():
+        return caches[settings.STATISTICS_CACHE_ALIAS]
+
+    @staticmethod
+    def is_shared():
+        """True si le cache est commun à tous les processus (fichiers, Redis, Memcached...)"""
+        return not isinstance(StatisticsCache.backend(), (LocMemCache, DummyCache))
+
+    @staticmethod
+    def _version_key(date, classe_id=None):
+        # Sans classe : version de la journée toutes classes confondues
+        return f"stats:v:{date}:{classe_id if classe_id else '*'}"
+
+    @staticmethod
+    def _month_version_key(date, classe_id=None):
+        return f"stats:v:{date:%Y-%m}:{classe_id if classe_id else '*'}"
+
+    @staticmethod
+    def _presences_version_key(date=None):
+        # Sans date : version de la table entière
+        return f"{PRESENCES_VERSION_KEY}:{date}" if date else PRESENCES_VERSION_KEY
+
+    @staticmethod
+    def _modified_key(version_key):
+        """Clé de la date de dernière modification associée à une version"""
+        return 'stats:m:' + version_key[len('stats:v:'):]
+
+    @staticmethod
+    def _bump(*keys):
+        """Incrémente des versions et enregistre la date de la modification"""
+        for key in keys:
+            StatisticsCache._incr(key)
+        now = time.time()
+        StatisticsCache.backend().set_many(
+            {StatisticsCache._modified_key(key): now for key in keys}, timeout=None
+        )
+
+    @staticmethod
+    def _incr(key, initial=None):
+        """Incrémente un compteur ; une version absente (jamais lue ou évincée) reçoit une valeur neuve"""
+        cache = StatisticsCache.backend()
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, time.time_ns() if initial is None else initial, timeout=None):
+                cache.incr(key)
+
+    @staticmethod
+    def _versions(keys):
+        """Versions courantes ; une version absente est initialisée à une valeur neuve"""
+        cache = StatisticsCache.backend()
+        found = cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            for key in missing:
+                cache.add(key, time.time_ns(), timeout=None)
+            found.update(cache.get_many(missing))
+        return tuple(found.get(key) for key in keys)
+
+    @staticmethod
+    def bump(date, classe_id):
+        """Invalide les résultats qui dépendent d'une journée (ou de son mois) et d'une classe"""
+        StatisticsCache._bump(
+            StatisticsCache._version_key(date, classe_id),
+            StatisticsCache._version_key(date),
+            StatisticsCache._month_version_key(date, classe_id),
+            StatisticsCache._month_version_key(date),
+        )
+
+    @staticmethod
+    def bump_presences(date):
+        """Invalide les listes de présences de la table et d'une journée"""
+        StatisticsCache._bump(StatisticsCache._presences_version_key(), StatisticsCache._presences_version_key(date))
+
+    @staticmethod
+    def bump_messages():
+        """Invalide les statistiques des messages"""
+        StatisticsCache._bump(MESSAGES_VERSION_KEY)
+
+    @staticmethod
+    def bump_global():
+        """Invalide tous les résultats (étudiants, classes ou calendrier modifiés)"""
+        StatisticsCache._bump(GLOBAL_VERSION_KEY)
+
+    @staticmethod
+    def get_or_set(endpoint, params, compute, start_date=None, end_date=None, classe_id=None):
+        """
+        Retourne le résultat en cache d'un endpoint, ou le calcule et le met en cache
+
+        Args:
+            endpoint (str): Nom de l'endpoint
+            params (dict): Paramètres de la requête
+            compute (callable): Calcule le résultat en cas d'absence du cache
+            start_date (date, optional): Première journée couverte (par défaut il y a 30 jours)
+            end_date (date, optional): Dernière journée couverte (par défaut aujourd'hui)
+            classe_id (int, optional): Classe couverte (par défaut toutes les classes)
+        """
+        start_date, end_date = StatisticsCache._bounds(start_date, end_date)
+        version_keys = StatisticsCache._range_version_keys(start_date, end_date, classe_id)
+        return StatisticsCache._get_or_set(
+            endpoint, {**params, 'start_date': start_date, 'end_date': end_date}, compute, version_keys
+        )
+
+    @staticmethod
+    def validators(start_date=None, end_date=None, classe_id=None):
+        """
+        Validateurs des statistiques d'une période
+
+        Returns:
+            tuple: (empreinte des versions, timestamp de la dernière modification)
+        """
+        start_date, end_date = StatisticsCache._bounds(start_date, end_date)
+        return StatisticsCache._validators(StatisticsCache._range_version_keys(start_date, end_date, classe_id))
+
+    @staticmethod
+    def presences_validators(date=None):
+        """Validateurs de la liste des présences d'une journée, ou de toute la table"""
+        return StatisticsCache._validators([GLOBAL_VERSION_KEY, StatisticsCache._presences_version_key(date)])
+
+    @staticmethod
+    def messages_validators():
+        """Validateurs des statistiques des messages"""
+        return StatisticsCache._validators([GLOBAL_VERSION_KEY, MESSAGES_VERSION_KEY])
+
+    @staticmethod
+    def _validators(version_keys):
+        versions = StatisticsCache._versions(version_keys)
+
+        cache = StatisticsCache.backend()
+        modified_keys = [StatisticsCache._modified_key(key) for key in version_keys]
+        modified = cache.get_many(modified_keys)
+        now = time.time()
+        for key in modified_keys:
+            if key not in modified:
+                # Date inconnue (jamais modifiée depuis le démarrage, ou évincée) : considérée comme maintenant
+                cache.add(key, now, timeout=None)
+                modified[key] = now
+        # Les dates de modification entrent aussi dans l'empreinte : l'incrémentation du
+        # cache fichier n'est pas atomique, deux écritures simultanées peuvent ne compter qu'une fois
+        fingerprint = repr((versions, [modified[key] for key in modified_keys]))
+        return hashlib.md5(fingerprint.encode()).hexdigest(), max(modified.values())
+
+    @staticmethod
+    def _bounds(start_date, end_date):
+        # Par défaut, les 30 derniers jours
+        today = timezone.now().date()
+        end_date = end_date or today
+        start_date = start_date or today - timedelta(days=30)
+        return start_date, end_date
+
+    @staticmethod
+    def _range_version_keys(start_date, end_date, classe_id):
+        if start_date >= end_date:
+            return [GLOBAL_VERSION_KEY, StatisticsCache._version_key(start_date, classe_id)]
+        # Une version par mois de la période
+        keys = [GLOBAL_VERSION_KEY]
+        month = start_date.replace(day=1)
+        while month <= end_date:
+            keys.append(StatisticsCache._month_version_key(month, classe_id))
+            month = (month + timedelta(days=32)).replace(day=1)
+        return keys
+
+    @staticmethod
+    def get_or_set_messages(endpoint, params, compute):
+        """Comme `get_or_set`, pour un résultat qui dépend de la table des messages"""
+        return StatisticsCache._get_or_set(endpoint, params, compute, [GLOBAL_VERSION_KEY, MESSAGES_VERSION_KEY])
+
+    @staticmethod
+    def _get_or_set(endpoint, params, compute, version_keys):
+        versions = StatisticsCache._versions(version_keys)
+        fingerprint = repr((sorted(params.items()), versions))
+        key = f"stats:{endpoint}:{hashlib.md5(fingerprint.encode()).hexdigest()}"
+
+        cache = StatisticsCache.backend()
+        result = cache.get(key)
+        if result is not None:
+            StatisticsCache._count(endpoint, 'hits')
+            return result
+
+        StatisticsCache._count(endpoint, 'misses')
+        result = compute()
+        cache.set(key, result, timeout=settings.STATISTICS_CACHE_TIMEOUT)
+        return result
+
+    @staticmethod
+    def _count(endpoint, counter):
+        StatisticsCache._incr(f"stats:{counter}:{endpoint}", initial=1)
+
+    @staticmethod
+    def stats():
+        """Nombre de succès et d'échecs du cache par endpoint"""
+        counters = StatisticsCache.backend().get_many(
+            [f"stats:{counter}:{endpoint}" for endpoint in ENDPOINTS for counter in ('hits', 'misses')]
+        )
+        result = {}
+        for endpoint in ENDPOINTS:
+            hits = counters.get(f"stats:hits:{endpoint}", 0)
+            misses = counters.get(f"stats:misses:{endpoint}", 0)
+            total = hits + misses
+            result[endpoint] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / total * 100, 2) if total else None
+            }
+        return result
@@ -1,6 +1,9 @@
 import logging
 from django.utils import timezone
 from presences.services.message_scheduler import MessageSchedulerService
+from presences.services.absence_digest import AbsenceDigestService
+from presences.alerts import AbsenceAlertService
+from presences.export_jobs import ExportJobService
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +18,59 @@ def process_scheduled_messages():
         result = MessageSchedulerService.process_scheduled_messages()
         
         logger.info(f"[CRON] Traitement terminé: {result['processed']} messages traités, "
-                   f"{result['success_count']} succès, {result['error_count']} échecs")
+                   f"{result['success_count']} succès, {result['error_count']} échecs, "
+                   f"{result['retry_count']} reprogrammés, {result['dead_letter_count']} abandonnés")
         
         return f"Traitement terminé: {result['processed']} messages traités"
     
     except Exception as e:
         logger.error(f"[CRON] Erreur lors du traitement des messages programmés: {str(e)}")
         return f"Erreur: {str(e)}"
+
+
+def send_absence_digest():
+    """
+    Tâche cron pour envoyer le récapitulatif quotidien des absences et retards
+    """
+    logger.info(f"[CRON] Démarrage du récapitulatif des absences à {timezone.now()}")
+
+    try:
+        result = AbsenceDigestService.run()
+        logger.info(f"[CRON] {result['message']}")
+        return result['message']
+
+    except Exception as e:
+        logger.error(f"[CRON] Erreur lors de l'envoi du récapitulatif des absences: {str(e)}")
+        return f"Erreur: {str(e)}"
+
+
+def slide_absence_windows():
+    """
+    Tâche cron pour décaler les fenêtres d'alerte d'absence sur la nouvelle journée
+    """
+    logger.info(f"[CRON] Démarrage du décalage des fenêtres d'alerte à {timezone.now()}")
+
+    try:
+        result = AbsenceAlertService.slide()
+        logger.info(f"[CRON] {result['message']}")
+        return result['message']
+
+    except Exception as e:
+        logger.error(f"[CRON] Erreur lors du décalage des fenêtres d'alerte: {str(e)}")
+        return f"Erreur: {str(e)}"
+
+
+def process_export_jobs():
+    """
+    Tâche cron pour exécuter les exportations en attente
+    """
+    logger.info(f"[CRON] Démarrage du traitement des exportations à {timezone.now()}")
+
+    try:
+        result = ExportJobService.process_pending()
+        logger.info(f"[CRON] {result['message']}")
+        return result['message']
+
+    except Exception as e:
+        logger.error(f"[CRON] Erreur lors du traitement des exportations: {str(e)}")
+        return f"Erreur: {str(e)}"
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from ecole.models import Ecole
+from etudiants.models import Classe, Etudiant
+from .analytics import academic_year_bounds, current_academic_year
+from .exports import ExportService
+from .models import AttendanceWindow, ExportJob, Presence
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobService:
+    """
+    Exportations en tâche de fond
+
+    Une demande crée une tâche (ExportJob) exécutée hors de la requête, dans
+    un thread du processus web (EXPORT_JOBS_IN_THREAD) ou par la tâche cron
+    `process_export_jobs`. Le fichier produit est conservé dans EXPORT_ROOT et
+    réutilisé pour toute demande identique du même utilisateur tant que les données de la période
+    n'ont pas changé et qu'il n'a pas expiré (EXPORT_ARTIFACT_TTL_HOURS).
+    """
+
+    @staticmethod
+    def submit(type, format='xlsx', parametres=None, user=None):
+        """
+        Crée une tâche d'exportation, ou retourne celle qui produit déjà le même fichier
+
+        Returns:
+            tuple: (tâche, True si une tâche existante est réutilisée)
+
+        Raises:
+            ValueError: Type, format ou paramètres invalides
+        """
+        if type not in dict(ExportJob.TYPE_CHOICES):
+            raise ValueError(f"Type d'exportation non supporté: {type}")
+        if format not in dict(ExportJob.FORMAT_CHOICES):
+            raise ValueError(f"Format d'exportation non supporté: {format}")
+
+        parametres = ExportJobService._normalize(type, parametres or {})
+        empreinte = ExportJobService._fingerprint(type, format, parametres)
+
+        existing = (
+            ExportJob.objects.filter(
+                empreinte=empreinte,
+                # Une exportation n'est consultable que par son auteur
+                cree_par=user,
+                statut__in=['en_attente', 'en_cours', 'termine'],
+                date_creation__gte=timezone.now() - timedelta(hours=settings.EXPORT_ARTIFACT_TTL_HOURS)
+            )
+            .order_by('-date_creation')
+            .first()
+        )
+        if existing and (existing.statut != 'termine' or (existing.fichier and os.path.exists(existing.fichier))):
+            return existing, True
+
+        job = ExportJob.objects.create(
+            type=type, format=format, parametres=parametres, empreinte=empreinte, cree_par=user
+        )
+        if settings.EXPORT_JOBS_IN_THREAD:
+            transaction.on_commit(lambda: ExportJobService.start_thread(job.pk))
+        return job, False
+
+    @staticmethod
+    def start_thread(job_id):
+        """Exécute une tâche dans un thread, sans bloquer la requête"""
+        def runner():
+            try:
+                ExportJobService.run(job_id)
+            finally:
+                close_old_connections()
+
+        threading.Thread(target=runner, daemon=True).start()
+
+    @staticmethod
+    def run(job_id):
+        """
+        Exécute une tâche en attente et enregistre le fichier produit
+
+        Returns:
+            bool: True si la tâche a été exécutée par cet appel
+        """
+        # Réservation atomique : une tâche n'est exécutée qu'une fois (thread ou cron)
+        claimed = ExportJob.objects.filter(pk=job_id, statut='en_attente').update(
+            statut='en_cours', date_debut=timezone.now(), progression=5
+        )
+        if not claimed:
+            return False
+
+        job = ExportJob.objects.get(pk=job_id)
+        path = os.path.join(settings.EXPORT_ROOT, f"{job.type}_{job.pk}.{job.format}")
+        try:
+            response = ExportJobService._generate(job)
+            os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+            try:
+                with open(path, 'wb') as output:
+                    for chunk in response.streaming_content:
+                        output.write(chunk)
+            finally:
+                response.close()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'exportation {job.pk}: {str(e)}")
+            if os.path.exists(path):
+                os.remove(path)
+            ExportJob.objects.filter(pk=job.pk).update(
+                statut='echec', details_erreur=str(e), date_fin=timezone.now()
+            )
+            return True
+
+        ExportJob.objects.filter(pk=job.pk).update(
+            statut='termine', progression=100, fichier=path, date_fin=timezone.now()
+        )
+        logger.info(f"Exportation {job.pk} terminée: {path}")
+        return True
+
+    @staticmethod
+    def process_pending():
+        """
+        Exécute les tâches en attente et supprime les fichiers expirés
+
+        Returns:
+            dict: Résultat du traitement
+        """
+        processed = sum(
+            ExportJobService.run(job_id)
+            for job_id in ExportJob.objects.filter(statut='en_attente')
+            .order_by('date_creation')
+            .values_list('id', flat=True)
+        )
+        purged = ExportJobService.purge_expired()
+        return {
+            'success': True,
+            'message': f"{processed} exportations traitées, {purged} fichiers expirés supprimés",
+            'processed': processed,
+            'purged': purged
+        }
+
+    @staticmethod
+    def purge_expired():
+        """Supprime les fichiers des tâches terminées plus anciennes que EXPORT_ARTIFACT_TTL_HOURS"""
+        expired = ExportJob.objects.filter(
+            statut='termine',
+            fichier__isnull=False,
+            date_fin__lt=timezone.now() - timedelta(hours=settings.EXPORT_ARTIFACT_TTL_HOURS)
+        )
+        purged = 0
+        for job in expired:
+            if os.path.exists(job.fichier):
+                os.remove(job.fichier)
+                purged += 1
+        expired.update(fichier=None)
+        return purged
+
+    @staticmethod
+    def download_name(job):
+        """Nom du fichier proposé au téléchargement"""
+        return f"{job.get_type_display().replace(' ', '_')}_{job.date_creation.date()}.{job.format}"
+
+    @staticmethod
+    def _generate(job):
+        """Réponse d'ExportService correspondant à la tâche"""
+        parametres = job.parametres
+        start_date = ExportJobService._date(parametres.get('start_date'))
+        end_date = ExportJobService._date(parametres.get('end_date'))
+
+        if job.type == 'presences_jour':
+            return ExportService.export_presence_count_by_date(
+                start_date=start_date, end_date=end_date, classe_id=parametres.get('classe_id'), format=job.format
+            )
+        if job.type == 'presences_classe':
+            return ExportService.export_presence_count_by_class(
+                start_date=start_date, end_date=end_date, format=job.format
+            )
+        if job.type == 'assiduite_etudiants':
+            return ExportService.export_attendance_rate_by_student(
+                start_date=start_date, end_date=end_date, classe_id=parametres.get('classe_id'), format=job.format
+            )
+        if job.type == 'alertes_absences':
+            return ExportService.export_absence_alerts(
+                threshold=parametres['threshold'], days=parametres['days'], format=job.format
+            )
+
+        def progress(written, total):
+            # De 5 % (démarrage) à 95 % (fichier écrit), le reste à l'enregistrement
+            percent = 5 + int(90 * written / total) if total else 95
+            try:
+                ExportJob.objects.filter(pk=job.pk).update(progression=min(percent, 95))
+            except DatabaseError as e:
+                # Avancement indicatif : une base verrouillée (SQLite) n'interrompt pas l'exportation
+                logger.warning(f"Avancement de l'exportation {job.pk} non enregistré: {str(e)}")
+
+        return ExportService.export_presences_raw(
+            annee_scolaire=parametres['annee_scolaire'],
+            classe_id=parametres.get('classe_id'),
+            format=job.format,
+            progress=progress
+        )
+
+    @staticmethod
+    def _normalize(type, parametres):
+        """
+        Paramètres explicites (valeurs par défaut comprises) : deux demandes
+        équivalentes ont les mêmes paramètres, donc la même empreinte
+        """
+        today = timezone.now().date()
+        normalized = {}
+
+        if type in ('presences_jour', 'presences_classe', 'assiduite_etudiants'):
+            try:
+                start_date = ExportJobService._date(parametres.get('start_date'))
+                end_date = ExportJobService._date(parametres.get('end_date'))
+            except ValueError:
+                raise ValueError("Format de date invalide (YYYY-MM-DD)")
+            normalized['start_date'] = str(start_date or today - timedelta(days=30))
+            normalized['end_date'] = str(end_date or today)
+        elif type == 'alertes_absences':
+            try:
+                normalized['threshold'] = float(parametres.get('threshold', 70))
+                normalized['days'] = int(parametres.get('days', 30))
+            except (TypeError, ValueError):
+                raise ValueError('Valeurs invalides pour threshold ou days')
+        elif type == 'presences_brut':
+            annee_scolaire = parametres.get('annee_scolaire') or current_academic_year()
+            academic_year_bounds(annee_scolaire)
+            normalized['annee_scolaire'] = annee_scolaire
+
+        if type in ('presences_jour', 'assiduite_etudiants', 'presences_brut') and parametres.get('classe_id'):
+            try:
+                normalized['classe_id'] = int(parametres['classe_id'])
+            except (TypeError, ValueError):
+                raise ValueError('Valeur invalide pour classe_id')
+        return normalized
+
+    @staticmethod
+    def _fingerprint(type, format, parametres):
+        """Empreinte de la demande et de la version des données de sa période"""
+        today = timezone.now().date()
+        if type == 'presences_brut':
+            start_date, end_date = academic_year_bounds(parametres['annee_scolaire'])
+        elif type == 'alertes_absences':
+            start_date, end_date = today - timedelta(days=parametres['days']), today
+        else:
+            start_date = ExportJobService._date(parametres['start_date'])
+            end_date = ExportJobService._date(parametres['end_date'])
+
+        version = ExportJobService._data_version(type, start_date, end_date, parametres.get('classe_id'))
+        payload = json.dumps([type, format, parametres, version], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    @staticmethod
+    def _data_version(type, start_date, end_date, classe_id=None):
+        """
+        Version des données d'une exportation, lue en base (et donc vue de tous les
+        processus) : nombre de lignes et dernière modification des présences de la
+        période, des étudiants, des classes, de l'école et, pour les alertes, des
+        fenêtres d'assiduité
+        """
+        # Période par défaut des statistiques : les 30 derniers jours
+        today = timezone.now().date()
+        presences = Presence.objects.filter(
+            date__gte=start_date or today - timedelta(days=30), date__lte=end_date or today
+        )
+        if classe_id:
+            presences = presences.filter(classe_id=classe_id)
+        querysets = [presences, Etudiant.objects.all(), Classe.objects.all(), Ecole.objects.all()]
+        if type == 'alertes_absences':
+            querysets.append(AttendanceWindow.objects.all())
+        return [
+            list(queryset.aggregate(count=Count('id'), modified=Max('updated_at')).values())
+            for queryset in querysets
+        ]
+
+    @staticmethod
+    def _date(value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
@@ -1,15 +1,57 @@
-import io
 import csv
 import datetime
-from django.http import HttpResponse
+import tempfile
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
 from reportlab.lib.pagesizes import letter, landscape
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
+from .analytics import academic_year_bounds, current_academic_year
+from .models import Presence
 from .statistics import PresenceStatisticsService
 
+
+class Echo:
+    """Pseudo-fichier qui renvoie ce qu'on y écrit, pour produire le CSV ligne par ligne"""
+
+    def write(self, value):
+        return value
+
+
+class LazyFlowables(list):
+    """
+    Liste de flowables alimentée à la demande par un générateur
+
+    reportlab consomme les flowables par le début de la liste : en la
+    remplissant au fur et à mesure, seuls les tableaux en cours de mise en
+    page sont gardés en mémoire.
+    """
+
+    def __init__(self, flowables):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def _fill(self):
+        while list.__len__(self) < 2:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                break
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
 class ExportService:
     """Service pour l'exportation des données de présence"""
     
@@ -173,85 +215,157 @@ class ExportService:
         else:
             raise ValueError(f"Format d'exportation non supporté: {format}")
     
+    @staticmethod
+    def export_presences_raw(annee_scolaire=None, classe_id=None, format='csv', progress=None):
+        """
+        Exporte toutes les présences d'une année scolaire, une ligne par présence
+
+        Les présences sont lues en base par blocs de EXPORT_CHUNK_SIZE et envoyées
+        au fur et à mesure : la mémoire utilisée ne dépend pas du nombre de lignes.
+        `progress(lignes_ecrites, total)` est appelé après chaque bloc.
+        """
+        annee_scolaire = annee_scolaire or current_academic_year()
+        start_date, end_date = academic_year_bounds(annee_scolaire)
+
+        presences = Presence.objects.filter(date__gte=start_date, date__lte=end_date)
+        if classe_id:
+            presences = presences.filter(classe_id=classe_id)
+
+        statuts = dict(Presence.STATUT_CHOICES)
+        rows = (
+            [
+                date,
+                classe_nom,
+                nom,
+                prenom,
+                statuts.get(statut, statut),
+                heure_arrivee or '',
+                heure_depart or '',
+                commentaire or ''
+            ]
+            for date, classe_nom, nom, prenom, statut, heure_arrivee, heure_depart, commentaire in (
+                presences
+                .order_by('date', 'classe__nom', 'etudiant__nom', 'etudiant__prenom')
+                .values_list(
+                    'date', 'classe__nom', 'etudiant__nom', 'etudiant__prenom',
+                    'statut', 'heure_arrivee', 'heure_depart', 'commentaire'
+                )
+                .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+            )
+        )
+
+        if progress:
+            rows = ExportService._with_progress(rows, presences.count(), progress)
+
+        title = f"Présences de l'année scolaire {annee_scolaire}"
+        headers = ['Date', 'Classe', 'Nom', 'Prénom', 'Statut', "Heure d'arrivée", 'Heure de départ', 'Commentaire']
+        if format == 'csv':
+            return ExportService._export_to_csv(title, headers, rows)
+        elif format == 'xlsx':
+            return ExportService._export_to_excel(title, headers, rows)
+        elif format == 'pdf':
+            return ExportService._export_to_pdf(title, headers, rows)
+        else:
+            raise ValueError(f"Format d'exportation non supporté: {format}")
+
+    @staticmethod
+    def _with_progress(rows, total, progress):
+        """Transmet les lignes en signalant l'avancement après chaque bloc de EXPORT_CHUNK_SIZE"""
+        written = 0
+        for row in rows:
+            yield row
+            written += 1
+            if written % settings.EXPORT_CHUNK_SIZE == 0:
+                progress(written, total)
+        progress(written, total)
+
     @staticmethod
     def _export_to_excel(title, headers, rows):
         """
         Exporte les données au format Excel
+
+        Le classeur est écrit en mode write_only : chaque ligne est ajoutée puis
+        écrite sur disque dans un fichier temporaire, sans garder les cellules
+        en mémoire. `rows` peut être une liste ou un générateur.
         """
-        # Créer un workbook et une feuille
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Rapport"
-        
-        # Ajouter le titre
-        ws.merge_cells('A1:F1')
-        cell = ws.cell(row=1, column=1, value=title)
-        cell.font = Font(size=14, bold=True)
-        cell.alignment = Alignment(horizontal='center')
-        
-        # Ajouter les en-têtes
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Rapport")
+
+        # Largeur des colonnes (à définir avant toute ligne en mode write_only)
+        for col_idx in range(1, len(headers) + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 15
+
+        # Titre
+        title_cell = WriteOnlyCell(ws, value=title)
+        title_cell.font = Font(size=14, bold=True)
+        ws.append([title_cell])
+        ws.append([])
+
+        # En-têtes
         header_fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-        for col_idx, header in enumerate(headers, 1):
-            cell = ws.cell(row=3, column=col_idx, value=header)
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
             cell.font = Font(bold=True)
             cell.fill = header_fill
-        
-        # Ajouter les données
-        for row_idx, row_data in enumerate(rows, 4):
-            for col_idx, cell_value in enumerate(row_data, 1):
-                ws.cell(row=row_idx, column=col_idx, value=cell_value)
-        
-        # Ajuster la largeur des colonnes
-        for col_idx in range(1, len(headers) + 1):
-            ws.column_dimensions[chr(64 + col_idx)].width = 15
-        
-        # Créer la réponse HTTP
-        response = HttpResponse(
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        # Données
+        for row in rows:
+            ws.append(row)
+
+        # Fichier temporaire supprimé à la fermeture de la réponse
+        output = tempfile.TemporaryFile()
+        wb.save(output)
+        output.seek(0)
+
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{title.replace(" ", "_")}_{datetime.date.today()}.xlsx',
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        response['Content-Disposition'] = f'attachment; filename="{title.replace(" ", "_")}_{datetime.date.today()}.xlsx"'
-        
-        # Sauvegarder le workbook dans la réponse
-        wb.save(response)
-        
-        return response
     
     @staticmethod
     def _export_to_csv(title, headers, rows):
         """
         Exporte les données au format CSV
+
+        La réponse est produite ligne par ligne à mesure que `rows` (liste ou
+        générateur) est parcouru : rien n'est accumulé en mémoire.
         """
-        # Créer la réponse HTTP
-        response = HttpResponse(content_type='text/csv')
+        writer = csv.writer(Echo())
+
+        def stream():
+            # Titre, ligne vide puis en-têtes
+            yield writer.writerow([title])
+            yield writer.writerow([])
+            yield writer.writerow(headers)
+            for row in rows:
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="{title.replace(" ", "_")}_{datetime.date.today()}.csv"'
-        
-        # Créer le writer CSV
-        writer = csv.writer(response)
-        
-        # Écrire le titre
-        writer.writerow([title])
-        writer.writerow([])  # Ligne vide
-        
-        # Écrire les en-têtes
-        writer.writerow(headers)
-        
-        # Écrire les données
-        for row in rows:
-            writer.writerow(row)
-        
         return response
     
     @staticmethod
     def _export_to_pdf(title, headers, rows):
         """
         Exporte les données au format PDF
+
+        Les lignes sont réparties en tableaux de EXPORT_PDF_ROWS_PER_TABLE lignes
+        dont l'en-tête est répété à chaque page : reportlab met en page chaque
+        tableau séparément, en temps linéaire, au lieu d'un tableau géant. Les
+        tableaux sont créés à mesure de la mise en page et le document est écrit
+        dans un fichier temporaire qui ne reste en mémoire que tant qu'il est petit.
         """
-        # Créer un buffer pour le PDF
-        buffer = io.BytesIO()
-        
+        # Fichier temporaire supprimé à la fermeture de la réponse
+        output = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_SIZE)
+
         # Créer le document PDF
         doc = SimpleDocTemplate(
-            buffer,
+            output,
             pagesize=landscape(letter),
             rightMargin=72,
             leftMargin=72,
@@ -261,22 +375,8 @@ class ExportService:
         
         # Styles pour le document
         styles = getSampleStyleSheet()
-        title_style = styles['Title']
-        
-        # Éléments du document
-        elements = []
-        
-        # Ajouter le titre
-        elements.append(Paragraph(title, title_style))
-        elements.append(Spacer(1, 20))
-        
-        # Préparer les données pour le tableau
-        table_data = [headers] + rows
-        
-        # Créer le tableau
-        table = Table(table_data)
-        
-        # Style du tableau
+
+        # Style des tableaux
         table_style = TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
@@ -289,19 +389,39 @@ class ExportService:
             ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
         ])
-        
-        # Appliquer le style au tableau
-        table.setStyle(table_style)
-        
-        # Ajouter le tableau au document
-        elements.append(table)
-        
+
+        # Largeurs fixes : évite à reportlab de mesurer chaque cellule
+        col_widths = [doc.width / len(headers)] * len(headers)
+
+        def elements():
+            # Titre, puis un tableau par bloc de lignes avec en-tête répété
+            yield Paragraph(title, styles['Title'])
+            yield Spacer(1, 20)
+            chunk = []
+            tables = 0
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == settings.EXPORT_PDF_ROWS_PER_TABLE:
+                    yield ExportService._pdf_table(headers, chunk, col_widths, table_style)
+                    tables += 1
+                    chunk = []
+            if chunk or not tables:
+                yield ExportService._pdf_table(headers, chunk, col_widths, table_style)
+
         # Construire le document
-        doc.build(elements)
-        
-        # Créer la réponse HTTP
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{title.replace(" ", "_")}_{datetime.date.today()}.pdf"'
-        
-        return response
+        doc.build(LazyFlowables(elements()))
+        output.seek(0)
+
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=f'{title.replace(" ", "_")}_{datetime.date.today()}.pdf',
+            content_type='application/pdf'
+        )
+
+    @staticmethod
+    def _pdf_table(headers, rows, col_widths, table_style):
+        """Tableau d'un bloc de lignes, dont l'en-tête est répété en cas de saut de page"""
+        table = Table([headers] + rows, colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        return table
@@ -0,0 +1,234 @@
+"""
+Flux des présences en direct (Server-Sent Events)
+
+Chaque écriture d'une présence (pointage par reconnaissance faciale,
+enregistrement manuel...) publie un événement une fois la transaction
+validée. Les abonnés de chaque processus sont des files en mémoire : un
+événement est construit une seule fois, quel que soit le nombre de tableaux
+de bord ouverts, qui ne font plus aucune requête en base pour le suivre.
+
+Avec plusieurs processus serveur, les événements passent par un broker Redis
+(LIVE_FEED_BROKER_URL, paquet `redis`) : chaque processus y publie et relaie
+à ses propres abonnés ce qu'il en reçoit. Sans broker, seuls les abonnés du
+processus qui a écrit la présence sont prévenus.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery
+
+from etudiants.models import Classe, Etudiant
+
+logger = logging.getLogger(__name__)
+
+# Broker (optionnel) : à défaut, diffusion dans le processus uniquement
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+CHANNEL = 'presences:live'
+
+if settings.LIVE_FEED_BROKER_URL and not REDIS_AVAILABLE:
+    logger.warning("LIVE_FEED_BROKER_URL est défini mais le paquet redis n'est pas installé : diffusion locale")
+
+_subscribers = set()
+_subscribers_lock = threading.Lock()
+_broker = {'client': None, 'listener': None}
+_broker_lock = threading.Lock()
+
+
+class _Subscriber:
+    """Abonné lu depuis un thread (serveur WSGI)"""
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=settings.LIVE_FEED_QUEUE_SIZE)
+        self.lagging = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.lagging = True
+
+    def get(self, timeout):
+        """Prochain événement, ou None après `timeout` secondes"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class _AsyncSubscriber:
+    """Abonné lu depuis une boucle asyncio (serveur ASGI)"""
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_FEED_QUEUE_SIZE)
+        self.lagging = False
+
+    def put(self, event):
+        # Appelé depuis le thread de la vue qui a écrit la présence
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagging = True
+
+    async def get(self, timeout):
+        """Prochain événement, ou None après `timeout` secondes"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class LiveFeed:
+    """
+    Diffusion des changements de présence aux tableaux de bord
+
+    Événements :
+    - `presence` : {'action': 'created' | 'updated' | 'deleted', 'presence': {...},
+      'previous_statut': statut avant l'écriture ou None} ;
+    - `resync` : {'date': ...} après une écriture en masse, ou pour un abonné trop
+      lent dont la file a débordé : relire les listes de la journée.
+    """
+
+    @staticmethod
+    def subscribe():
+        return LiveFeed._add(_Subscriber())
+
+    @staticmethod
+    def subscribe_async():
+        return LiveFeed._add(_AsyncSubscriber())
+
+    @staticmethod
+    def unsubscribe(subscriber):
+        with _subscribers_lock:
+            _subscribers.discard(subscriber)
+
+    @staticmethod
+    def _add(subscriber):
+        with _subscribers_lock:
+            _subscribers.add(subscriber)
+        if LiveFeed._broker_url():
+            LiveFeed._start_listener()
+        return subscriber
+
+    @staticmethod
+    def active():
+        """False s'il est certain que personne n'écoute (pas de broker, aucun abonné dans ce processus)"""
+        return bool(_subscribers) or bool(LiveFeed._broker_url())
+
+    @staticmethod
+    def publish_presence(presence, action, previous_statut=None):
+        """Publie l'écriture d'une présence après la validation de la transaction"""
+        if not LiveFeed.active():
+            return
+        event = {
+            'type': 'presence',
+            'action': action,
+            'presence': LiveFeed._presence_payload(presence),
+            'previous_statut': previous_statut,
+        }
+        transaction.on_commit(lambda: LiveFeed.publish(event))
+
+    @staticmethod
+    def publish_resync(date):
+        """Demande aux tableaux de bord de relire les présences d'une journée"""
+        if LiveFeed.active():
+            event = {'type': 'resync', 'date': str(date)}
+            transaction.on_commit(lambda: LiveFeed.publish(event))
+
+    @staticmethod
+    def publish(event):
+        """Transmet un événement au broker, ou directement aux abonnés du processus"""
+        if LiveFeed._broker_url():
+            try:
+                LiveFeed._client().publish(CHANNEL, json.dumps(event))
+                return
+            except Exception as e:
+                logger.warning(f"Broker du flux en direct indisponible, diffusion locale: {str(e)}")
+        LiveFeed.dispatch(event)
+
+    @staticmethod
+    def dispatch(event):
+        with _subscribers_lock:
+            subscribers = list(_subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    @staticmethod
+    def format(event):
+        """Événement au format Server-Sent Events"""
+        return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    @staticmethod
+    def _presence_payload(presence):
+        # Une requête par écriture, pour tous les abonnés. La classe est celle de la
+        # présence (au moment de l'enregistrement), lue par identifiant : la présence
+        # n'existe plus en base après une suppression
+        etudiant = Etudiant.objects.filter(pk=presence.etudiant_id).values('nom', 'prenom').annotate(
+            classe_nom=Subquery(Classe.objects.filter(pk=presence.classe_id).values('nom')[:1])
+        ).first() or {}
+        return {
+            'id': presence.pk,
+            'etudiant': presence.etudiant_id,
+            'etudiant_nom': etudiant.get('nom'),
+            'etudiant_prenom': etudiant.get('prenom'),
+            'classe': presence.classe_id,
+            'classe_nom': etudiant.get('classe_nom'),
+            'date': str(presence.date),
+            'statut': presence.statut,
+            'heure_arrivee': presence.heure_arrivee.isoformat() if presence.heure_arrivee else None,
+            'heure_depart': presence.heure_depart.isoformat() if presence.heure_depart else None,
+        }
+
+    @staticmethod
+    def _broker_url():
+        return settings.LIVE_FEED_BROKER_URL if REDIS_AVAILABLE else ''
+
+    @staticmethod
+    def _client():
+        with _broker_lock:
+            if _broker['client'] is None:
+                _broker['client'] = redis.Redis.from_url(settings.LIVE_FEED_BROKER_URL)
+            return _broker['client']
+
+    @staticmethod
+    def _start_listener():
+        """Relaie aux abonnés du processus les événements du broker (un thread par processus)"""
+        with _broker_lock:
+            if _broker['listener'] is not None:
+                return
+            _broker['listener'] = threading.Thread(target=LiveFeed._listen, daemon=True)
+            _broker['listener'].start()
+
+    @staticmethod
+    def _listen():
+        while True:
+            try:
+                pubsub = LiveFeed._client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for message in pubsub.listen():
+                    LiveFeed.dispatch(json.loads(message['data']))
+            except Exception as e:
+                logger.error(f"Écoute du broker du flux en direct interrompue: {str(e)}")
+                time.sleep(5)
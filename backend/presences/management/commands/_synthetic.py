@@ -0,0 +1,58 @@
+"""
+Génération de données de présence fictives pour les commandes de mesure
+
+Les données sont insérées en masse ; l'appelant les crée dans une transaction
+annulée à la fin de la mesure pour ne rien laisser en base.
+"""
+import random
+from datetime import timedelta
+
+from etudiants.models import Classe, Etudiant
+from presences.models import Presence
+
+# Répartition des statuts d'une journée de classe ordinaire
+STATUT_WEIGHTS = {'present': 85, 'retard': 6, 'absent': 7, 'depart_anticipe': 2}
+
+
+def working_days(start_date, end_date):
+    """Jours du lundi au vendredi entre deux dates incluses"""
+    day = start_date
+    while day <= end_date:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def create_synthetic_school(students, per_class=30, prefix='Bench'):
+    """Crée des classes et des étudiants fictifs, et retourne les étudiants"""
+    n_classes = max(1, -(-students // per_class))
+    classes = Classe.objects.bulk_create([
+        Classe(nom=f"{prefix} {index}", niveau='Bench', annee_scolaire='Bench')
+        for index in range(n_classes)
+    ])
+    Etudiant.objects.bulk_create(
+        [
+            Etudiant(nom=f"{prefix}{index}", prenom='Etudiant', classe=classes[index % n_classes])
+            for index in range(students)
+        ],
+        batch_size=1000
+    )
+    return list(Etudiant.objects.filter(nom__startswith=prefix).values_list('id', flat=True))
+
+
+def create_synthetic_presences(etudiant_ids, start_date, end_date, seed=0, batch_size=5000):
+    """Crée une présence par étudiant et par jour ouvrable ; retourne le nombre de lignes"""
+    rng = random.Random(seed)
+    statuts = list(STATUT_WEIGHTS)
+    weights = list(STATUT_WEIGHTS.values())
+    classes = dict(Etudiant.objects.filter(id__in=etudiant_ids).values_list('id', 'classe_id'))
+    total = 0
+    for day in working_days(start_date, end_date):
+        drawn = rng.choices(statuts, weights, k=len(etudiant_ids))
+        Presence.objects.bulk_create(
+            [Presence(etudiant_id=etudiant_id, classe_id=classes[etudiant_id], date=day, statut=statut)
+             for etudiant_id, statut in zip(etudiant_ids, drawn)],
+            batch_size=batch_size
+        )
+        total += len(etudiant_ids)
+    return total
@@ -0,0 +1,86 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from api import fast_serializers
+from api.serializers import EtudiantListSerializer, PresenceSerializer
+from etudiants.models import Etudiant
+from presences.models import Presence
+from ._synthetic import create_synthetic_presences, create_synthetic_school, working_days
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les sérialiseurs DRF et la sérialisation rapide (api/fast_serializers.py) "
+        "des présences du jour et de la liste des étudiants sur des données fictives "
+        "(annulées à la fin de la mesure)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Nombre d'étudiants et de présences fictifs")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions mesurées")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                self._run(options['rows'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Données fictives supprimées")
+
+    def _run(self, rows, repeat):
+        # Une journée de présences : le dernier jour ouvrable
+        today = timezone.now().date()
+        day = max(working_days(today - timedelta(days=6), today))
+        etudiant_ids = create_synthetic_school(rows)
+        create_synthetic_presences(etudiant_ids, day, day)
+        # Quelques photos, pour comparer aussi les URL des fichiers
+        Etudiant.objects.filter(id__in=etudiant_ids[::10]).update(photo='photos_etudiants/bench.jpg')
+        self.stdout.write(f"{rows} étudiants et présences fictifs créés")
+
+        # Comme les vues : sans requête pour PresenceViewSet.today, avec pour EtudiantViewSet.list
+        request = APIRequestFactory().get('/')
+        presences = Presence.objects.filter(date=day, etudiant_id__in=etudiant_ids).order_by('id')
+        etudiants = Etudiant.objects.filter(id__in=etudiant_ids).order_by('nom', 'prenom')
+        scenarios = [
+            (
+                "Présences du jour",
+                lambda: PresenceSerializer(PresenceSerializer.setup_eager_loading(presences), many=True).data,
+                lambda: fast_serializers.presence_list.serialize(presences),
+            ),
+            (
+                "Liste des étudiants",
+                lambda: EtudiantListSerializer(
+                    EtudiantListSerializer.setup_eager_loading(etudiants), many=True, context={'request': request}
+                ).data,
+                lambda: fast_serializers.etudiant_list.serialize(etudiants, request),
+            ),
+        ]
+        for label, drf, fast in scenarios:
+            # Le JSON produit doit être identique avant de comparer les durées
+            if json.dumps(drf()) != json.dumps(fast()):
+                raise CommandError(f"{label}: la sérialisation rapide ne produit pas le même JSON")
+
+            results = []
+            for name, serialize in (("DRF", drf), ("rapide", fast)):
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    serialize()
+                    timings.append(time.perf_counter() - started)
+                results.append(min(timings))
+                self.stdout.write(
+                    f"{label} ({name}): min {min(timings) * 1000:.1f} ms, "
+                    f"{rows / min(timings):,.0f} lignes/s"
+                )
+            self.stdout.write(f"{label}: x{results[0] / results[1]:.1f}")
@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from etudiants.models import Etudiant
+from presences.statistics import PresenceStatisticsService
+from ._synthetic import create_synthetic_presences, create_synthetic_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure PresenceStatisticsService.get_presence_count_by_date sur des données fictives "
+        "(annulées à la fin de la mesure)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000, help="Nombre d'étudiants fictifs")
+        parser.add_argument('--days', type=int, default=365, help="Période couverte, en jours")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions mesurées")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['students'], options['days'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Données fictives supprimées")
+
+    def _run(self, students, days, repeat):
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=days - 1)
+
+        started = time.perf_counter()
+        etudiant_ids = create_synthetic_school(students)
+        rows = create_synthetic_presences(etudiant_ids, start_date, end_date)
+        self.stdout.write(
+            f"{rows} présences fictives créées pour {students} étudiants "
+            f"en {time.perf_counter() - started:.1f} s"
+        )
+
+        classe_id = Etudiant.objects.values_list('classe_id', flat=True).get(pk=etudiant_ids[0])
+        scenarios = [
+            ("Toutes classes", {}),
+            ("Une classe", {'classe_id': classe_id}),
+        ]
+        for label, filters in scenarios:
+            timings = []
+            queries = []
+            for _ in range(repeat):
+                queries.clear()
+                with connection.execute_wrapper(self._count_query(queries)):
+                    started = time.perf_counter()
+                    result = PresenceStatisticsService.get_presence_count_by_date(
+                        start_date=start_date, end_date=end_date, **filters
+                    )
+                    timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f"{label}: {len(result)} jours, {len(queries)} requêtes, "
+                f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms"
+            )
+
+
+    @staticmethod
+    def _count_query(queries):
+        def wrapper(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+        return wrapper
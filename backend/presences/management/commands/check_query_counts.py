@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from etudiants.models import Classe, Etudiant, Parent
+from presences.models import Message
+from ._synthetic import create_synthetic_presences, create_synthetic_school
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie que le nombre de requêtes des listes et des fiches de l'API ne dépend pas "
+        "du nombre de lignes retournées (données fictives annulées à la fin de la vérification)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10, help="Nombre d'étudiants fictifs du premier passage")
+        parser.add_argument('--days', type=int, default=7, help="Période couverte par les présences, en jours")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                regressions = self._run(options['students'], options['days'])
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Données fictives supprimées")
+
+        if regressions:
+            raise CommandError(
+                "Le nombre de requêtes augmente avec le nombre de lignes : " + ', '.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("Nombre de requêtes constant pour tous les points d'accès"))
+
+    def _run(self, students, days):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username='bench_query_counts'))
+
+        # Deux passages : au second, chaque liste compte au moins deux fois plus de lignes
+        counts = []
+        for factor in (1, 2):
+            prefix = f"QueryCount{factor}_"
+            self._populate(students * factor, days * factor, prefix)
+            counts.append(self._measure(client, prefix))
+
+        regressions = []
+        for label, before in counts[0].items():
+            after = counts[1][label]
+            self.stdout.write(f"{label}: {before} -> {after} requêtes")
+            if after > before:
+                regressions.append(label)
+        return regressions
+
+    def _populate(self, students, days, prefix):
+        end_date = timezone.now().date()
+        etudiant_ids = create_synthetic_school(students, per_class=students, prefix=prefix)
+        create_synthetic_presences(etudiant_ids, end_date - timedelta(days=days - 1), end_date)
+        Parent.objects.bulk_create([
+            Parent(nom=f"{prefix}{etudiant_id}", prenom='Parent', telephone='0000000000', etudiant_id=etudiant_id)
+            for etudiant_id in etudiant_ids
+        ])
+        parents = Parent.objects.filter(nom__startswith=prefix).select_related('etudiant')
+        Message.objects.bulk_create([
+            Message(parent=parent, type='sms', contenu='Message fictif', statut='envoye',
+                    est_message_groupe=True, classe_id=parent.etudiant.classe_id)
+            for parent in parents
+        ])
+
+    def _measure(self, client, prefix):
+        """Nombre de requêtes de chaque point d'accès, sur les objets du passage"""
+        classe = Classe.objects.filter(nom__startswith=prefix).first()
+        etudiant = Etudiant.objects.filter(classe=classe).order_by('id').first()
+        parent = Parent.objects.filter(etudiant=etudiant).first()
+        message = Message.objects.filter(parent=parent).first()
+
+        endpoints = [
+            ("Classes", '/api/classes/'),
+            ("Étudiants d'une classe", f'/api/classes/{classe.pk}/etudiants/'),
+            ("Étudiants", '/api/etudiants/'),
+            ("Fiche étudiant", f'/api/etudiants/{etudiant.pk}/'),
+            ("Présences d'un étudiant", f'/api/etudiants/{etudiant.pk}/presences/'),
+            ("Parents", '/api/parents/'),
+            ("Fiche parent", f'/api/parents/{parent.pk}/'),
+            ("Présences", '/api/presences/'),
+            ("Présences du jour", '/api/presences/today/'),
+            ("Messages", '/api/messages/'),
+            ("Fiche message", f'/api/messages/{message.pk}/'),
+            ("Messages de groupe", '/api/messages/bulk_messages/'),
+            ("Messages d'une classe", f'/api/messages/by_classe/?classe_id={classe.pk}'),
+        ]
+
+        counts = {}
+        for label, url in endpoints:
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f"{label} ({url}): réponse {response.status_code}")
+            counts[label] = len(queries)
+        return counts
@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from presences.models import Message, Presence
+from presences.services.retry_service import MessageRetryService
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie par EXPLAIN que les requêtes principales sur les présences et les messages "
+        "utilisent un index (SQLite ou MySQL)"
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'mysql'):
+            raise CommandError(f"Base non prise en charge: {connection.vendor} (SQLite ou MySQL)")
+
+        failures = []
+        for label, queryset, ordered in self._queries():
+            problems, indexes = self._check(queryset, ordered)
+            used = ', '.join(indexes) or 'aucun'
+            if problems:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"{label}: {'; '.join(problems)} (index: {used})"))
+            else:
+                self.stdout.write(f"{label}: index {used}")
+
+        if failures:
+            raise CommandError(f"Requêtes sans index adapté : {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("Toutes les requêtes utilisent un index"))
+
+    @staticmethod
+    def _queries():
+        """(libellé, requête, tri à lire dans l'index) des chemins d'accès de l'application"""
+        today = timezone.now().date()
+        now = timezone.now()
+        start_date = today - timedelta(days=30)
+        return [
+            ("Présences d'une journée", Presence.objects.filter(date=today), False),
+            ("Présences d'une période", Presence.objects.filter(date__gte=start_date, date__lte=today), False),
+            (
+                "Absences et retards d'une journée",
+                Presence.objects.filter(date=today, statut__in=['absent', 'retard'], notification_envoyee=False),
+                False,
+            ),
+            (
+                "Présences d'une classe sur une période",
+                Presence.objects.filter(classe_id=1, date__gte=start_date, date__lte=today),
+                False,
+            ),
+            ("Liste paginée des présences", Presence.objects.order_by('-date', 'id')[:100], True),
+            ("Présences d'un étudiant", Presence.objects.filter(etudiant_id=1).order_by('-date')[:100], True),
+            (
+                "Messages programmés échus",
+                Message.objects.filter(statut='programme', date_programmee__lte=now),
+                False,
+            ),
+            ("File des nouvelles tentatives", MessageRetryService.due_retries(now), True),
+            (
+                "Liste paginée des messages programmés",
+                Message.objects.filter(statut='programme', date_programmee__isnull=False)
+                .order_by('date_programmee', 'id')[:100],
+                True,
+            ),
+            (
+                "Liste paginée des nouvelles tentatives",
+                Message.objects.filter(statut='echec', prochaine_tentative__isnull=False)
+                .order_by('prochaine_tentative', 'id')[:100],
+                True,
+            ),
+            ("Liste paginée des messages", Message.objects.order_by('-date_envoi', 'id')[:100], True),
+            (
+                "Messages d'un parent",
+                Message.objects.filter(parent_id=1).order_by('-date_envoi', 'id')[:100],
+                True,
+            ),
+            (
+                "Messages de groupe d'une classe",
+                Message.objects.filter(classe_id=1, est_message_groupe=True).order_by('-date_envoi', 'id')[:100],
+                True,
+            ),
+            (
+                "Messages d'une période",
+                Message.objects.filter(date_envoi__gte=now - timedelta(days=30), date_envoi__lt=now),
+                False,
+            ),
+        ]
+
+    def _check(self, queryset, ordered):
+        """
+        Returns:
+            tuple: (problèmes relevés, index utilisés)
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                return self._check_sqlite([row[-1] for row in cursor.fetchall()], ordered)
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columns = [column[0].lower() for column in cursor.description]
+            return self._check_mysql([dict(zip(columns, row)) for row in cursor.fetchall()], ordered)
+
+    @staticmethod
+    def _check_sqlite(details, ordered):
+        # Lignes du plan : "SEARCH table USING INDEX idx (...)", "SCAN table", "USE TEMP B-TREE FOR ORDER BY"
+        problems = []
+        indexes = []
+        for detail in details:
+            words = detail.split()
+            if 'INDEX' in words:
+                indexes.append(words[words.index('INDEX') + 1])
+            elif 'PRIMARY' in words:
+                indexes.append('PRIMARY')
+            if words[0] == 'SCAN' and 'USING' not in words:
+                problems.append(f"parcours complet de {words[1]}")
+            if ordered and 'TEMP B-TREE' in detail:
+                problems.append("tri hors index")
+        return problems, indexes
+
+    @staticmethod
+    def _check_mysql(rows, ordered):
+        # type ALL : parcours complet ; Extra "Using filesort" : tri hors index
+        problems = []
+        indexes = []
+        for row in rows:
+            if row.get('key'):
+                indexes.append(row['key'])
+            if row.get('type') == 'ALL':
+                problems.append(f"parcours complet de {row.get('table')}")
+            if ordered and 'filesort' in (row.get('extra') or ''):
+                problems.append("tri hors index")
+        return problems, indexes
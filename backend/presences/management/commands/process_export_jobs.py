@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from presences.export_jobs import ExportJobService
+
+
+class Command(BaseCommand):
+    help = "Exécute les exportations en attente et supprime les fichiers expirés"
+
+    def handle(self, *args, **options):
+        result = ExportJobService.process_pending()
+        self.stdout.write(self.style.SUCCESS(result['message']))
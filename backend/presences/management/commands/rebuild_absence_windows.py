@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from presences.alerts import AbsenceAlertService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les fenêtres glissantes des alertes d'absence à partir des présences enregistrées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help="Dernière journée des fenêtres (YYYY-MM-DD, par défaut aujourd'hui)")
+
+    def handle(self, *args, **options):
+        try:
+            date = datetime.strptime(options['date'], '%Y-%m-%d').date() if options['date'] else None
+        except ValueError:
+            raise CommandError("Format de date invalide (YYYY-MM-DD)")
+
+        result = AbsenceAlertService.rebuild(date)
+        self.stdout.write(self.style.SUCCESS(result['message']))
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from presences.cache import StatisticsCache
+from presences.rollup import AttendanceRollupService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les résumés quotidiens de présence par classe à partir des présences enregistrées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', help="Première journée à reconstruire (YYYY-MM-DD)")
+        parser.add_argument('--end-date', help="Dernière journée à reconstruire (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = self._parse_date(options['start_date'])
+            end_date = self._parse_date(options['end_date'])
+        except ValueError:
+            raise CommandError("Format de date invalide (YYYY-MM-DD)")
+
+        created = AttendanceRollupService.rebuild(start_date, end_date)
+        StatisticsCache.bump_global()
+        self.stdout.write(self.style.SUCCESS(f"{created} résumés quotidiens reconstruits"))
+
+    @staticmethod
+    def _parse_date(value):
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
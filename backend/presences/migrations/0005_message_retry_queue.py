@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presences', '0004_add_message_scheduling_and_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='prochaine_tentative',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Prochaine tentative'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='tentatives',
+            field=models.PositiveIntegerField(default=0, verbose_name='Nombre de tentatives'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='statut',
+            field=models.CharField(choices=[('brouillon', 'Brouillon'), ('programme', 'Programmé'), ('en_attente', 'En attente'), ('envoye', 'Envoyé'), ('echec', 'Échec'), ('abandonne', 'Abandonné')], default='brouillon', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['statut', 'prochaine_tentative'], name='message_retry_idx'),
+        ),
+    ]
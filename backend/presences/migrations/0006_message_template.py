@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presences', '0005_message_retry_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=255)),
+                ('code', models.SlugField(blank=True, help_text='Identifiant des modèles utilisés par les notifications automatiques (absence, retard)', null=True)),
+                ('type', models.CharField(choices=[('sms', 'SMS'), ('email', 'Email')], max_length=5)),
+                ('sujet', models.CharField(blank=True, max_length=255, null=True)),
+                ('contenu', models.TextField()),
+                ('est_html', models.BooleanField(default=False)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Modèle de message',
+                'verbose_name_plural': 'Modèles de messages',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='messagetemplate',
+            constraint=models.UniqueConstraint(condition=models.Q(('code__isnull', False)), fields=('code', 'type'), name='messagetemplate_code_type_unique'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='presences.messagetemplate'),
+        ),
+    ]
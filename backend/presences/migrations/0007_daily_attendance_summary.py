@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_summaries(apps, schema_editor):
+    """Calcule les résumés des présences déjà enregistrées"""
+    Presence = apps.get_model('presences', 'Presence')
+    Etudiant = apps.get_model('etudiants', 'Etudiant')
+    DailyAttendanceSummary = apps.get_model('presences', 'DailyAttendanceSummary')
+
+    fields = {'present': 'presents', 'retard': 'retards', 'absent': 'absents', 'depart_anticipe': 'departs_anticipes'}
+    headcounts = dict(
+        Etudiant.objects.filter(statut='actif').values_list('classe_id')
+        .annotate(count=models.Count('id')).values_list('classe_id', 'count')
+    )
+    rows = (
+        Presence.objects.values('date', 'etudiant__classe_id')
+        .annotate(**{field: models.Count('id', filter=models.Q(statut=statut)) for statut, field in fields.items()})
+        .order_by()
+    )
+    DailyAttendanceSummary.objects.bulk_create(
+        [
+            DailyAttendanceSummary(
+                date=row['date'],
+                classe_id=row['etudiant__classe_id'],
+                effectif=headcounts.get(row['etudiant__classe_id'], 0),
+                **{field: row[field] for field in fields.values()}
+            )
+            for row in rows
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('etudiants', '0001_initial'),
+        ('presences', '0006_message_template'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('presents', models.PositiveIntegerField(default=0)),
+                ('retards', models.PositiveIntegerField(default=0)),
+                ('absents', models.PositiveIntegerField(default=0)),
+                ('departs_anticipes', models.PositiveIntegerField(default=0)),
+                ('effectif', models.PositiveIntegerField(default=0, help_text="Nombre d'étudiants actifs inscrits dans la classe")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('classe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumes_presences', to='etudiants.classe')),
+            ],
+            options={
+                'verbose_name': 'Résumé quotidien des présences',
+                'verbose_name_plural': 'Résumés quotidiens des présences',
+                'unique_together': {('date', 'classe')},
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
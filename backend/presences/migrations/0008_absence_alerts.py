@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('etudiants', '0001_initial'),
+        ('presences', '0007_daily_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fin_fenetre', models.DateField(help_text='Dernière journée de la fenêtre')),
+                ('jours_presents', models.PositiveIntegerField(default=0)),
+                ('jours_enregistres', models.PositiveIntegerField(default=0)),
+                ('taux', models.FloatField(blank=True, help_text='Taux de présence en pourcentage (vide sans présence enregistrée)', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('etudiant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fenetre_presence', to='etudiants.etudiant')),
+            ],
+            options={
+                'verbose_name': 'Fenêtre de présence',
+                'verbose_name_plural': 'Fenêtres de présence',
+                'indexes': [models.Index(fields=['taux'], name='attendancewindow_taux_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AbsenceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taux', models.FloatField(help_text='Taux de présence au déclenchement')),
+                ('seuil', models.FloatField()),
+                ('est_active', models.BooleanField(default=True)),
+                ('date_declenchement', models.DateTimeField(auto_now_add=True)),
+                ('date_resolution', models.DateTimeField(blank=True, null=True)),
+                ('etudiant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes_absence', to='etudiants.etudiant')),
+            ],
+            options={
+                'verbose_name': "Alerte d'absence",
+                'verbose_name_plural': "Alertes d'absence",
+                'indexes': [models.Index(fields=['est_active', 'date_declenchement'], name='absencealert_active_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('presences', '0008_absence_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('presences_jour', 'Présences par jour'), ('presences_classe', 'Présences par classe'), ('assiduite_etudiants', 'Taux de présence par étudiant'), ('alertes_absences', "Alertes d'absence"), ('presences_brut', "Présences de l'année scolaire")], max_length=20)),
+                ('format', models.CharField(choices=[('xlsx', 'Excel'), ('csv', 'CSV'), ('pdf', 'PDF')], default='xlsx', max_length=4)),
+                ('parametres', models.JSONField(blank=True, default=dict)),
+                ('empreinte', models.CharField(db_index=True, help_text='Type, format, paramètres et version des données', max_length=64)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_attente', max_length=10)),
+                ('progression', models.PositiveSmallIntegerField(default=0, help_text='Avancement en pourcentage')),
+                ('fichier', models.CharField(blank=True, help_text='Chemin du fichier produit', max_length=500, null=True)),
+                ('details_erreur', models.TextField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exportations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportation',
+                'verbose_name_plural': 'Exportations',
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presences', '0009_export_jobs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['-date_envoi', 'id'], name='message_date_envoi_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['parent', '-date_envoi', 'id'], name='message_parent_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['-date', 'id'], name='presence_date_id_idx'),
+        ),
+    ]
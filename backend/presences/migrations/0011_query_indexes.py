@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presences', '0010_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['statut', 'date_programmee'], name='message_scheduled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['classe', '-date_envoi', 'id'], name='message_classe_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['date', 'statut'], name='presence_date_statut_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 5000
+
+
+def backfill_classe(apps, schema_editor):
+    """Renseigne la classe des présences existantes avec la classe actuelle de l'étudiant, par lots"""
+    Presence = apps.get_model('presences', 'Presence')
+    Etudiant = apps.get_model('etudiants', 'Etudiant')
+
+    classe = models.Subquery(Etudiant.objects.filter(pk=models.OuterRef('etudiant_id')).values('classe_id')[:1])
+    bounds = Presence.objects.aggregate(first=models.Min('id'), last=models.Max('id'))
+    if bounds['first'] is None:
+        return
+    for start in range(bounds['first'], bounds['last'] + 1, BATCH_SIZE):
+        Presence.objects.filter(id__gte=start, id__lt=start + BATCH_SIZE, classe__isnull=True).update(classe=classe)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('etudiants', '0001_initial'),
+        ('presences', '0011_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presence',
+            name='classe',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='presences', to='etudiants.classe'),
+        ),
+        migrations.RunPython(backfill_classe, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='presence',
+            index=models.Index(fields=['classe', 'date'], name='presence_classe_date_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presences', '0012_presence_classe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircuitBreakerState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fournisseur', models.CharField(max_length=20, unique=True)),
+                ('echecs', models.PositiveIntegerField(default=0, help_text='Échecs consécutifs')),
+                ('ouvert_jusqua', models.DateTimeField(blank=True, help_text="Envois suspendus jusqu'à cette date", null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Disjoncteur',
+                'verbose_name_plural': 'Disjoncteurs',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('presences', '0013_circuit_breaker_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancewindow',
+            name='jours_ouvres',
+            field=models.PositiveIntegerField(default=0, help_text="Jours de classe de la fenêtre jusqu'à la veille, depuis l'inscription de l'étudiant"),
+        ),
+        migrations.AlterField(
+            model_name='attendancewindow',
+            name='taux',
+            field=models.FloatField(blank=True, help_text='Taux de présence en pourcentage (vide sans aucun jour compté)', null=True),
+        ),
+    ]
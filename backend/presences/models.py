@@ -1,6 +1,10 @@
+from django.conf import settings
 from django.db import models
 from etudiants.models import Etudiant
 
+# Statuts d'un étudiant venu en classe
+ATTENDED_STATUTS = ['present', 'retard', 'depart_anticipe']
+
 class Presence(models.Model):
     STATUT_CHOICES = [
         ('present', 'Présent'),
@@ -10,6 +14,14 @@ class Presence(models.Model):
     ]
 
     etudiant = models.ForeignKey(Etudiant, on_delete=models.CASCADE, related_name='presences')
+    # Classe de l'étudiant au moment de la présence, renseignée à l'enregistrement (voir
+    # presences.signals) : les statistiques par classe se passent de jointure sur les
+    # étudiants et restent justes après un changement de classe. Pas d'index propre :
+    # presence_classe_date_idx commence par la classe
+    classe = models.ForeignKey(
+        'etudiants.Classe', on_delete=models.SET_NULL, null=True, blank=True, related_name='presences',
+        db_index=False
+    )
     date = models.DateField()
     heure_arrivee = models.TimeField(blank=True, null=True)
     heure_depart = models.TimeField(blank=True, null=True)
@@ -23,11 +35,142 @@ class Presence(models.Model):
         unique_together = ['etudiant', 'date']
         verbose_name = 'Présence'
         verbose_name_plural = 'Présences'
+        indexes = [
+            # Pagination par clé de l'API : ORDER BY date DESC, id
+            models.Index(fields=['-date', 'id'], name='presence_date_id_idx'),
+            # Présences d'une journée par statut (récapitulatif des absences et retards)
+            models.Index(fields=['date', 'statut'], name='presence_date_statut_idx'),
+            # Présences d'une classe sur une période
+            models.Index(fields=['classe', 'date'], name='presence_classe_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.etudiant} - {self.date} - {self.statut}"
 
 
+class DailyAttendanceSummary(models.Model):
+    """
+    Résumé des présences d'une classe pour une journée
+
+    Tenu à jour à chaque écriture de présence (voir presences.signals) et
+    reconstruit par la commande `rebuild_attendance_summary`.
+    """
+
+    # Compteur correspondant à chaque statut de présence
+    STATUT_FIELDS = {
+        'present': 'presents',
+        'retard': 'retards',
+        'absent': 'absents',
+        'depart_anticipe': 'departs_anticipes',
+    }
+
+    date = models.DateField()
+    classe = models.ForeignKey('etudiants.Classe', on_delete=models.CASCADE, related_name='resumes_presences')
+    presents = models.PositiveIntegerField(default=0)
+    retards = models.PositiveIntegerField(default=0)
+    absents = models.PositiveIntegerField(default=0)
+    departs_anticipes = models.PositiveIntegerField(default=0)
+    effectif = models.PositiveIntegerField(default=0, help_text="Nombre d'étudiants actifs inscrits dans la classe")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['date', 'classe']
+        verbose_name = 'Résumé quotidien des présences'
+        verbose_name_plural = 'Résumés quotidiens des présences'
+
+    def __str__(self):
+        return f"{self.classe} - {self.date}"
+
+    @property
+    def venus(self):
+        """Étudiants venus en classe (présents, en retard ou partis plus tôt)"""
+        return self.presents + self.retards + self.departs_anticipes
+
+
+
+class AttendanceWindow(models.Model):
+    """
+    Compteurs de présence d'un étudiant sur une fenêtre glissante (ABSENCE_ALERT_WINDOW_DAYS)
+
+    Tenus à jour à chaque écriture de présence et décalés chaque jour par
+    `AbsenceAlertService.slide` ; le taux est indexé pour que la recherche des
+    étudiants sous un seuil soit une simple lecture d'index. Il est rapporté aux
+    jours de classe écoulés (`jours_ouvres`), ou aux journées enregistrées si
+    elles sont plus nombreuses.
+    """
+
+    etudiant = models.OneToOneField('etudiants.Etudiant', on_delete=models.CASCADE, related_name='fenetre_presence')
+    fin_fenetre = models.DateField(help_text="Dernière journée de la fenêtre")
+    jours_presents = models.PositiveIntegerField(default=0)
+    jours_enregistres = models.PositiveIntegerField(default=0)
+    jours_ouvres = models.PositiveIntegerField(
+        default=0,
+        help_text="Jours de classe de la fenêtre jusqu'à la veille, depuis l'inscription de l'étudiant"
+    )
+    taux = models.FloatField(blank=True, null=True, help_text="Taux de présence en pourcentage (vide sans aucun jour compté)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['taux'], name='attendancewindow_taux_idx'),
+        ]
+        verbose_name = 'Fenêtre de présence'
+        verbose_name_plural = 'Fenêtres de présence'
+
+    def __str__(self):
+        return f"{self.etudiant} - {self.taux}"
+
+
+class AbsenceAlert(models.Model):
+    """
+    Alerte déclenchée lorsqu'un étudiant passe sous le seuil de présence
+    """
+
+    etudiant = models.ForeignKey('etudiants.Etudiant', on_delete=models.CASCADE, related_name='alertes_absence')
+    taux = models.FloatField(help_text="Taux de présence au déclenchement")
+    seuil = models.FloatField()
+    est_active = models.BooleanField(default=True)
+    date_declenchement = models.DateTimeField(auto_now_add=True)
+    date_resolution = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['est_active', 'date_declenchement'], name='absencealert_active_idx'),
+        ]
+        verbose_name = "Alerte d'absence"
+        verbose_name_plural = "Alertes d'absence"
+
+    def __str__(self):
+        return f"{self.etudiant} - {self.taux}% ({self.date_declenchement})"
+
+
+class MessageTemplate(models.Model):
+    TYPE_CHOICES = [
+        ('sms', 'SMS'),
+        ('email', 'Email'),
+    ]
+
+    nom = models.CharField(max_length=255)
+    code = models.SlugField(max_length=50, blank=True, null=True,
+                            help_text="Identifiant des modèles utilisés par les notifications automatiques (absence, retard)")
+    type = models.CharField(max_length=5, choices=TYPE_CHOICES)
+    sujet = models.CharField(max_length=255, blank=True, null=True)
+    contenu = models.TextField()
+    est_html = models.BooleanField(default=False)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['code', 'type'], condition=models.Q(code__isnull=False),
+                                    name='messagetemplate_code_type_unique'),
+        ]
+        verbose_name = 'Modèle de message'
+        verbose_name_plural = 'Modèles de messages'
+
+    def __str__(self):
+        return f"{self.nom} ({self.type})"
+
 
 class Message(models.Model):
     TYPE_CHOICES = [
@@ -41,6 +184,7 @@ class Message(models.Model):
         ('en_attente', 'En attente'),
         ('envoye', 'Envoyé'),
         ('echec', 'Échec'),
+        ('abandonne', 'Abandonné'),
     ]
 
     parent = models.ForeignKey('etudiants.Parent', on_delete=models.CASCADE, related_name='messages')
@@ -55,6 +199,24 @@ class Message(models.Model):
     sujet = models.CharField(max_length=255, blank=True, null=True)
     est_lu = models.BooleanField(default=False, verbose_name="Message lu")
     date_lecture = models.DateTimeField(blank=True, null=True, verbose_name="Date de lecture")
+    tentatives = models.PositiveIntegerField(default=0, verbose_name="Nombre de tentatives")
+    prochaine_tentative = models.DateTimeField(blank=True, null=True, verbose_name="Prochaine tentative")
+    template = models.ForeignKey(MessageTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
+
+    class Meta:
+        indexes = [
+            # File des nouvelles tentatives : statut='echec' et prochaine_tentative <= maintenant
+            models.Index(fields=['statut', 'prochaine_tentative'], name='message_retry_idx'),
+            # Messages programmés échus : statut='programme' et date_programmee <= maintenant
+            models.Index(fields=['statut', 'date_programmee'], name='message_scheduled_idx'),
+            # Pagination par clé de l'API : ORDER BY date_envoi DESC, id (tous les messages, ou ceux d'un parent)
+            models.Index(fields=['-date_envoi', 'id'], name='message_date_envoi_id_idx'),
+            models.Index(fields=['parent', '-date_envoi', 'id'], name='message_parent_date_idx'),
+            # Messages de groupe d'une classe, du plus récent au plus ancien. est_message_groupe
+            # n'en fait pas partie : un filtre booléen est écrit sans comparaison (WHERE
+            # est_message_groupe) et n'utilise pas d'index
+            models.Index(fields=['classe', '-date_envoi', 'id'], name='message_classe_date_idx'),
+        ]
 
     def __str__(self):
         if self.est_message_groupe:
@@ -62,3 +224,75 @@ class Message(models.Model):
         else:
             destinataire = str(self.parent)
         return f"{self.type} à {destinataire} - {self.date_envoi.strftime('%d/%m/%Y %H:%M')}"
+
+
+class ExportJob(models.Model):
+    """
+    Exportation générée en tâche de fond (voir presences.export_jobs)
+
+    Le fichier produit est réutilisé tant qu'une demande identique porte sur
+    des données inchangées (même empreinte).
+    """
+    TYPE_CHOICES = [
+        ('presences_jour', 'Présences par jour'),
+        ('presences_classe', 'Présences par classe'),
+        ('assiduite_etudiants', 'Taux de présence par étudiant'),
+        ('alertes_absences', "Alertes d'absence"),
+        ('presences_brut', "Présences de l'année scolaire"),
+    ]
+
+    FORMAT_CHOICES = [
+        ('xlsx', 'Excel'),
+        ('csv', 'CSV'),
+        ('pdf', 'PDF'),
+    ]
+
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    format = models.CharField(max_length=4, choices=FORMAT_CHOICES, default='xlsx')
+    parametres = models.JSONField(default=dict, blank=True)
+    empreinte = models.CharField(max_length=64, db_index=True, help_text="Type, format, paramètres et version des données")
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='en_attente')
+    progression = models.PositiveSmallIntegerField(default=0, help_text="Avancement en pourcentage")
+    fichier = models.CharField(max_length=500, blank=True, null=True, help_text="Chemin du fichier produit")
+    details_erreur = models.TextField(blank=True, null=True)
+    cree_par = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='exportations'
+    )
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(blank=True, null=True)
+    date_fin = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-date_creation']
+        verbose_name = 'Exportation'
+        verbose_name_plural = 'Exportations'
+
+    def __str__(self):
+        return f"{self.get_type_display()} ({self.format}) - {self.get_statut_display()}"
+
+
+class CircuitBreakerState(models.Model):
+    """
+    État du disjoncteur d'un fournisseur d'envoi (voir presences.services.retry_service)
+
+    Conservé en base pour être partagé par tous les processus : chaque passage
+    de la tâche cron des messages est un nouveau processus.
+    """
+    fournisseur = models.CharField(max_length=20, unique=True)
+    echecs = models.PositiveIntegerField(default=0, help_text="Échecs consécutifs")
+    ouvert_jusqua = models.DateTimeField(blank=True, null=True, help_text="Envois suspendus jusqu'à cette date")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Disjoncteur'
+        verbose_name_plural = 'Disjoncteurs'
+
+    def __str__(self):
+        return f"{self.fournisseur} - {self.echecs} échecs"
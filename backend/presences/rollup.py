@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Presence, DailyAttendanceSummary
+from etudiants.models import Etudiant
+
+
+class AttendanceRollupService:
+    """
+    Service de maintenance des résumés quotidiens de présence par classe
+
+    Chaque écriture de présence ajuste un compteur de la ligne (date, classe)
+    correspondante ; `rebuild` recalcule les résumés à partir des présences.
+    """
+
+    @staticmethod
+    def active_headcounts(classe_ids=None):
+        """Nombre d'étudiants actifs par classe (une seule requête)"""
+        students = Etudiant.objects.filter(statut='actif')
+        if classe_ids is not None:
+            students = students.filter(classe_id__in=classe_ids)
+        return dict(
+            students.values_list('classe_id').annotate(count=Count('id')).values_list('classe_id', 'count')
+        )
+
+    @staticmethod
+    def ensure_summaries(date, classe_ids):
+        """Crée les résumés manquants de la journée pour les classes données"""
+        classe_ids = set(classe_ids)
+        existing = set(
+            DailyAttendanceSummary.objects.filter(date=date, classe_id__in=classe_ids)
+            .values_list('classe_id', flat=True)
+        )
+        missing = classe_ids - existing
+        if missing:
+            headcounts = AttendanceRollupService.active_headcounts(missing)
+            DailyAttendanceSummary.objects.bulk_create(
+                [
+                    DailyAttendanceSummary(date=date, classe_id=classe_id, effectif=headcounts.get(classe_id, 0))
+                    for classe_id in missing
+                ],
+                ignore_conflicts=True
+            )
+
+    @staticmethod
+    def apply_counts(date, statut, counts_by_classe, create=True):
+        """
+        Ajoute des écarts aux compteurs d'un statut pour une journée
+
+        Args:
+            date (date): Journée concernée
+            statut (str): Statut de présence ('present', 'absent', ...)
+            counts_by_classe (dict): Écart à appliquer par identifiant de classe
+            create (bool): Créer les résumés manquants (inutile pour un retrait)
+        """
+        field = DailyAttendanceSummary.STATUT_FIELDS.get(statut)
+        counts_by_classe = {classe_id: delta for classe_id, delta in counts_by_classe.items() if delta}
+        if field is None or not counts_by_classe:
+            return
+
+        if create:
+            AttendanceRollupService.ensure_summaries(date, counts_by_classe)
+        for classe_id, delta in counts_by_classe.items():
+            # Mise à jour atomique en base ; le plancher à zéro protège d'un résumé désynchronisé
+            DailyAttendanceSummary.objects.filter(date=date, classe_id=classe_id).update(
+                updated_at=timezone.now(), **{field: Greatest(F(field) + delta, Value(0))}
+            )
+
+    @staticmethod
+    def apply(date, classe_id, statut, delta):
+        """Ajoute un écart au compteur d'un statut pour une classe et une journée"""
+        AttendanceRollupService.apply_counts(date, statut, {classe_id: delta}, create=delta > 0)
+
+    @staticmethod
+    def rebuild(start_date=None, end_date=None):
+        """
+        Reconstruit les résumés à partir des présences enregistrées
+
+        Args:
+            start_date (date, optional): Première journée à reconstruire
+            end_date (date, optional): Dernière journée à reconstruire
+
+        Returns:
+            int: Nombre de résumés créés
+        """
+        presences = Presence.objects.all()
+        summaries = DailyAttendanceSummary.objects.all()
+        if start_date:
+            presences = presences.filter(date__gte=start_date)
+            summaries = summaries.filter(date__gte=start_date)
+        if end_date:
+            presences = presences.filter(date__lte=end_date)
+            summaries = summaries.filter(date__lte=end_date)
+
+        counts = {
+            field: Count('id', filter=Q(statut=statut))
+            for statut, field in DailyAttendanceSummary.STATUT_FIELDS.items()
+        }
+        rows = (
+            presences.filter(classe__isnull=False).values('date', 'classe_id')
+            .annotate(**counts)
+            .order_by()
+        )
+        headcounts = AttendanceRollupService.active_headcounts()
+
+        with transaction.atomic():
+            summaries.delete()
+            created = DailyAttendanceSummary.objects.bulk_create(
+                (
+                    DailyAttendanceSummary(
+                        date=row['date'],
+                        classe_id=row['classe_id'],
+                        effectif=headcounts.get(row['classe_id'], 0),
+                        **{field: row[field] for field in counts}
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=1000
+            )
+        return len(created)
@@ -0,0 +1,99 @@
+"""
+Calendrier scolaire : jours ouvrables, jours fériés et vacances
+
+Le calendrier est lu dans `Ecole.configuration` :
+
+    {
+        "jours_feries": ["2025-11-01", "2025-12-25"],
+        "vacances": [{"debut": "2025-12-20", "fin": "2026-01-04"}]
+    }
+
+Les jours ouvrables vont du lundi au vendredi, hors jours fériés et vacances.
+Les comptes sont calculés sans parcourir la période jour par jour.
+"""
+from datetime import date as date_type, datetime, timedelta
+
+from ecole.models import Ecole
+
+
+def _parse_date(value):
+    if isinstance(value, date_type):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+class SchoolCalendar:
+    """Calendrier des jours de classe d'une école"""
+
+    def __init__(self, holidays=(), vacations=()):
+        """
+        Args:
+            holidays (iterable): Jours fériés (dates ou chaînes YYYY-MM-DD)
+            vacations (iterable): Périodes de vacances (début, fin), bornes incluses
+        """
+        self.vacations = self._merge(
+            (_parse_date(debut), _parse_date(fin)) for debut, fin in vacations
+        )
+        # Les jours fériés tombant en vacances ou le week-end sont déjà exclus
+        self.holidays = frozenset(
+            day for day in map(_parse_date, holidays)
+            if day.weekday() < 5 and not self._in_vacations(day)
+        )
+
+    @classmethod
+    def from_ecole(cls, ecole=None):
+        """Construit le calendrier depuis la configuration de l'école (la première par défaut)"""
+        if ecole is None:
+            ecole = Ecole.objects.only('configuration').first()
+        return cls.from_configuration(ecole.configuration if ecole else None)
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Construit le calendrier depuis un dictionnaire de configuration"""
+        configuration = configuration or {}
+        try:
+            return cls(
+                holidays=configuration.get('jours_feries', []),
+                vacations=[
+                    (periode['debut'], periode['fin'])
+                    for periode in configuration.get('vacances', [])
+                ]
+            )
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Calendrier scolaire invalide dans la configuration de l'école: {str(e)}")
+
+    @staticmethod
+    def _merge(periods):
+        """Trie et fusionne les périodes qui se chevauchent ou se touchent"""
+        merged = []
+        for debut, fin in sorted(period for period in periods if period[0] <= period[1]):
+            if merged and debut <= merged[-1][1] + timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], fin))
+            else:
+                merged.append((debut, fin))
+        return merged
+
+    def _in_vacations(self, day):
+        return any(debut <= day <= fin for debut, fin in self.vacations)
+
+    @staticmethod
+    def count_weekdays(start_date, end_date):
+        """Nombre de jours du lundi au vendredi entre deux dates incluses"""
+        if end_date < start_date:
+            return 0
+        weeks, extra = divmod((end_date - start_date).days + 1, 7)
+        first = start_date.weekday()
+        # Les jours restants forment moins d'une semaine à partir de `first`
+        return weeks * 5 + sum(1 for offset in range(extra) if (first + offset) % 7 < 5)
+
+    def working_days(self, start_date, end_date):
+        """Nombre de jours de classe entre deux dates incluses"""
+        count = self.count_weekdays(start_date, end_date)
+        for debut, fin in self.vacations:
+            count -= self.count_weekdays(max(debut, start_date), min(fin, end_date))
+        count -= sum(1 for holiday in self.holidays if start_date <= holiday <= end_date)
+        return count
+
+    def is_working_day(self, day):
+        """Indique si une date est un jour de classe"""
+        return day.weekday() < 5 and day not in self.holidays and not self._in_vacations(day)
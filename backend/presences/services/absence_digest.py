@@ -0,0 +1,219 @@
+import logging
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from etudiants.models import Etudiant, Parent
+from presences.alerts import AbsenceAlertService
+from presences.cache import StatisticsCache
+from presences.live import LiveFeed
+from presences.models import Presence, Message
+from presences.rollup import AttendanceRollupService
+from presences.school_calendar import SchoolCalendar
+from .notifier import AsyncSMSNotifier, Delivery, NotificationDispatcher
+from .retry_service import RetryPolicy
+from .template_engine import TemplateEngine
+
+logger = logging.getLogger(__name__)
+
+# Tentatives d'insertion des absences quand une présence est enregistrée pendant l'insertion
+RECORD_ATTEMPTS = 3
+
+
+class AbsenceDigestService:
+    """
+    Service pour l'envoi du récapitulatif quotidien des absences et retards
+
+    Après l'heure limite (ABSENCE_DIGEST_CUTOFF), les étudiants actifs sans
+    présence enregistrée pour la journée sont marqués absents, puis toutes les
+    absences et tous les retards non encore notifiés sont regroupés par parent :
+    des frères et sœurs suivis par le même numéro ou la même adresse email
+    donnent un seul message.
+
+    La notification immédiate est désactivée toute la journée : la tâche cron
+    repasse jusqu'au soir (ABSENCE_DIGEST_CATCHUP_MINUTES) et notifie les
+    absences et retards enregistrés après l'heure limite.
+    """
+
+    @staticmethod
+    def cutoff_time():
+        return datetime.strptime(settings.ABSENCE_DIGEST_CUTOFF, '%H:%M').time()
+
+    @staticmethod
+    def run(date=None, force=False):
+        """
+        Calcule et envoie le récapitulatif des absences d'une journée
+
+        Args:
+            date (date, optional): Journée à traiter. Par défaut, aujourd'hui.
+            force (bool): Ignorer l'heure limite et le contrôle des jours sans classe
+
+        Returns:
+            dict: Résultat du traitement
+        """
+        now = timezone.localtime()
+        date = date or now.date()
+
+        if not force:
+            if not SchoolCalendar.from_ecole().is_working_day(date):
+                return {'success': True, 'message': "Pas de récapitulatif un jour sans classe", 'sent': 0}
+            if date == now.date() and now.time() < AbsenceDigestService.cutoff_time():
+                return {
+                    'success': True,
+                    'message': f"Heure limite ({settings.ABSENCE_DIGEST_CUTOFF}) non atteinte",
+                    'sent': 0
+                }
+
+        recorded = AbsenceDigestService.record_missing_students(date)
+
+        # Absences et retards non encore notifiés (y compris ceux enregistrés ci-dessus)
+        pending = list(
+            Presence.objects.filter(
+                date=date,
+                statut__in=['absent', 'retard'],
+                notification_envoyee=False
+            ).select_related('etudiant')
+        )
+        if not pending:
+            return {'success': True, 'message': "Aucune absence à notifier", 'recorded': recorded, 'sent': 0}
+
+        presences_by_student = {presence.etudiant_id: presence for presence in pending}
+        parents = Parent.objects.filter(etudiant_id__in=presences_by_student).select_related('etudiant')
+
+        groups = AbsenceDigestService.group_by_contact(parents, presences_by_student)
+        date_label = date.strftime('%d/%m/%Y')
+
+        counters = {'sent': 0, 'failed': 0}
+        for channel, channel_groups in groups.items():
+            if channel_groups:
+                AbsenceDigestService._send_channel(channel, channel_groups, date_label, counters)
+
+        Presence.objects.filter(id__in=[presence.id for presence in pending]).update(notification_envoyee=True)
+        StatisticsCache.bump_presences(date)
+
+        return {
+            'success': True,
+            'message': f"Récapitulatif du {date_label}: {counters['sent']} messages envoyés, {counters['failed']} échecs",
+            'recorded': recorded,
+            'students': len(pending),
+            **counters
+        }
+
+    @staticmethod
+    def missing_students(date):
+        """Étudiants actifs sans présence enregistrée pour la date (une seule requête)"""
+        return Etudiant.objects.filter(statut='actif').filter(
+            ~Exists(Presence.objects.filter(etudiant=OuterRef('pk'), date=date))
+        )
+
+    @staticmethod
+    def record_missing_students(date):
+        """Enregistre une absence pour chaque étudiant actif sans présence à la date donnée"""
+        for attempt in range(RECORD_ATTEMPTS):
+            missing = list(AbsenceDigestService.missing_students(date).values_list('id', 'classe_id'))
+            if not missing:
+                return 0
+            try:
+                # Tout ou rien : les résumés sont ajustés pour exactement les absences insérées
+                with transaction.atomic():
+                    AbsenceDigestService._insert_absences(date, missing)
+                break
+            except IntegrityError:
+                # Présence enregistrée entre la recherche et l'insertion : nouvelle recherche
+                if attempt == RECORD_ATTEMPTS - 1:
+                    raise
+
+        # Après la validation : une lecture concurrente ne peut pas remettre en cache l'état précédent
+        for classe_id in {classe_id for _, classe_id in missing}:
+            StatisticsCache.bump(date, classe_id)
+        StatisticsCache.bump_presences(date)
+        LiveFeed.publish_resync(date)
+        return len(missing)
+
+    @staticmethod
+    def _insert_absences(date, missing):
+        """Insère les absences de `missing` [(étudiant, classe)] et met à jour les résumés et les fenêtres"""
+        Presence.objects.bulk_create(
+            [
+                Presence(etudiant_id=etudiant_id, classe_id=classe_id, date=date, statut='absent')
+                for etudiant_id, classe_id in missing
+            ],
+            batch_size=500
+        )
+
+        # bulk_create ne déclenche pas les signaux : mise à jour des résumés en une fois
+        AttendanceRollupService.apply_counts(date, 'absent', Counter(classe_id for _, classe_id in missing))
+        AbsenceAlertService.record_bulk([etudiant_id for etudiant_id, _ in missing], date)
+
+    @staticmethod
+    def group_by_contact(parents, presences_by_student):
+        """
+        Regroupe les enfants à signaler par numéro de téléphone et par adresse email
+
+        Returns:
+            dict: {'sms': {numéro: groupe}, 'email': {adresse: groupe}}, chaque groupe
+            contenant le premier parent rencontré et la liste des enfants
+        """
+        groups = {'sms': {}, 'email': {}}
+        for parent in parents:
+            contacts = []
+            if parent.notifications_sms and parent.telephone:
+                contacts.append(('sms', AsyncSMSNotifier.clean_phone_number(parent.telephone)))
+            if parent.notifications_email and parent.email:
+                contacts.append(('email', parent.email.strip().lower()))
+
+            presence = presences_by_student[parent.etudiant_id]
+            for channel, key in contacts:
+                group = groups[channel].setdefault(key, {'parent': parent, 'address': key, 'enfants': []})
+                if all(enfant['etudiant'].id != parent.etudiant_id for enfant in group['enfants']):
+                    group['enfants'].append({
+                        'etudiant': parent.etudiant,
+                        'statut': presence.statut,
+                        'heure': presence.heure_arrivee.strftime('%H:%M') if presence.heure_arrivee else None,
+                    })
+        return groups
+
+    @staticmethod
+    def _send_channel(channel, channel_groups, date_label, counters):
+        """Rend et envoie les récapitulatifs d'un canal, puis enregistre les messages"""
+        template = TemplateEngine.get('digest', channel)
+        groups = list(channel_groups.values())
+        broadcast = template.render_broadcast(
+            (group['address'], {'parent': group['parent'], 'enfants': group['enfants'], 'date': date_label})
+            for group in groups
+        )
+        deliveries = [
+            Delivery(address, rendered.text, subject=rendered.subject, message=mime)
+            for address, rendered, mime in broadcast
+        ]
+        results = NotificationDispatcher.send_many(channel, deliveries)
+
+        now = timezone.now()
+        policy = RetryPolicy()
+        messages = []
+        for group, (_, rendered, _), result in zip(groups, broadcast, results):
+            message = Message(
+                parent=group['parent'],
+                type=channel,
+                sujet=rendered.subject,
+                contenu=rendered.text,
+                tentatives=1
+            )
+            if result['success']:
+                message.statut = 'envoye'
+                counters['sent'] += 1
+            else:
+                # Les échecs rejoignent la file des nouvelles tentatives
+                message.statut = 'echec'
+                message.details_erreur = result.get('message', 'Erreur inconnue')
+                message.prochaine_tentative = policy.next_attempt_at(1, now)
+                counters['failed'] += 1
+            messages.append(message)
+
+        Message.objects.bulk_create(messages, batch_size=500)
+        StatisticsCache.bump_messages()
+        logger.info(f"Récapitulatif des absences: {len(messages)} messages {channel} enregistrés")
@@ -1,13 +1,17 @@
+from .mime_skeleton import MimeSkeleton
+from .notifier import Delivery, NotificationDispatcher
+from .template_engine import TemplateEngine
+
+
 class EmailService:
     """
     Service pour l'envoi d'emails
     """
     
     def __init__(self):
-        # Initialisation du service d'email (à remplacer par une vraie implémentation)
         self.initialized = True
     
-    def send_email(self, email, subject, message):
+    def send_email(self, email, subject, message, html_message=None, attachments=None, tracking_id=None):
         """
         Envoie un email
         
@@ -15,53 +19,143 @@ class EmailService:
             email (str): Adresse email du destinataire
             subject (str): Sujet de l'email
             message (str): Contenu de l'email
+            html_message (str, optional): Version HTML du message
+            attachments (list, optional): Chemins de fichiers ou objets File à joindre
+            tracking_id (str, optional): ID de suivi pour les statistiques d'ouverture
             
         Returns:
             dict: Résultat de l'envoi
         """
-        # Simulation d'envoi d'email (à remplacer par une vraie implémentation)
-        print(f"Email envoyé à {email}")
-        print(f"Sujet: {subject}")
-        print(f"Message: {message}")
+        delivery = Delivery(email, message, subject=subject, html=html_message)
+        if attachments or tracking_id:
+            skeleton = MimeSkeleton(subject, message, html_message, attachments)
+            delivery.message = skeleton.builder(email, tracking_id)
         
-        return {
-            'success': True,
-            'message': 'Email envoyé avec succès',
-            'email': email
-        }
+        result = NotificationDispatcher.send('email', delivery)
+        result['email'] = email
+        return result
     
-    def send_bulk_email(self, parents, subject, message):
+    def send_bulk_email(self, parents, subject, message, html_message=None, attachments=None, tracking_ids=None):
         """
         Envoie un email à plusieurs parents
         
+        Les parties communes (texte, HTML, pièces jointes encodées) sont
+        construites une seule fois dans un squelette MIME ; seuls les en-têtes
+        et le pixel de suivi changent d'un destinataire à l'autre. Les emails
+        sont envoyés en parallèle sur un pool de connexions SMTP.
+        
         Args:
             parents (QuerySet): Liste des parents
             subject (str): Sujet de l'email
             message (str): Contenu de l'email
+            html_message (str, optional): Version HTML du message
+            attachments (list, optional): Chemins de fichiers ou objets File à joindre
+            tracking_ids (dict, optional): ID de suivi par identifiant de parent
             
         Returns:
             dict: Résultat de l'envoi
         """
-        total = parents.count()
+        tracking_ids = tracking_ids or {}
+        skeleton = MimeSkeleton(subject, message, html_message, attachments)
+        recipients = [parent for parent in parents if parent.email]
+        results = NotificationDispatcher.send_many(
+            'email',
+            [
+                Delivery(parent.email, message, subject=subject,
+                         message=skeleton.builder(parent.email, tracking_ids.get(parent.id)))
+                for parent in recipients
+            ]
+        )
+
         success_count = 0
         details = []
+        for parent, result in zip(recipients, results):
+            if result['success']:
+                success_count += 1
+
+            details.append({
+                'parent': f"{parent.prenom} {parent.nom}",
+                'success': result['success'],
+                'message': result.get('message', '')
+            })
+
+        return {
+            'success': success_count,
+            'message': f"{success_count} emails envoyés sur {len(parents)}",
+            'total': len(parents),
+            'details': details
+        }
+
+    def send_absence_notification(self, parent, etudiant, date):
+        """
+        Envoie une notification d'absence par email à un parent
         
-        for parent in parents:
-            if parent.email:
-                result = self.send_email(parent.email, subject, message)
-                if result['success']:
-                    success_count += 1
-                
-                details.append({
-                    'parent': f"{parent.prenom} {parent.nom}",
-                    'success': result['success'],
-                    'message': result.get('message', '')
-                })
+        Args:
+            parent (Parent): Parent à notifier
+            etudiant (Etudiant): Étudiant absent
+            date (str): Date de l'absence
+            
+        Returns:
+            dict: Résultat de l'envoi
+        """
+        rendered = TemplateEngine.get('absence', 'email').render(
+            {'parent': parent, 'etudiant': etudiant, 'date': date}
+        )
+        return self.send_email(parent.email, rendered.subject, rendered.text, html_message=rendered.html)
+    
+    def send_late_notification(self, parent, etudiant, date, heure):
+        """
+        Envoie une notification de retard par email à un parent
+        
+        Args:
+            parent (Parent): Parent à notifier
+            etudiant (Etudiant): Étudiant en retard
+            date (str): Date du retard
+            heure (str): Heure d'arrivée
+            
+        Returns:
+            dict: Résultat de l'envoi
+        """
+        rendered = TemplateEngine.get('retard', 'email').render(
+            {'parent': parent, 'etudiant': etudiant, 'date': date, 'heure': heure}
+        )
+        return self.send_email(parent.email, rendered.subject, rendered.text, html_message=rendered.html)
+    
+    def send_template_bulk_email(self, parents, template, **extra_context):
+        """
+        Envoie un modèle de message à plusieurs parents, rendu pour chacun
+        
+        Le texte, le HTML et la structure MIME de toute la diffusion sont
+        produits en une seule passe avant l'envoi parallèle.
         
+        Args:
+            parents (QuerySet): Liste des parents
+            template (CompiledMessageTemplate): Modèle compilé
+            extra_context: Variables communes à tous les destinataires
+            
+        Returns:
+            dict: Résultat de l'envoi
+        """
+        recipients = [parent for parent in parents if parent.email]
+        broadcast = template.render_broadcast(
+            (parent.email, TemplateEngine.parent_context(parent, **extra_context)) for parent in recipients
+        )
+        results = NotificationDispatcher.send_many(
+            'email', [Delivery(address, rendered.text, subject=rendered.subject, message=mime)
+                      for address, rendered, mime in broadcast]
+        )
+        
+        success_count = sum(1 for result in results if result['success'])
         return {
-            'success': success_count > 0,
-            'message': f"{success_count} emails envoyés sur {total}",
-            'total': total,
             'success': success_count,
-            'details': details
+            'message': f"{success_count} emails envoyés sur {len(parents)}",
+            'total': len(parents),
+            'details': [
+                {
+                    'parent': f"{parent.prenom} {parent.nom}",
+                    'success': result['success'],
+                    'message': result.get('message', '')
+                }
+                for parent, result in zip(recipients, results)
+            ]
         }
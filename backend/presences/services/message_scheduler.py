@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import Q
 from presences.models import Message
+from etudiants.models import Parent
 import logging
 import sys
 import os
@@ -10,6 +12,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(
 
 # Importer directement les classes depuis le module services.py
 from presences.services import SMSService, EmailService
+from presences.services.notifier import Delivery, NotificationDispatcher
+from presences.services.retry_service import MessageRetryService, get_circuit_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +25,8 @@ class MessageSchedulerService:
     @staticmethod
     def process_scheduled_messages():
         """
-        Traite tous les messages programmés dont la date de programmation est passée
+        Traite tous les messages programmés dont la date de programmation est passée,
+        ainsi que les messages en échec dont la prochaine tentative est échue
         """
         now = timezone.now()
 
@@ -30,59 +35,141 @@ class MessageSchedulerService:
             statut='programme',
             date_programmee__lte=now
         )
+        retry_messages = MessageRetryService.due_retries(now)
 
-        if not scheduled_messages.exists():
+        if not scheduled_messages.exists() and not retry_messages.exists():
             logger.info("Aucun message programmé à envoyer")
             return {
                 'success': True,
                 'message': "Aucun message programmé à envoyer",
                 'processed': 0,
                 'success_count': 0,
-                'error_count': 0
+                'error_count': 0,
+                'retry_count': 0,
+                'dead_letter_count': 0,
+                'skipped_count': 0
             }
 
-        processed = 0
-        success_count = 0
-        error_count = 0
-
-        # Traiter chaque message programmé
-        for message in scheduled_messages:
-            try:
-                # Envoyer le message selon son type
-                if message.type == 'sms':
-                    result = MessageSchedulerService._send_sms(message)
-                else:  # email
-                    result = MessageSchedulerService._send_email(message)
-
-                # Mettre à jour le statut du message
-                if result['success']:
-                    message.statut = 'envoye'
-                    message.date_envoi = now
-                    success_count += 1
-                else:
-                    message.statut = 'echec'
-                    message.details_erreur = result.get('message', 'Erreur inconnue')
-                    error_count += 1
+        counters = {
+            'processed': 0,
+            'success_count': 0,
+            'error_count': 0,
+            'retry_count': 0,
+            'dead_letter_count': 0,
+            'skipped_count': 0
+        }
 
-                message.save()
-                processed += 1
+        # Les messages de groupe passent par les envois groupés ; les messages
+        # individuels sont regroupés par canal et envoyés en parallèle
+        individual_messages = {'sms': [], 'email': []}
+        for queryset in (scheduled_messages, retry_messages):
+            for message in queryset.select_related('parent', 'classe'):
+                if message.est_message_groupe:
+                    MessageSchedulerService._process_message(message, now, counters)
+                else:
+                    individual_messages[message.type].append(message)
 
-            except Exception as e:
-                logger.error(f"Erreur lors du traitement du message programmé {message.id}: {str(e)}")
-                message.statut = 'echec'
-                message.details_erreur = str(e)
-                message.save()
-                error_count += 1
-                processed += 1
+        for channel, messages in individual_messages.items():
+            if messages:
+                MessageSchedulerService._process_individual_messages(channel, messages, now, counters)
 
         return {
             'success': True,
-            'message': f"Traitement terminé: {processed} messages traités, {success_count} succès, {error_count} échecs",
-            'processed': processed,
-            'success_count': success_count,
-            'error_count': error_count
+            'message': f"Traitement terminé: {counters['processed']} messages traités, "
+                       f"{counters['success_count']} succès, {counters['error_count']} échecs",
+            **counters
         }
 
+    @staticmethod
+    def _process_message(message, now, counters):
+        """
+        Envoie un message de groupe et met à jour son statut, ses tentatives et les compteurs
+        """
+        breaker = get_circuit_breaker(message.type)
+        if not breaker.allow_request():
+            # Fournisseur indisponible : le message reste dans sa file et sera repris plus tard
+            counters['skipped_count'] += 1
+            return
+
+        try:
+            # Envoyer le message selon son type
+            if message.type == 'sms':
+                result = MessageSchedulerService._send_sms(message)
+            else:  # email
+                result = MessageSchedulerService._send_email(message)
+            error = None if result['success'] else result.get('message', 'Erreur inconnue')
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement du message programmé {message.id}: {str(e)}")
+            error = str(e)
+
+        MessageSchedulerService._record_result(message, breaker, error, now, counters)
+
+    @staticmethod
+    def _process_individual_messages(channel, messages, now, counters):
+        """
+        Envoie en parallèle des messages individuels d'un même canal
+
+        Les messages partent par lots de MESSAGE_SEND_CHUNK_SIZE ; le disjoncteur est
+        consulté avant chaque lot, ce qui arrête l'envoi dès qu'il s'ouvre. Un disjoncteur
+        semi-ouvert n'autorise qu'un seul message d'essai : le reste n'est envoyé qu'en
+        cas de succès.
+        """
+        breaker = get_circuit_breaker(channel)
+        chunk_size = settings.MESSAGE_SEND_CHUNK_SIZE
+        index = 0
+        while index < len(messages):
+            state = breaker.request_state()
+            if state is None:
+                # Fournisseur indisponible : les messages restants seront repris plus tard
+                counters['skipped_count'] += len(messages) - index
+                return
+            size = 1 if state == breaker.HALF_OPEN else chunk_size
+            MessageSchedulerService._send_individual_chunk(
+                channel, messages[index:index + size], breaker, now, counters
+            )
+            index += size
+
+    @staticmethod
+    def _send_individual_chunk(channel, messages, breaker, now, counters):
+        """
+        Envoie un lot de messages individuels en parallèle et enregistre les résultats
+        """
+        deliveries = []
+        for message in messages:
+            if channel == 'sms':
+                deliveries.append(Delivery(message.parent.telephone, message.contenu))
+            else:
+                deliveries.append(Delivery(message.parent.email, message.contenu, subject=message.sujet))
+
+        try:
+            results = NotificationDispatcher.send_many(channel, deliveries)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'envoi groupé des messages {channel}: {str(e)}")
+            results = [{'success': False, 'message': str(e)}] * len(messages)
+
+        for message, result in zip(messages, results):
+            error = None if result['success'] else result.get('message', 'Erreur inconnue')
+            MessageSchedulerService._record_result(message, breaker, error, now, counters)
+
+    @staticmethod
+    def _record_result(message, breaker, error, now, counters):
+        """
+        Met à jour le statut du message, le disjoncteur et les compteurs après un envoi
+        """
+        counters['processed'] += 1
+
+        if error is None:
+            breaker.record_success()
+            MessageRetryService.record_success(message, now)
+            counters['success_count'] += 1
+        else:
+            breaker.record_failure()
+            counters['error_count'] += 1
+            if MessageRetryService.record_failure(message, error, now):
+                counters['retry_count'] += 1
+            else:
+                counters['dead_letter_count'] += 1
+
     @staticmethod
     def _send_sms(message):
         """
@@ -92,11 +179,10 @@ class MessageSchedulerService:
 
         if message.est_message_groupe and message.classe:
             # Envoyer à tous les parents de la classe
-            parents = message.classe.get_parents()
+            parents = Parent.objects.filter(etudiant__classe=message.classe, notifications_sms=True).distinct()
             return sms_service.send_bulk_sms(parents, message.contenu)
         elif message.est_message_groupe:
             # Envoyer à tous les parents
-            from etudiants.models import Parent
             parents = Parent.objects.filter(notifications_sms=True)
             return sms_service.send_bulk_sms(parents, message.contenu)
         else:
@@ -112,15 +198,15 @@ class MessageSchedulerService:
 
         if message.est_message_groupe and message.classe:
             # Envoyer à tous les parents de la classe
-            parents = message.classe.get_parents().filter(
+            parents = Parent.objects.filter(
+                etudiant__classe=message.classe,
                 notifications_email=True
             ).exclude(
                 Q(email='') | Q(email__isnull=True)
-            )
+            ).distinct()
             return email_service.send_bulk_email(parents, message.sujet, message.contenu)
         elif message.est_message_groupe:
             # Envoyer à tous les parents
-            from etudiants.models import Parent
             parents = Parent.objects.filter(
                 notifications_email=True
             ).exclude(
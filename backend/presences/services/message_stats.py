@@ -0,0 +1,96 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from etudiants.models import Classe
+from presences.cache import StatisticsCache
+from presences.models import Message
+
+
+class MessageStatisticsService:
+    """
+    Service de statistiques des messages
+
+    Trois requêtes agrégées quel que soit le nombre de classes ; le résultat
+    est mis en cache et invalidé à chaque écriture de message.
+    """
+
+    # Statuts détaillés dans `status_counts`
+    STATUTS = [statut for statut, _ in Message.STATUT_CHOICES]
+
+    @staticmethod
+    def get_stats(days=31):
+        """
+        Statistiques des messages (totaux, statuts, taux de lecture, classes, série quotidienne)
+
+        Args:
+            days (int): Nombre de jours de la série quotidienne, aujourd'hui compris
+        """
+        today = timezone.localdate()
+        return StatisticsCache.get_or_set_messages(
+            'message_stats',
+            {'today': today, 'days': days},
+            lambda: MessageStatisticsService.compute(today, days)
+        )
+
+    @staticmethod
+    def compute(today, days=31):
+        """Calcule les statistiques sans passer par le cache"""
+        # Totaux par type et par statut, et taux de lecture des emails : une seule requête
+        totals = Message.objects.aggregate(
+            total_messages=Count('id'),
+            total_sms=Count('id', filter=Q(type='sms')),
+            total_email=Count('id', filter=Q(type='email')),
+            total_emails_sent=Count('id', filter=Q(type='email', statut='envoye')),
+            emails_read=Count('id', filter=Q(type='email', statut='envoye', est_lu=True)),
+            **{
+                f'statut_{statut}': Count('id', filter=Q(statut=statut))
+                for statut in MessageStatisticsService.STATUTS
+            }
+        )
+        status_counts = {
+            statut: totals[f'statut_{statut}'] for statut in MessageStatisticsService.STATUTS
+        }
+        total_emails_sent = totals['total_emails_sent']
+        read_rate = (totals['emails_read'] / total_emails_sent * 100) if total_emails_sent > 0 else 0
+
+        # Messages de groupe par classe (classes sans message comprises)
+        classes = (
+            Classe.objects
+            .annotate(count=Count('messages', filter=Q(messages__est_message_groupe=True)))
+            .order_by('id')
+            .values_list('nom', 'count')
+        )
+        messages_by_class = [{'classe': nom, 'count': count} for nom, count in classes]
+
+        # Messages par jour, groupés sur la date d'envoi dans le fuseau courant
+        start_date = today - timedelta(days=days - 1)
+        # Bornes en datetime (et non date_envoi__date) pour pouvoir utiliser un index sur date_envoi
+        period_start = timezone.make_aware(datetime.combine(start_date, time.min))
+        period_end = timezone.make_aware(datetime.combine(today + timedelta(days=1), time.min))
+        counts_by_day = dict(
+            Message.objects.filter(date_envoi__gte=period_start, date_envoi__lt=period_end)
+            .annotate(jour=TruncDate('date_envoi'))
+            .values('jour')
+            .annotate(count=Count('id'))
+            .values_list('jour', 'count')
+        )
+        messages_by_day = []
+        for i in range(days):
+            day = start_date + timedelta(days=i)
+            messages_by_day.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'count': counts_by_day.get(day, 0)
+            })
+
+        return {
+            'total_messages': totals['total_messages'],
+            'total_sms': totals['total_sms'],
+            'total_email': totals['total_email'],
+            'status_counts': status_counts,
+            'read_rate': read_rate,
+            'messages_by_class': messages_by_class,
+            'messages_by_day': messages_by_day
+        }
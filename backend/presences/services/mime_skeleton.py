@@ -0,0 +1,128 @@
+import os
+import uuid
+from email.message import EmailMessage
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.text import MIMEText
+from email.policy import SMTP
+from email.utils import formatdate, make_msgid
+
+from django.conf import settings
+
+CRLF = b'\r\n'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+
+class MimeSkeleton:
+    """
+    Squelette MIME partagé par tous les destinataires d'un envoi groupé
+
+    Les parties communes (texte, HTML sans pixel de suivi, pièces jointes)
+    sont lues, encodées en base64 et sérialisées une seule fois à la
+    construction. `build` n'assemble ensuite que les en-têtes du destinataire
+    et, si un identifiant de suivi est fourni, la partie HTML avec le pixel :
+    le coût par destinataire ne dépend pas de la taille des pièces jointes.
+    """
+
+    def __init__(self, subject, message, html_message=None, attachments=None, from_email=None):
+        self.subject = subject or ''
+        self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        self.html_message = html_message
+        self.mixed_boundary = f"===============mixed{uuid.uuid4().hex}=="
+        self.alternative_boundary = f"===============alt{uuid.uuid4().hex}=="
+
+        self._text_part = MIMEText(message, 'plain', 'utf-8').as_bytes(policy=SMTP)
+        self._shared_alternative = self._build_alternative(html_message)
+        self._attachments = b''.join(
+            self._delimiter(self.mixed_boundary) + self._encode_attachment(attachment) + CRLF
+            for attachment in attachments or []
+        )
+
+    @staticmethod
+    def _delimiter(boundary):
+        return b'--' + boundary.encode('ascii') + CRLF
+
+    @staticmethod
+    def _close_delimiter(boundary):
+        return b'--' + boundary.encode('ascii') + b'--' + CRLF
+
+    @staticmethod
+    def _encode_attachment(attachment):
+        """Lit et encode une pièce jointe (chemin de fichier ou objet File)"""
+        if isinstance(attachment, str):
+            # C'est un chemin de fichier
+            filename = os.path.basename(attachment)
+            with open(attachment, 'rb') as f:
+                file_content = f.read()
+        else:
+            # C'est un objet File ou similaire
+            filename = os.path.basename(attachment.name)
+            attachment.open('rb')
+            file_content = attachment.read()
+            attachment.close()
+
+        if filename.lower().endswith(IMAGE_EXTENSIONS):
+            part = MIMEImage(file_content)
+        else:
+            part = MIMEApplication(file_content)
+        part.add_header('Content-Disposition', 'attachment', filename=filename)
+        return part.as_bytes(policy=SMTP)
+
+    def _build_alternative(self, html_message):
+        """Sérialise la partie multipart/alternative (texte + HTML optionnel)"""
+        body = self._delimiter(self.alternative_boundary) + self._text_part + CRLF
+        if html_message:
+            html_part = MIMEText(html_message, 'html', 'utf-8').as_bytes(policy=SMTP)
+            body += self._delimiter(self.alternative_boundary) + html_part + CRLF
+        body += self._close_delimiter(self.alternative_boundary)
+
+        headers = (
+            f'Content-Type: multipart/alternative; boundary="{self.alternative_boundary}"\r\n'
+            'MIME-Version: 1.0\r\n\r\n'
+        ).encode('ascii')
+        return headers + body
+
+    def _headers(self, to_email):
+        """En-têtes propres au destinataire (encodés selon la RFC 2047 si besoin)"""
+        headers = EmailMessage(policy=SMTP)
+        headers['Subject'] = self.subject
+        headers['From'] = self.from_email
+        headers['To'] = to_email
+        headers['Date'] = formatdate(localtime=True)
+        headers['Message-ID'] = make_msgid()
+        serialized = headers.as_bytes().split(CRLF + CRLF, 1)[0] + CRLF
+        return serialized + (
+            'MIME-Version: 1.0\r\n'
+            f'Content-Type: multipart/mixed; boundary="{self.mixed_boundary}"\r\n\r\n'
+        ).encode('ascii')
+
+    @staticmethod
+    def tracking_url(tracking_id):
+        return f"{settings.BASE_URL}/api/messages/track/{tracking_id}/"
+
+    def build(self, to_email, tracking_id=None):
+        """
+        Assemble le message complet (octets prêts pour SMTP) pour un destinataire
+
+        Args:
+            to_email (str): Adresse email du destinataire
+            tracking_id (str, optional): ID de suivi ajouté au HTML sous forme de pixel
+        """
+        if tracking_id and self.html_message:
+            tracking_pixel = f'<img src="{self.tracking_url(tracking_id)}" width="1" height="1" alt="" style="display:none">'
+            alternative = self._build_alternative(self.html_message + tracking_pixel)
+        else:
+            alternative = self._shared_alternative
+
+        return b''.join((
+            self._headers(to_email),
+            self._delimiter(self.mixed_boundary),
+            alternative,
+            CRLF,
+            self._attachments,
+            self._close_delimiter(self.mixed_boundary),
+        ))
+
+    def builder(self, to_email, tracking_id=None):
+        """Retourne une fonction qui assemble le message au moment de l'envoi"""
+        return lambda: self.build(to_email, tracking_id)
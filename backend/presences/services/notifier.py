@@ -0,0 +1,383 @@
+"""
+Couche de transport asynchrone pour les notifications (SMS et email)
+
+Les envois sont faits avec asyncio : un seul processus peut garder des
+milliers de livraisons en vol, la concurrence étant bornée par un sémaphore
+(SMS) ou par un pool de connexions SMTP (email). `NotificationDispatcher`
+fournit une façade synchrone pour les vues et les services existants.
+"""
+import asyncio
+import logging
+import smtplib
+import threading
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Client HTTP asynchrone (optionnel) : à défaut, les requêtes sont faites dans un thread
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Client SMTP asynchrone (optionnel) : à défaut, smtplib est utilisé dans un thread
+try:
+    import aiosmtplib
+    AIOSMTPLIB_AVAILABLE = True
+except ImportError:
+    AIOSMTPLIB_AVAILABLE = False
+
+
+class Delivery:
+    """
+    Une livraison à effectuer : destinataire, contenu et options propres au canal
+    """
+
+    __slots__ = ('recipient', 'content', 'subject', 'html', 'message', 'reference')
+
+    def __init__(self, recipient, content, subject=None, html=None, message=None, reference=None):
+        self.recipient = recipient
+        self.content = content
+        self.subject = subject
+        self.html = html
+        # Message déjà construit pour l'email (prioritaire sur content/subject/html) :
+        # objet MIME, octets prêts pour SMTP, ou fonction appelée au moment de l'envoi
+        # pour ne garder en mémoire que les messages en vol
+        self.message = message
+        # Objet appelant (parent, message...) renvoyé tel quel avec le résultat
+        self.reference = reference
+
+
+class Notifier:
+    """
+    Interface commune des transports de notification
+
+    Les sous-classes implémentent `_deliver`; `send_many` garde au plus
+    `max_concurrency` livraisons en vol et renvoie les résultats dans l'ordre
+    des livraisons.
+    """
+
+    channel = None
+
+    def __init__(self, max_concurrency=None, simulate=None):
+        self.max_concurrency = max_concurrency or settings.NOTIFICATIONS_MAX_CONCURRENCY
+        self.simulate = settings.NOTIFICATIONS_SIMULATION if simulate is None else simulate
+
+    async def open(self):
+        """Ouvre les ressources réseau partagées (client HTTP, connexions SMTP)"""
+
+    async def close(self):
+        """Libère les ressources réseau partagées"""
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def send(self, delivery):
+        """Effectue une livraison et renvoie un dictionnaire de résultat"""
+        try:
+            return await self._deliver(delivery)
+        except Exception as e:
+            logger.exception(f"Exception lors de l'envoi {self.channel} à {delivery.recipient}: {str(e)}")
+            return {
+                'success': False,
+                'message': f"Exception lors de l'envoi: {str(e)}",
+                'details': None
+            }
+
+    async def send_many(self, deliveries):
+        """Effectue plusieurs livraisons en parallèle avec une concurrence bornée"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def bounded(delivery):
+            async with semaphore:
+                return await self.send(delivery)
+
+        return await asyncio.gather(*(bounded(delivery) for delivery in deliveries))
+
+    async def _deliver(self, delivery):
+        raise NotImplementedError
+
+
+class AsyncSMSNotifier(Notifier):
+    """
+    Transport SMS asynchrone via l'API HTTP configurée (SMS_API_URL)
+    """
+
+    channel = 'sms'
+
+    def __init__(self, max_concurrency=None, simulate=None):
+        super().__init__(max_concurrency, simulate)
+        self.api_key = settings.SMS_API_KEY
+        self.api_url = settings.SMS_API_URL
+        self.sender = settings.SMS_SENDER_NAME
+        self._client = None
+
+    async def open(self):
+        if HTTPX_AVAILABLE and not self.simulate and self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=settings.NOTIFICATIONS_HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.max_concurrency)
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def clean_phone_number(phone_number):
+        """Nettoie un numéro de téléphone pour s'assurer qu'il est au format international"""
+        # Supprimer les espaces, tirets, etc.
+        cleaned = ''.join(filter(str.isdigit, phone_number))
+
+        # S'assurer que le numéro commence par le code pays
+        if cleaned.startswith('0'):
+            cleaned = '33' + cleaned[1:]
+
+        return '+' + cleaned
+
+    async def _deliver(self, delivery):
+        phone_number = self.clean_phone_number(delivery.recipient)
+
+        if self.simulate:
+            logger.info(f"Simulation d'envoi de SMS à {phone_number}: {delivery.content[:50]}...")
+            return {'success': True, 'message': 'SMS envoyé avec succès (simulation)', 'details': None}
+
+        payload = {
+            'apiKey': self.api_key,
+            'to': phone_number,
+            'from': self.sender,
+            'message': delivery.content
+        }
+
+        if self._client is not None:
+            response = await self._client.post(self.api_url, json=payload)
+        else:
+            response = await asyncio.to_thread(
+                requests.post, self.api_url, json=payload, timeout=settings.NOTIFICATIONS_HTTP_TIMEOUT
+            )
+
+        if response.status_code == 200:
+            return {'success': True, 'message': 'SMS envoyé avec succès', 'details': response.json()}
+
+        logger.error(f"Erreur lors de l'envoi du SMS: {response.text}")
+        return {
+            'success': False,
+            'message': f"Erreur lors de l'envoi du SMS: {response.status_code}",
+            'details': response.text
+        }
+
+
+class AsyncEmailNotifier(Notifier):
+    """
+    Transport email asynchrone via SMTP
+
+    `send_many` répartit les livraisons sur un pool de connexions SMTP
+    persistantes (EMAIL_MAX_CONNECTIONS) au lieu d'ouvrir une connexion par email.
+    """
+
+    channel = 'email'
+
+    def __init__(self, max_concurrency=None, simulate=None):
+        super().__init__(max_concurrency, simulate)
+        self.smtp_server = settings.EMAIL_HOST
+        self.smtp_port = settings.EMAIL_PORT
+        self.smtp_username = settings.EMAIL_HOST_USER
+        self.smtp_password = settings.EMAIL_HOST_PASSWORD
+        self.use_tls = settings.EMAIL_USE_TLS
+        self.use_ssl = settings.EMAIL_USE_SSL
+        self.default_from_email = settings.DEFAULT_FROM_EMAIL
+        self.pool_size = min(settings.EMAIL_MAX_CONNECTIONS, self.max_concurrency)
+
+    def build_message(self, delivery):
+        """Construit le message d'une livraison (objet MIME ou octets prêts pour SMTP)"""
+        if delivery.message is not None:
+            return delivery.message() if callable(delivery.message) else delivery.message
+
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = delivery.subject or ''
+        msg['From'] = self.default_from_email
+        msg['To'] = delivery.recipient
+        msg['Date'] = formatdate(localtime=True)
+        msg.attach(MIMEText(delivery.content, 'plain'))
+        if delivery.html:
+            msg.attach(MIMEText(delivery.html, 'html'))
+        return msg
+
+    async def _connect(self):
+        if AIOSMTPLIB_AVAILABLE:
+            connection = aiosmtplib.SMTP(
+                hostname=self.smtp_server,
+                port=self.smtp_port,
+                use_tls=self.use_ssl,
+                start_tls=self.use_tls and not self.use_ssl,
+                timeout=settings.NOTIFICATIONS_HTTP_TIMEOUT
+            )
+            await connection.connect()
+            if self.smtp_username and self.smtp_password:
+                await connection.login(self.smtp_username, self.smtp_password)
+            return connection
+
+        def connect():
+            if self.use_ssl:
+                connection = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
+            else:
+                connection = smtplib.SMTP(self.smtp_server, self.smtp_port)
+                if self.use_tls:
+                    connection.starttls()
+            if self.smtp_username and self.smtp_password:
+                connection.login(self.smtp_username, self.smtp_password)
+            return connection
+
+        return await asyncio.to_thread(connect)
+
+    async def _disconnect(self, connection):
+        try:
+            if AIOSMTPLIB_AVAILABLE:
+                await connection.quit()
+            else:
+                await asyncio.to_thread(connection.quit)
+        except Exception as e:
+            logger.warning(f"Erreur lors de la fermeture de la connexion SMTP: {str(e)}")
+
+    async def _send_on(self, connection, delivery):
+        msg = self.build_message(delivery)
+        if isinstance(msg, bytes):
+            from_email = self.default_from_email
+            raw = msg
+        else:
+            from_email = msg.get('From') or self.default_from_email
+            raw = msg.as_bytes()
+
+        if AIOSMTPLIB_AVAILABLE:
+            await connection.sendmail(from_email, [delivery.recipient], raw)
+        else:
+            await asyncio.to_thread(connection.sendmail, from_email, delivery.recipient, raw)
+        return {
+            'success': True,
+            'message': 'Email envoyé avec succès',
+            'details': {'to': delivery.recipient, 'subject': delivery.subject}
+        }
+
+    async def _deliver(self, delivery):
+        if self.simulate:
+            logger.info(f"Simulation d'envoi d'email à {delivery.recipient}: {delivery.subject}")
+            return {'success': True, 'message': 'Email envoyé avec succès (simulation)', 'details': None}
+
+        connection = await self._connect()
+        try:
+            return await self._send_on(connection, delivery)
+        finally:
+            await self._disconnect(connection)
+
+    async def send_many(self, deliveries):
+        if self.simulate:
+            return await super().send_many(deliveries)
+
+        deliveries = list(deliveries)
+        results = [None] * len(deliveries)
+        queue = asyncio.Queue()
+        for index, delivery in enumerate(deliveries):
+            queue.put_nowait((index, delivery))
+
+        async def worker():
+            connection = None
+            try:
+                while True:
+                    try:
+                        index, delivery = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        if connection is None:
+                            connection = await self._connect()
+                        results[index] = await self._send_on(connection, delivery)
+                    except Exception as e:
+                        logger.exception(f"Exception lors de l'envoi de l'email à {delivery.recipient}: {str(e)}")
+                        results[index] = {
+                            'success': False,
+                            'message': f"Exception lors de l'envoi de l'email: {str(e)}",
+                            'details': None
+                        }
+                        # Repartir sur une connexion neuve après une erreur
+                        if connection is not None:
+                            await self._disconnect(connection)
+                            connection = None
+            finally:
+                if connection is not None:
+                    await self._disconnect(connection)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(self.pool_size, len(deliveries))))))
+        return results
+
+
+def run_sync(coroutine):
+    """
+    Exécute une coroutine depuis du code synchrone
+
+    Si une boucle asyncio tourne déjà dans ce thread (vue asynchrone), la
+    coroutine est exécutée dans un thread dédié.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    outcome = {}
+
+    def runner():
+        try:
+            outcome['result'] = asyncio.run(coroutine)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+class NotificationDispatcher:
+    """
+    Façade synchrone sur les transports asynchrones
+    """
+
+    notifier_classes = {
+        'sms': AsyncSMSNotifier,
+        'email': AsyncEmailNotifier,
+    }
+
+    @classmethod
+    def get_notifier(cls, channel, **kwargs):
+        return cls.notifier_classes[channel](**kwargs)
+
+    @classmethod
+    async def deliver_many(cls, channel, deliveries):
+        """Version asynchrone de `send_many` (pour le code déjà dans une boucle asyncio)"""
+        async with cls.get_notifier(channel) as notifier:
+            return await notifier.send_many(deliveries)
+
+    @classmethod
+    def send(cls, channel, delivery):
+        """Effectue une livraison de manière synchrone"""
+        return cls.send_many(channel, [delivery])[0]
+
+    @classmethod
+    def send_many(cls, channel, deliveries):
+        """Effectue plusieurs livraisons en parallèle et attend tous les résultats"""
+        deliveries = list(deliveries)
+        if not deliveries:
+            return []
+        return run_sync(cls.deliver_many(channel, deliveries))
@@ -0,0 +1,202 @@
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from presences.models import CircuitBreakerState, Message
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    Politique de nouvelle tentative avec backoff exponentiel et jitter
+    """
+
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None):
+        self.max_attempts = max_attempts or settings.MESSAGE_RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay or settings.MESSAGE_RETRY_BASE_DELAY
+        self.max_delay = max_delay or settings.MESSAGE_RETRY_MAX_DELAY
+
+    def should_retry(self, attempts):
+        """Indique si un message ayant échoué `attempts` fois peut être renvoyé"""
+        return attempts < self.max_attempts
+
+    def compute_delay(self, attempts):
+        """
+        Calcule le délai (en secondes) avant la prochaine tentative
+
+        Le délai double à chaque échec jusqu'à `max_delay`, puis un jitter
+        tire la valeur entre la moitié et la totalité de ce plafond pour
+        éviter que tous les messages en échec repartent au même instant.
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return random.uniform(ceiling / 2, ceiling)
+
+    def next_attempt_at(self, attempts, now=None):
+        """Date de la prochaine tentative après `attempts` échecs"""
+        now = now or timezone.now()
+        return now + timedelta(seconds=self.compute_delay(attempts))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur pour un fournisseur d'envoi (SMS ou email)
+
+    Après `failure_threshold` échecs consécutifs, le disjoncteur s'ouvre et
+    les envois vers ce fournisseur sont suspendus pendant `recovery_timeout`
+    secondes. Un seul envoi d'essai est ensuite autorisé (état semi-ouvert) :
+    un succès referme le disjoncteur, un échec le rouvre.
+
+    L'état est conservé en base (CircuitBreakerState) : il est partagé par les
+    processus du serveur et les passages successifs de la tâche cron.
+    """
+
+    CLOSED = 'ferme'
+    OPEN = 'ouvert'
+    HALF_OPEN = 'semi_ouvert'
+
+    def __init__(self, provider, failure_threshold=None, recovery_timeout=None):
+        self.provider = provider
+        self.failure_threshold = failure_threshold or settings.MESSAGE_CIRCUIT_BREAKER_THRESHOLD
+        self.recovery_timeout = recovery_timeout or settings.MESSAGE_CIRCUIT_BREAKER_TIMEOUT
+        self._created = False
+
+    def _rows(self):
+        if not self._created:
+            CircuitBreakerState.objects.get_or_create(fournisseur=self.provider)
+            self._created = True
+        return CircuitBreakerState.objects.filter(fournisseur=self.provider)
+
+    def _read(self):
+        """(échecs consécutifs, date de fin d'ouverture ou None)"""
+        return self._rows().values_list('echecs', 'ouvert_jusqua').first() or (0, None)
+
+    def allow_request(self):
+        """Indique si un envoi peut être tenté vers ce fournisseur"""
+        return self.request_state() is not None
+
+    def request_state(self):
+        """
+        État dans lequel un envoi est autorisé
+
+        Returns:
+            str: CLOSED (envois normaux), HALF_OPEN (un seul envoi d'essai, obtenu par
+            cet appel) ou None (envois suspendus)
+        """
+        _, open_until = self._read()
+        if open_until is None:
+            return self.CLOSED
+        now = timezone.now()
+        if now < open_until:
+            # Ouvert, ou envoi d'essai déjà en cours
+            return None
+        # Semi-ouvert : un seul processus obtient l'envoi d'essai, les autres attendent son résultat
+        claimed = self._rows().filter(ouvert_jusqua=open_until).update(
+            ouvert_jusqua=now + timedelta(seconds=self.recovery_timeout)
+        )
+        return self.HALF_OPEN if claimed else None
+
+    def record_success(self):
+        # Aucune écriture tant que le disjoncteur est fermé sans échec
+        self._rows().filter(Q(echecs__gt=0) | Q(ouvert_jusqua__isnull=False)).update(echecs=0, ouvert_jusqua=None)
+
+    def record_failure(self):
+        rows = self._rows()
+        rows.update(echecs=F('echecs') + 1)
+        failures, open_until = self._read()
+        if failures >= self.failure_threshold:
+            if open_until is None:
+                logger.warning(f"Disjoncteur {self.provider} ouvert après {failures} échecs consécutifs")
+            # Ouverture, ou réouverture après l'échec de l'envoi d'essai
+            rows.update(ouvert_jusqua=timezone.now() + timedelta(seconds=self.recovery_timeout))
+
+    def to_dict(self):
+        failures, open_until = self._read()
+        if open_until is None:
+            state = self.CLOSED
+        else:
+            state = self.OPEN if timezone.now() < open_until else self.HALF_OPEN
+        return {
+            'provider': self.provider,
+            'state': state,
+            'failures': failures,
+        }
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider):
+    """Retourne le disjoncteur du fournisseur donné (état partagé en base)"""
+    with _circuit_breakers_lock:
+        if provider not in _circuit_breakers:
+            _circuit_breakers[provider] = CircuitBreaker(provider)
+        return _circuit_breakers[provider]
+
+
+class MessageRetryService:
+    """
+    Service pour gérer la file des nouvelles tentatives d'envoi
+
+    Un message en échec garde le statut 'echec' avec une date de prochaine
+    tentative tant que le nombre maximal de tentatives n'est pas atteint ;
+    il passe ensuite au statut 'abandonne' (file des messages morts).
+    """
+
+    @staticmethod
+    def record_success(message, now=None):
+        """Marque un message comme envoyé"""
+        message.tentatives += 1
+        message.statut = 'envoye'
+        message.date_envoi = now or timezone.now()
+        message.prochaine_tentative = None
+        message.details_erreur = None
+        message.save()
+
+    @staticmethod
+    def record_failure(message, error, now=None, policy=None):
+        """
+        Enregistre un échec d'envoi et programme la prochaine tentative
+
+        Returns:
+            bool: True si une nouvelle tentative est programmée, False si le message est abandonné
+        """
+        policy = policy or RetryPolicy()
+        message.tentatives += 1
+        message.details_erreur = error
+
+        if policy.should_retry(message.tentatives):
+            message.statut = 'echec'
+            message.prochaine_tentative = policy.next_attempt_at(message.tentatives, now)
+            retry = True
+        else:
+            message.statut = 'abandonne'
+            message.prochaine_tentative = None
+            logger.warning(f"Message {message.id} abandonné après {message.tentatives} tentatives: {error}")
+            retry = False
+
+        message.save()
+        return retry
+
+    @staticmethod
+    def due_retries(now=None):
+        """Messages en échec dont la prochaine tentative est échue (parcours de l'index statut/prochaine_tentative)"""
+        now = now or timezone.now()
+        return Message.objects.filter(
+            statut='echec',
+            prochaine_tentative__lte=now
+        ).order_by('prochaine_tentative')
+
+    @staticmethod
+    def requeue(message, now=None):
+        """Remet un message abandonné ou en échec dans la file des nouvelles tentatives"""
+        message.tentatives = 0
+        message.statut = 'echec'
+        message.prochaine_tentative = now or timezone.now()
+        message.save()
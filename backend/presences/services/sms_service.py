@@ -1,12 +1,15 @@
+from .notifier import Delivery, NotificationDispatcher
+from .template_engine import TemplateEngine
+
+
 class SMSService:
     """
     Service pour l'envoi de SMS
     """
     
     def __init__(self):
-        # Initialisation du service SMS (à remplacer par une vraie implémentation)
         self.initialized = True
-    
+
     def send_sms(self, phone_number, message):
         """
         Envoie un SMS à un numéro de téléphone
@@ -18,19 +21,16 @@ class SMSService:
         Returns:
             dict: Résultat de l'envoi
         """
-        # Simulation d'envoi de SMS (à remplacer par une vraie implémentation)
-        print(f"SMS envoyé à {phone_number}: {message}")
-        
-        return {
-            'success': True,
-            'message': 'SMS envoyé avec succès',
-            'phone': phone_number
-        }
+        result = NotificationDispatcher.send('sms', Delivery(phone_number, message))
+        result['phone'] = phone_number
+        return result
     
     def send_bulk_sms(self, parents, message):
         """
         Envoie un SMS à plusieurs parents
         
+        Les SMS sont envoyés en parallèle par le transport asynchrone.
+        
         Args:
             parents (QuerySet): Liste des parents
             message (str): Contenu du message
@@ -38,27 +38,27 @@ class SMSService:
         Returns:
             dict: Résultat de l'envoi
         """
-        total = parents.count()
+        recipients = [parent for parent in parents if parent.telephone]
+        results = NotificationDispatcher.send_many(
+            'sms', [Delivery(parent.telephone, message) for parent in recipients]
+        )
+        
         success_count = 0
         details = []
-        
-        for parent in parents:
-            if parent.telephone:
-                result = self.send_sms(parent.telephone, message)
-                if result['success']:
-                    success_count += 1
-                
-                details.append({
-                    'parent': f"{parent.prenom} {parent.nom}",
-                    'success': result['success'],
-                    'message': result.get('message', '')
-                })
+        for parent, result in zip(recipients, results):
+            if result['success']:
+                success_count += 1
+            
+            details.append({
+                'parent': f"{parent.prenom} {parent.nom}",
+                'success': result['success'],
+                'message': result.get('message', '')
+            })
         
         return {
-            'success': success_count > 0,
-            'message': f"{success_count} SMS envoyés sur {total}",
-            'total': total,
             'success': success_count,
+            'message': f"{success_count} SMS envoyés sur {len(parents)}",
+            'total': len(parents),
             'details': details
         }
     
@@ -74,8 +74,10 @@ class SMSService:
         Returns:
             dict: Résultat de l'envoi
         """
-        message = f"Bonjour {parent.prenom}, votre enfant {etudiant.prenom} {etudiant.nom} est absent aujourd'hui ({date})."
-        return self.send_sms(parent.telephone, message)
+        rendered = TemplateEngine.get('absence', 'sms').render(
+            {'parent': parent, 'etudiant': etudiant, 'date': date}
+        )
+        return self.send_sms(parent.telephone, rendered.text)
     
     def send_late_notification(self, parent, etudiant, date, heure):
         """
@@ -90,5 +92,42 @@ class SMSService:
         Returns:
             dict: Résultat de l'envoi
         """
-        message = f"Bonjour {parent.prenom}, votre enfant {etudiant.prenom} {etudiant.nom} est arrivé en retard aujourd'hui ({date}) à {heure}."
-        return self.send_sms(parent.telephone, message)
+        rendered = TemplateEngine.get('retard', 'sms').render(
+            {'parent': parent, 'etudiant': etudiant, 'date': date, 'heure': heure}
+        )
+        return self.send_sms(parent.telephone, rendered.text)
+    
+    def send_template_bulk_sms(self, parents, template, **extra_context):
+        """
+        Envoie un modèle de message à plusieurs parents, rendu pour chacun
+        
+        Args:
+            parents (QuerySet): Liste des parents
+            template (CompiledMessageTemplate): Modèle compilé
+            extra_context: Variables communes à tous les destinataires
+            
+        Returns:
+            dict: Résultat de l'envoi
+        """
+        recipients = [parent for parent in parents if parent.telephone]
+        broadcast = template.render_broadcast(
+            (parent.telephone, TemplateEngine.parent_context(parent, **extra_context)) for parent in recipients
+        )
+        results = NotificationDispatcher.send_many(
+            'sms', [Delivery(address, rendered.text) for address, rendered, _ in broadcast]
+        )
+        
+        success_count = sum(1 for result in results if result['success'])
+        return {
+            'success': success_count,
+            'message': f"{success_count} SMS envoyés sur {len(parents)}",
+            'total': len(parents),
+            'details': [
+                {
+                    'parent': f"{parent.prenom} {parent.nom}",
+                    'success': result['success'],
+                    'message': result.get('message', '')
+                }
+                for parent, result in zip(recipients, results)
+            ]
+        }
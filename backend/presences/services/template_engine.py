@@ -0,0 +1,211 @@
+import re
+import threading
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate
+
+from django.conf import settings
+from django.template import Context, Engine
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import normalize_newlines
+
+from presences.models import MessageTemplate
+
+# Modèles par défaut des notifications automatiques, utilisés tant qu'aucun
+# MessageTemplate avec le même code et le même type n'existe en base
+DEFAULT_TEMPLATES = {
+    ('absence', 'sms'): {
+        'sujet': None,
+        'contenu': "Bonjour {{ parent.prenom }}, votre enfant {{ etudiant.prenom }} {{ etudiant.nom }} est absent aujourd'hui ({{ date }}).",
+        'est_html': False,
+    },
+    ('retard', 'sms'): {
+        'sujet': None,
+        'contenu': "Bonjour {{ parent.prenom }}, votre enfant {{ etudiant.prenom }} {{ etudiant.nom }} est arrivé en retard aujourd'hui ({{ date }}) à {{ heure }}.",
+        'est_html': False,
+    },
+    ('absence', 'email'): {
+        'sujet': "Absence de {{ etudiant.prenom }} {{ etudiant.nom }}",
+        'contenu': """<p>Bonjour {{ parent.prenom }} {{ parent.nom }},</p>
+<p>Nous vous informons que votre enfant <strong>{{ etudiant.prenom }} {{ etudiant.nom }}</strong> est absent aujourd'hui ({{ date }}).</p>
+<p>Merci de contacter l'école pour plus d'informations.</p>
+<p>Cordialement,<br>L'équipe de l'école</p>""",
+        'est_html': True,
+    },
+    ('retard', 'email'): {
+        'sujet': "Retard de {{ etudiant.prenom }} {{ etudiant.nom }}",
+        'contenu': """<p>Bonjour {{ parent.prenom }} {{ parent.nom }},</p>
+<p>Nous vous informons que votre enfant <strong>{{ etudiant.prenom }} {{ etudiant.nom }}</strong> est arrivé en retard aujourd'hui ({{ date }}) à {{ heure }}.</p>
+<p>Cordialement,<br>L'équipe de l'école</p>""",
+        'est_html': True,
+    },
+    # Récapitulatif quotidien : `enfants` contient les enfants absents ou en retard du même parent
+    ('digest', 'sms'): {
+        'sujet': None,
+        'contenu': "Bonjour {{ parent.prenom }}, {% for enfant in enfants %}{{ enfant.etudiant.prenom }} {{ enfant.etudiant.nom }} {% if enfant.statut == 'retard' %}est arrivé en retard à {{ enfant.heure }}{% else %}est absent{% endif %}{% if not forloop.last %}, {% endif %}{% endfor %} aujourd'hui ({{ date }}).",
+        'est_html': False,
+    },
+    ('digest', 'email'): {
+        'sujet': "Absences et retards du {{ date }}",
+        'contenu': """<p>Bonjour {{ parent.prenom }} {{ parent.nom }},</p>
+<p>Nous vous informons que pour la journée du {{ date }} :</p>
+<ul>{% for enfant in enfants %}
+<li><strong>{{ enfant.etudiant.prenom }} {{ enfant.etudiant.nom }}</strong> {% if enfant.statut == 'retard' %}est arrivé en retard à {{ enfant.heure }}{% else %}est absent{% endif %}</li>{% endfor %}
+</ul>
+<p>Merci de contacter l'école pour plus d'informations.</p>
+<p>Cordialement,<br>L'équipe de l'école</p>""",
+        'est_html': True,
+    },
+}
+
+# Moteurs autonomes (indépendants de settings.TEMPLATES) : pas d'échappement pour
+# le texte brut et les sujets, échappement HTML pour le corps HTML
+_text_engine = Engine(autoescape=False)
+_html_engine = Engine(autoescape=True)
+
+_LINE_BREAK_TAG = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+
+class RenderedMessage:
+    """
+    Résultat du rendu d'un modèle pour un destinataire
+    """
+
+    __slots__ = ('subject', 'text', 'html')
+
+    def __init__(self, subject, text, html):
+        self.subject = subject
+        self.text = text
+        self.html = html
+
+
+class CompiledMessageTemplate:
+    """
+    Modèle de message compilé une seule fois, rendu ensuite pour chaque destinataire
+    """
+
+    def __init__(self, type, contenu, sujet=None, est_html=False, template_id=None):
+        self.type = type
+        self.est_html = est_html
+        self.template_id = template_id
+        self.subject_template = _text_engine.from_string(sujet) if sujet else None
+        if est_html:
+            self.html_template = _html_engine.from_string(contenu)
+            self.text_template = None
+        else:
+            self.html_template = None
+            self.text_template = _text_engine.from_string(contenu)
+
+    def render(self, context):
+        """
+        Rend le sujet, le texte et (pour l'email) le HTML pour un destinataire
+
+        Un modèle HTML fournit la version texte en retirant les balises ; un
+        modèle texte fournit la version HTML en convertissant les sauts de ligne.
+        """
+        context = Context(context)
+        subject = self.subject_template.render(context).strip() if self.subject_template else None
+
+        if self.est_html:
+            html = self.html_template.render(context)
+            text = strip_tags(_LINE_BREAK_TAG.sub('\n', html)).strip()
+        else:
+            text = self.text_template.render(context)
+            html = None
+            if self.type == 'email':
+                html = linebreaks(normalize_newlines(text), autoescape=True)
+
+        return RenderedMessage(subject, text, html)
+
+    def render_batch(self, contexts):
+        """Rend le modèle pour une suite de contextes (un par destinataire)"""
+        return [self.render(context) for context in contexts]
+
+    def build_mime(self, rendered, to_email, from_email=None):
+        """Construit le message MIME (texte + HTML) d'un rendu"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = rendered.subject or ''
+        msg['From'] = from_email or settings.DEFAULT_FROM_EMAIL
+        msg['To'] = to_email
+        msg['Date'] = formatdate(localtime=True)
+        msg.attach(MIMEText(rendered.text, 'plain', 'utf-8'))
+        if rendered.html:
+            msg.attach(MIMEText(rendered.html, 'html', 'utf-8'))
+        return msg
+
+    def render_broadcast(self, recipients, from_email=None):
+        """
+        Rend le modèle pour toute une diffusion en une seule passe
+
+        Args:
+            recipients (iterable): Couples (adresse, contexte) des destinataires
+
+        Returns:
+            list: Triplets (adresse, rendu, message MIME ou None pour les SMS)
+        """
+        broadcast = []
+        for address, context in recipients:
+            rendered = self.render(context)
+            mime = self.build_mime(rendered, address, from_email) if self.type == 'email' else None
+            broadcast.append((address, rendered, mime))
+        return broadcast
+
+
+class TemplateEngine:
+    """
+    Moteur de rendu des modèles de messages
+
+    Les modèles compilés sont mis en cache dans le processus, indexés par leur
+    identifiant et leur date de modification : une modification du modèle en
+    base entraîne une recompilation, sans invalidation explicite.
+    """
+
+    _cache = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def compile(cls, template):
+        """Retourne la version compilée d'un MessageTemplate"""
+        key = ('db', template.pk, template.date_modification)
+        compiled = cls._cache.get(key)
+        if compiled is None:
+            compiled = CompiledMessageTemplate(
+                template.type, template.contenu, template.sujet, template.est_html, template.pk
+            )
+            with cls._lock:
+                # Retirer les versions précédentes du même modèle
+                for stale_key in [k for k in cls._cache if k[:2] == ('db', template.pk)]:
+                    del cls._cache[stale_key]
+                cls._cache[key] = compiled
+        return compiled
+
+    @classmethod
+    def get(cls, code, type):
+        """
+        Retourne le modèle compilé d'une notification automatique
+
+        Le modèle en base (même code et même type) est prioritaire sur le modèle par défaut.
+        """
+        template = MessageTemplate.objects.filter(code=code, type=type).first()
+        if template is not None:
+            return cls.compile(template)
+
+        key = ('default', code, type)
+        compiled = cls._cache.get(key)
+        if compiled is None:
+            default = DEFAULT_TEMPLATES[(code, type)]
+            compiled = CompiledMessageTemplate(type, default['contenu'], default['sujet'], default['est_html'])
+            with cls._lock:
+                cls._cache[key] = compiled
+        return compiled
+
+    @staticmethod
+    def parent_context(parent, **extra):
+        """Contexte de rendu standard pour un parent (et son enfant)"""
+        etudiant = parent.etudiant
+        return {
+            'parent': parent,
+            'etudiant': etudiant,
+            'classe': etudiant.classe,
+            **extra
+        }
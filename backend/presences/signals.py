@@ -0,0 +1,125 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from .alerts import AbsenceAlertService
+from .cache import StatisticsCache
+from .live import LiveFeed
+from .models import ATTENDED_STATUTS, Presence, Message
+from .rollup import AttendanceRollupService
+from ecole.models import Ecole
+from etudiants.models import Classe, Etudiant
+
+# Les écritures en masse (QuerySet.update, bulk_create) ne déclenchent pas ces
+# signaux : l'appelant doit alors ajuster les résumés lui-même.
+
+
+# État d'une présence suivi pour les résumés : la classe est celle enregistrée sur la
+# présence, comme pour `AttendanceRollupService.rebuild`
+STATE_FIELDS = ('date', 'etudiant_id', 'statut', 'classe_id')
+
+
+def _rollup_state(presence):
+    """(date, étudiant, statut, classe) tels qu'ils sont en base, ou None si inconnus"""
+    values = presence.__dict__
+    if presence.pk is None or not all(name in values for name in STATE_FIELDS):
+        # Présence non enregistrée, ou champs différés (lus en base au besoin)
+        return None
+    return tuple(values[name] for name in STATE_FIELDS)
+
+
+def _current_state(presence):
+    return tuple(getattr(presence, name) for name in STATE_FIELDS)
+
+
+def _etudiant_classe_id(presence):
+    """Classe actuelle de l'étudiant de la présence"""
+    if Presence.etudiant.is_cached(presence) and presence.etudiant.pk == presence.etudiant_id:
+        return presence.etudiant.classe_id
+    return Etudiant.objects.filter(pk=presence.etudiant_id).values_list('classe_id', flat=True).first()
+
+
+def _apply(state, delta):
+    date, _, statut, classe_id = state
+    # Sans classe (classe supprimée), la présence ne compte dans aucun résumé
+    if classe_id is not None:
+        AttendanceRollupService.apply(date, classe_id, statut, delta)
+        StatisticsCache.bump(date, classe_id)
+
+
+def _record_alert_window(previous, current):
+    """Reporte un changement de présence dans les fenêtres d'alerte, en une fois par étudiant et par journée"""
+    deltas = {}
+    for state, sign in ((previous, -1), (current, 1)):
+        if state is not None:
+            date, etudiant_id, statut, _ = state
+            recorded, attended = deltas.get((etudiant_id, date), (0, 0))
+            deltas[(etudiant_id, date)] = (recorded + sign, attended + (sign if statut in ATTENDED_STATUTS else 0))
+    for (etudiant_id, date), (recorded, attended) in deltas.items():
+        if recorded or attended:
+            AbsenceAlertService.record(etudiant_id, date, recorded, attended)
+
+
+@receiver(post_init, sender=Presence)
+def remember_presence_state(sender, instance, **kwargs):
+    instance._rollup_state = _rollup_state(instance)
+
+
+@receiver(pre_save, sender=Presence)
+def load_presence_state(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance._rollup_state is not None:
+        return
+    instance._rollup_state = (
+        Presence.objects.filter(pk=instance.pk).values_list(*STATE_FIELDS).first()
+    )
+
+
+@receiver(pre_save, sender=Presence)
+def fill_presence_classe(sender, instance, raw=False, **kwargs):
+    """Fige la classe de l'étudiant à l'enregistrement de la présence (ou au changement d'étudiant)"""
+    if raw:
+        return
+    previous = instance._rollup_state
+    if previous is not None and previous[1] != instance.etudiant_id:
+        instance.classe_id = None
+    if instance.classe_id is None:
+        instance.classe_id = _etudiant_classe_id(instance)
+
+
+@receiver(post_save, sender=Presence)
+def update_attendance_summary(sender, instance, created, raw=False, **kwargs):
+    """Reporte la création ou le changement de statut d'une présence dans les résumés"""
+    if raw:
+        return
+    previous = None if created else instance._rollup_state
+    current = _current_state(instance)
+    if previous != current:
+        if previous is not None:
+            _apply(previous, -1)
+        _apply(current, 1)
+        _record_alert_window(previous, current)
+    # Listes de présences : toute écriture compte (heures, commentaire, notification...)
+    for date in {instance.date, previous[0] if previous else instance.date}:
+        StatisticsCache.bump_presences(date)
+    LiveFeed.publish_presence(instance, 'created' if created else 'updated', previous[2] if previous else None)
+    instance._rollup_state = current
+
+
+@receiver(post_delete, sender=Presence)
+def remove_from_attendance_summary(sender, instance, **kwargs):
+    state = instance._rollup_state or _current_state(instance)
+    _apply(state, -1)
+    _record_alert_window(state, None)
+    StatisticsCache.bump_presences(state[0])
+    LiveFeed.publish_presence(instance, 'deleted', state[2])
+
+
+@receiver([post_save, post_delete], sender=Etudiant)
+@receiver([post_save, post_delete], sender=Classe)
+@receiver([post_save, post_delete], sender=Ecole)
+def invalidate_statistics(sender, **kwargs):
+    """Effectifs, classes ou calendrier scolaire modifiés : toutes les statistiques sont à recalculer"""
+    StatisticsCache.bump_global()
+
+
+@receiver([post_save, post_delete], sender=Message)
+def invalidate_message_statistics(sender, **kwargs):
+    StatisticsCache.bump_messages()
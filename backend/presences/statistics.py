@@ -1,10 +1,18 @@
-from django.db.models import Count, F, Q, Sum, Case, When, IntegerField, Value
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum, Case, When, IntegerField, Value
 from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
 from django.utils import timezone
 from datetime import timedelta, datetime
-from .models import Presence
+from django.conf import settings
+from .alerts import AbsenceAlertService
+from .models import ATTENDED_STATUTS, Presence, DailyAttendanceSummary, AttendanceWindow
+from .school_calendar import SchoolCalendar
 from etudiants.models import Etudiant, Classe
 
+# Étudiants venus en classe selon un résumé quotidien
+VENUS = F('presents') + F('retards') + F('departs_anticipes')
+# Toutes les présences enregistrées selon un résumé quotidien (absences comprises)
+ENREGISTREES = VENUS + F('absents')
+
 class PresenceStatisticsService:
     """Service pour générer des statistiques de présence"""
 
@@ -12,6 +20,9 @@ class PresenceStatisticsService:
     def get_presence_count_by_date(start_date=None, end_date=None, classe_id=None):
         """
         Récupère le nombre de présences et d'absences par jour dans une période donnée
+
+        Une seule requête groupée par date ; les jours sans aucune présence
+        enregistrée sont ajoutés avec des compteurs à zéro.
         """
         if not start_date:
             start_date = timezone.now().date() - timedelta(days=30)
@@ -27,21 +38,32 @@ class PresenceStatisticsService:
         # Base de la requête pour les présences
         queryset = Presence.objects.filter(date__gte=start_date, date__lte=end_date)
         if classe_id:
-            queryset = queryset.filter(etudiant__classe_id=classe_id)
-
-        # Obtenir les présences par jour
+            queryset = queryset.filter(classe_id=classe_id)
+
+        # Nombre de présences par jour et par statut
+        statuts = [statut for statut, _ in Presence.STATUT_CHOICES]
+        rows = (
+            queryset.values('date')
+            .annotate(**{statut: Count('id', filter=Q(statut=statut)) for statut in statuts})
+            .order_by()
+        )
+        counts_by_day = {row['date']: row for row in rows}
 
         result = []
-        for presence in queryset:
-            print(presence)
-            # absent_count = total_students - presence['count']
-
-            # result.append({
-            #     'day': presence['day'],
-            #     'count': presence['count'],
-            #     'total_students': total_students,
-            #     'absent_count': absent_count
-            # })
+        day = start_date
+        while day <= end_date:
+            row = counts_by_day.get(day, {})
+            by_status = {statut: row.get(statut, 0) for statut in statuts}
+            # Étudiants venus en classe, même en retard ou partis plus tôt
+            count = by_status['present'] + by_status['retard'] + by_status['depart_anticipe']
+            result.append({
+                'day': day,
+                'count': count,
+                'total_students': total_students,
+                'absent_count': max(total_students - count, 0),
+                'by_status': by_status
+            })
+            day += timedelta(days=1)
 
         return result
 
@@ -55,11 +77,13 @@ class PresenceStatisticsService:
         if not end_date:
             end_date = timezone.now().date()
 
+        # Lecture des résumés quotidiens (une ligne par classe et par jour) ; le total
+        # compte toutes les présences enregistrées, absences comprises, comme Count('id')
         return (
-            Presence.objects.filter(date__gte=start_date, date__lte=end_date)
-            .values('etudiant__classe__nom')
-            .annotate(classe_nom=F('etudiant__classe__nom'))
-            .annotate(count=Count('id'))
+            DailyAttendanceSummary.objects.filter(date__gte=start_date, date__lte=end_date)
+            .values(etudiant__classe__nom=F('classe__nom'))
+            .annotate(classe_nom=F('classe__nom'))
+            .annotate(count=Sum(ENREGISTREES))
             .order_by('-count')
         )
 
@@ -73,48 +97,45 @@ class PresenceStatisticsService:
         if not end_date:
             end_date = timezone.now().date()
 
-        # Nombre de jours ouvrables dans la période
-        working_days = 0
-        current_date = start_date
-        while current_date <= end_date:
-            # Exclure les weekends (samedi et dimanche)
-            if current_date.weekday() < 5:
-                working_days += 1
-            current_date += timedelta(days=1)
+        # Nombre de jours de classe dans la période (hors week-ends, jours fériés et vacances)
+        working_days = SchoolCalendar.from_ecole().working_days(start_date, end_date)
 
         # Si pas de jours ouvrables, retourner une liste vide
         if working_days == 0:
             return []
 
-        # Filtrer les étudiants par classe si nécessaire
-        students = Etudiant.objects.all()
-        if classe_id:
-            students = students.filter(classe_id=classe_id)
-
-        # Récupérer le nombre de présences par étudiant
-        presence_counts = (
-            Presence.objects.filter(date__gte=start_date, date__lte=end_date)
-            .values('etudiant')
-            .annotate(count=Count('id'))
+        # Nombre de présences par étudiant, calculé en une seule requête avec la classe
+        attended = Q(
+            presences__date__gte=start_date,
+            presences__date__lte=end_date,
+            presences__statut__in=ATTENDED_STATUTS
         )
-
-        # Convertir en dictionnaire pour un accès facile
-        presence_dict = {p['etudiant']: p['count'] for p in presence_counts}
+        students = Etudiant.objects.select_related('classe')
+        classe_nom = None
+        if classe_id:
+            # Seules les présences enregistrées dans la classe comptent (classe au moment de la
+            # présence) ; les étudiants passés par la classe pendant la période sont listés
+            attended &= Q(presences__classe_id=classe_id)
+            in_classe = Presence.objects.filter(
+                etudiant=OuterRef('pk'), classe_id=classe_id, date__gte=start_date, date__lte=end_date
+            )
+            students = students.filter(Q(classe_id=classe_id) | Q(Exists(in_classe)))
+            classe_nom = Classe.objects.filter(pk=classe_id).values_list('nom', flat=True).first()
+        students = students.annotate(presence_count=Count('presences', filter=attended))
 
         # Calculer le taux de présence pour chaque étudiant
-        result = []
-        for student in students:
-            presence_count = presence_dict.get(student.id, 0)
-            attendance_rate = (presence_count / working_days) * 100
-            result.append({
+        result = [
+            {
                 'etudiant_id': student.id,
                 'etudiant_nom': student.nom,
                 'etudiant_prenom': student.prenom,
-                'classe_nom': student.classe.nom if student.classe else None,
-                'presence_count': presence_count,
+                'classe_nom': classe_nom or (student.classe.nom if student.classe else None),
+                'presence_count': student.presence_count,
                 'working_days': working_days,
-                'attendance_rate': round(attendance_rate, 2)
-            })
+                'attendance_rate': round((student.presence_count / working_days) * 100, 2)
+            }
+            for student in students
+        ]
 
         # Trier par taux de présence décroissant
         return sorted(result, key=lambda x: x['attendance_rate'], reverse=True)
@@ -123,7 +144,13 @@ class PresenceStatisticsService:
     def get_absence_alerts(threshold=70, days=30):
         """
         Identifie les étudiants dont le taux de présence est inférieur au seuil donné
+
+        Sur la période de la fenêtre glissante (ABSENCE_ALERT_WINDOW_DAYS), le taux
+        est lu dans les fenêtres tenues à jour par le moteur d'alertes.
         """
+        if days == settings.ABSENCE_ALERT_WINDOW_DAYS and AttendanceWindow.objects.exists():
+            return AbsenceAlertService.students_below(threshold)
+
         attendance_rates = PresenceStatisticsService.get_attendance_rate_by_student(
             start_date=timezone.now().date() - timedelta(days=days)
         )
@@ -143,26 +170,25 @@ class PresenceStatisticsService:
         # Nombre total d'étudiants
         total_students = Etudiant.objects.count()
 
-        # Nombre d'étudiants présents aujourd'hui
-        present_students = Presence.objects.filter(date=today).count()
+        # Présences par classe, lues dans les résumés du jour
+        class_presence = list(
+            DailyAttendanceSummary.objects.filter(date=today)
+            .annotate(classe_nom=F('classe__nom'), count=VENUS)
+            .values('classe_nom', 'count')
+            .order_by('-count')
+        )
+
+        # Nombre d'étudiants présents aujourd'hui (y compris en retard ou partis plus tôt)
+        present_students = sum(item['count'] for item in class_presence)
 
         # Taux de présence
         attendance_rate = (present_students / total_students) * 100 if total_students > 0 else 0
 
-        # Présences par classe
-        class_presence = (
-            Presence.objects.filter(date=today)
-            .values('etudiant__classe__nom')
-            .annotate(classe_nom=F('etudiant__classe__nom'))
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-
         return {
             'date': today,
             'total_students': total_students,
             'present_students': present_students,
             'absent_students': total_students - present_students,
             'attendance_rate': round(attendance_rate, 2),
-            'class_presence': list(class_presence)
+            'class_presence': class_presence
         }